@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+
+# Compares a cron-style sweep (a new Python process per run) against cycles of the resident PollingDaemon
+# Both sweep every endpoint of every resort against the local stub server without a response cache
+# Run from the repository root: python benchmarks/bench_daemon.py
+
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from snowApp import daemon, snowReport
+from snowApp.client import ClimacellClient
+from stub_server import StubServer
+
+LATENCY = 0.02
+RUNS = 5
+WORKERS = 16
+
+# The one-shot script cron would run, it pays for interpreter startup, imports and new connections every time
+ONE_SHOT = """
+import sys
+sys.path.append({root!r})
+from snowApp import fleet, snowReport
+from snowApp.client import ClimacellClient
+snowReport.URL_REALTIME, snowReport.URL_NOWCAST, snowReport.URL_HOURLY = {urls!r}
+with ClimacellClient(pool_size={workers}) as client:
+    fleet.fetch_fleet(max_workers={workers}, client=client)
+"""
+
+
+def main():
+    with StubServer(latency=LATENCY) as stub:
+        urls = stub.urls()
+        script = ONE_SHOT.format(root=ROOT, urls=urls, workers=WORKERS)
+        one_shot = []
+        for _ in range(RUNS):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, "-c", script], check=True, cwd=ROOT)
+            one_shot.append(time.perf_counter() - start)
+
+        snowReport.URL_REALTIME, snowReport.URL_NOWCAST, snowReport.URL_HOURLY = urls
+        with ClimacellClient(pool_size=WORKERS) as client:
+            resident = daemon.PollingDaemon(cadences={"now": 0, "6hr": 0, "96hr": 0}, client=client, max_workers=WORKERS)
+            for _ in range(RUNS + 1):
+                resident.run_cycle()
+            resident.close()
+        # The first cycle opens the connections, like every one-shot run does
+        cycles = [stats.elapsed for stats in resident.cycles][1:]
+
+    print(f'{len(resident.resorts)} resorts x 3 endpoints, {LATENCY * 1000:.0f} ms stub latency, mean of {RUNS} runs')
+    print(f'one-shot process per sweep: {sum(one_shot) / RUNS * 1000:>7.1f} ms')
+    print(f'resident daemon cycle:      {sum(cycles) / RUNS * 1000:>7.1f} ms')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+
+# Compares a 96hr sweep requesting the default fields against one requesting only what the snow alerts read
+# Run from the repository root: python benchmarks/bench_fields.py
+
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from snowApp import alerts, fleet, snowReport
+from snowApp.client import ClimacellClient
+from stub_server import StubServer
+
+LATENCY = 0.0
+MAX_WORKERS = 8
+
+
+def sweep(stub, resort_keys, fields):
+    stub.bytes_sent = 0
+    with ClimacellClient(pool_size=MAX_WORKERS) as client:
+        start = time.perf_counter()
+        results = fleet.fetch_fleet(resort_keys, max_workers=MAX_WORKERS, endpoints=("96hr",), client=client, fields=fields)
+        seconds = time.perf_counter() - start
+    nbytes = sum(result.resort.series_96hr.nbytes for result in results.values())
+    return seconds, stub.bytes_sent, nbytes
+
+
+def main():
+    with StubServer(latency=LATENCY) as stub:
+        snowReport.URL_REALTIME, snowReport.URL_NOWCAST, snowReport.URL_HOURLY = stub.urls()
+        resort_keys = fleet.all_resort_keys()
+        # Warm up the stub's per-fields bodies and the local_time() cache
+        sweep(stub, resort_keys, None)
+        sweep(stub, resort_keys, alerts.SNOW_FIELDS)
+
+        runs = (("default fields", sweep(stub, resort_keys, None)), ("alerts.SNOW_FIELDS", sweep(stub, resort_keys, alerts.SNOW_FIELDS)))
+
+    print(f'{len(resort_keys)} resorts, 96hr endpoint only')
+    for name, (seconds, sent, nbytes) in runs:
+        print(f'{name:<20} {seconds * 1000:>7.1f} ms  {sent / 1e6:>6.2f} MB downloaded  {nbytes / 1e3:>7.1f} kB of arrays')
+    (full_time, full_sent, _), (snow_time, snow_sent, _) = runs[0][1], runs[1][1]
+    print(f'{full_sent / snow_sent:.1f}x fewer bytes, {full_time / snow_time:.1f}x faster sweep')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+
+# Compares the wall-clock time of a serial sweep against fetch_fleet() using the local stub server
+# Run from the repository root: python benchmarks/bench_fleet.py
+
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from snowApp import fleet, snowReport
+from snowApp.client import ClimacellClient
+from stub_server import StubServer
+
+LATENCY = 0.05
+MAX_WORKERS = 16
+
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    results = function(*args, **kwargs)
+    return time.perf_counter() - start, results
+
+
+def main():
+    with StubServer(latency=LATENCY) as stub:
+        snowReport.URL_REALTIME, snowReport.URL_NOWCAST, snowReport.URL_HOURLY = stub.urls()
+        resort_keys = fleet.all_resort_keys()
+
+        # Each run gets its own client without a cache so the second run can't reuse the first one's responses
+        with ClimacellClient(pool_size=1) as client:
+            serial_time, serial_results = timed(fleet.fetch_fleet_serial, resort_keys, client=client)
+        with ClimacellClient(pool_size=MAX_WORKERS) as client:
+            fleet_time, fleet_results = timed(fleet.fetch_fleet, resort_keys, max_workers=MAX_WORKERS, client=client)
+
+    failed = sum(1 for result in fleet_results.values() if not result.ok)
+    print(f'{len(resort_keys)} resorts x {len(fleet.ENDPOINTS)} endpoints, {LATENCY * 1000:.0f} ms stub latency')
+    print(f'serial:              {serial_time:.2f} s')
+    print(f'fetch_fleet ({MAX_WORKERS:>2} workers): {fleet_time:.2f} s')
+    print(f'speedup:             {serial_time / fleet_time:.1f}x ({failed} resorts with errors)')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+
+# Fills a ForecastHistory with a simulated season of hourly polling and times the typical queries
+# Run from the repository root: python benchmarks/bench_history.py [days]
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from snowApp.history import ForecastHistory
+from snowApp.series import ForecastSeries
+
+RESOURCES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tests", "Resources")
+RESORTS = ["lakeLouise", "sunshine", "fernie", "revelstoke", "whistler"]
+HOUR = 60 * 60
+DAY = 24 * HOUR
+START = 1610060400.0
+
+
+def main():
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    with open(os.path.join(RESOURCES, "test_96hrJson.json"), "r") as f:
+        series = ForecastSeries.from_payload(json.load(f)[:96])
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        with ForecastHistory(os.path.join(temp_dir, "history.sqlite")) as history:
+            start = time.perf_counter()
+            for hour in range(days * 24):
+                # One fleet sweep per hour, each written in a single transaction
+                history.record_many([(resort_key, "96hr", series) for resort_key in RESORTS], fetch_time=START + hour * HOUR)
+            write_time = time.perf_counter() - start
+            sweeps = days * 24
+            rows = sweeps * len(RESORTS) * len(series)
+
+            end = START + days * DAY
+            start = time.perf_counter()
+            last_week = history.forecasts("fernie", "96hr", since=end - 7 * DAY)
+            week_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            fetch_times, _ = history.forecasts_for_hour("fernie", "96hr", series.times[48])
+            hour_time = time.perf_counter() - start
+
+        print(f'{days} days of hourly sweeps over {len(RESORTS)} resorts: {rows} forecast rows')
+        print(f'write:                       {write_time / sweeps * 1000:8.2f} ms per sweep transaction')
+        print(f'96hr forecasts, last week:   {week_time * 1000:8.2f} ms ({len(last_week)} forecasts)')
+        print(f'every forecast for one hour: {hour_time * 1000:8.2f} ms ({len(fetch_times)} forecasts)')
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+
+# Measures the time to import snowApp.snowReport in a fresh interpreter with python -X importtime
+# Exits with status 1 if the median import takes longer than IMPORT_BUDGET_MS, so it can be run as a regression check
+# Run from the repository root: python benchmarks/bench_import.py
+
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULE = "snowApp.snowReport"
+RUNS = 7
+IMPORT_BUDGET_MS = 50
+TOP = 10
+
+
+# Returns {module: (self us, cumulative us)} parsed from the stderr of python -X importtime
+def import_times():
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {MODULE}"], cwd=ROOT, check=True, capture_output=True, text=True
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def main():
+    runs = [import_times() for _ in range(RUNS)]
+    median_ms = statistics.median(run[MODULE][1] for run in runs) / 1000
+    slowest = sorted(runs[-1].items(), key=lambda item: item[1][0], reverse=True)[:TOP]
+
+    print(f'import {MODULE}: median {median_ms:.1f} ms over {RUNS} runs (budget {IMPORT_BUDGET_MS} ms)')
+    print(f'{"module":<40} {"self ms":>8} {"cumulative ms":>14}')
+    for name, (self_us, cumulative_us) in slowest:
+        print(f'{name:<40} {self_us / 1000:>8.1f} {cumulative_us / 1000:>14.1f}')
+
+    if median_ms > IMPORT_BUDGET_MS:
+        print(f'Import is over budget by {median_ms - IMPORT_BUDGET_MS:.1f} ms')
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+# Compares computing the ski condition indices resort by resort and hour by hour from the getter dictionaries
+# against IndexEngine.evaluate(), first when it computes every index and then when the forecasts haven't changed
+# Run from the repository root: python benchmarks/bench_indices.py
+
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from snowApp import fleet, indices, snowReport
+
+RESOURCES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tests", "Resources")
+RESORTS = 500
+
+
+# Computes the same indices with one pass over the getter dictionaries of each resort, cloud_cover and humidity have no getter
+def per_resort_indices(resorts):
+    results = {}
+    for resort in resorts:
+        temp = resort.get_temperature_96hr()
+        feels_like = resort.get_feels_like_96hr()
+        wind_speed = resort.get_wind_speed_96hr()
+        precipitation = resort.get_precipitation_96hr()
+        precipitation_type = resort.get_precipitation_type_96hr()
+        cloud_cover = resort._forecast_dict("96hr", "cloud_cover")
+        humidity = resort._forecast_dict("96hr", "humidity")
+        window = []
+        rows = {}
+        for local in sorted(temp):
+            t, wind, rain = temp[local], wind_speed[local] * 3.6, precipitation[local]
+            chill = t
+            if t <= indices.WIND_CHILL_MAX_TEMP and wind >= indices.WIND_CHILL_MIN_WIND:
+                power = wind ** 0.16
+                chill = 13.12 + 0.6215 * t - 11.37 * power + 0.3965 * t * power
+            coldest = min(chill, feels_like[local])
+            risk = sum(1 for bound in indices.WIND_CHILL_RISK_LEVELS if coldest <= bound)
+            kind = precipitation_type[local]
+            liquid = (kind in indices.LIQUID_TYPES and t > 0) or kind == "freezing rain"
+            fresh = rain * min(max(10.0 - t, 8.0), 25.0) / 10.0 if kind == "snow" else 0.0
+            if wind_speed[local] > indices.POWDER_WIND:
+                fresh *= 0.5
+            window = (window + [fresh])[-indices.POWDER_HOURS:]
+            clear = cloud_cover[local] < indices.VISIBILITY_MAX_CLOUD and humidity[local] < indices.VISIBILITY_MAX_HUMIDITY and rain < indices.VISIBILITY_MAX_PRECIPITATION
+            rows[local] = (chill, risk, rain if liquid else 0.0, sum(window), float(clear))
+        results[resort.key] = rows
+    return results
+
+
+# Returns the median seconds taken by run over a few runs, before_each is called untimed before every run
+def time_runs(run, before_each=None):
+    runs = []
+    for _ in range(5):
+        if before_each is not None:
+            before_each()
+        start = time.perf_counter()
+        run()
+        runs.append(time.perf_counter() - start)
+    return sorted(runs)[len(runs) // 2]
+
+
+def main():
+    with open(os.path.join(RESOURCES, "test_96hrJson.json")) as f:
+        rows = json.load(f)
+    resort_keys = fleet.all_resort_keys()
+    resorts = []
+    for i in range(RESORTS):
+        resort = snowReport.Resort(resort_keys[i % len(resort_keys)], client=object())
+        resort.key = f'{resort.key}-{i}'
+        resort.set_96hr(rows[i % 4:])
+        resorts.append(resort)
+
+    engine = indices.IndexEngine()
+    loops = time_runs(lambda: per_resort_indices(resorts))
+    fresh = time_runs(lambda: engine.evaluate(resorts), before_each=engine.clear)
+    cached = time_runs(lambda: engine.evaluate(resorts))
+
+    # The vectorized powder score should agree with the loop on a resort with a full forecast
+    looped = per_resort_indices(resorts[:1])[resorts[0].key]
+    vectorized = engine.evaluate(resorts)["powder_score"][resorts[0].key]
+    assert np.allclose([row[3] for row in looped.values()], vectorized[:len(looped)])
+
+    print(f'{RESORTS} resorts, {len(engine.indicators)} indices over {len(engine.fields)} fields')
+    print(f'{"per resort getter loops":<28} {loops * 1000:>8.1f} ms')
+    print(f'{"IndexEngine, computed":<28} {fresh * 1000:>8.1f} ms')
+    print(f'{"IndexEngine, cached":<28} {cached * 1000:>8.3f} ms')
+    print(f'{loops / fresh:.1f}x faster than the loops when computed')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+
+# Compares parsing a large hourly response with json.loads() + ForecastSeries.from_payload() against stream_series()
+# The test 96hr response is repeated to build a body SCALE times larger
+# Run from the repository root: python benchmarks/bench_ingest.py
+
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from snowApp.ingest import CHUNK_SIZE, stream_series
+from snowApp.series import ForecastSeries
+
+RESOURCES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tests", "Resources")
+SCALE = 200
+FIELDS = ["temp", "precipitation", "precipitation_type", "precipitation_probability", "wind_speed"]
+
+
+def load_body():
+    with open(os.path.join(RESOURCES, "test_96hrJson.json"), "r") as f:
+        rows = json.load(f)
+    return json.dumps(rows * SCALE).encode("utf-8")
+
+
+# The path before streaming, the whole body is read into a string and decoded before the series is built
+def full_parse(body, fields):
+    text = io.BytesIO(body).read().decode("utf-8")
+    return ForecastSeries.from_payload(json.loads(text), fields=fields)
+
+
+def streamed_parse(body, fields):
+    stream = io.BytesIO(body)
+    return stream_series(iter(lambda: stream.read(CHUNK_SIZE), b""), fields=fields)
+
+
+def measure(function, body, fields):
+    start = time.perf_counter()
+    function(body, fields)
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    function(body, fields)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak
+
+
+def main():
+    body = load_body()
+    print(f'{len(body) / 1e6:.1f} MB body, {len(json.loads(body))} rows')
+    for label, fields in (("every field", None), (f'{len(FIELDS)} fields', FIELDS)):
+        full = measure(full_parse, body, fields)
+        streamed = measure(streamed_parse, body, fields)
+        print(label)
+        for name, (seconds, peak) in (("json.loads + from_payload", full), ("stream_series", streamed)):
+            print(f'  {name:<26} {seconds * 1000:>8.1f} ms  peak {peak / 1e6:>7.1f} MB')
+        print(f'  peak memory {full[1] / streamed[1]:.1f}x lower, parse time {full[0] / streamed[0]:.2f}x')
+
+
+if __name__ == "__main__":
+    main()
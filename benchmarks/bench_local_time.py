@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+
+# Compares the old dateutil based local_time() against the fast path and the batch API in timeutil.py
+# Run from the repository root: python benchmarks/bench_local_time.py
+
+import json
+import os
+import sys
+import timeit
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dateutil.parser as dp
+from tzlocal import get_localzone
+
+from snowApp import timeutil
+
+RESOURCES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tests", "Resources")
+REPEATS = 50
+
+
+# The local_time() implementation before the fast path, parses with dateutil and looks up the zone every call
+def old_local_time(UTC_time):
+    return dp.parse(UTC_time).astimezone(get_localzone())
+
+
+def load_times():
+    times = []
+    for file_name in ("test_96hrJson.json", "test_360minJson.json"):
+        with open(os.path.join(RESOURCES, file_name), "r") as f:
+            times.extend(row["observation_time"]["value"] for row in json.load(f))
+    return times
+
+
+def per_call(function, times):
+    return timeit.timeit(lambda: function(times), number=REPEATS) / REPEATS
+
+
+def main():
+    times = load_times()
+    assert [old_local_time(t) for t in times] == [timeutil.local_time(t) for t in times] == timeutil.local_times(times)
+
+    results = [
+        ("dateutil + get_localzone per call", per_call(lambda ts: [old_local_time(t) for t in ts], times)),
+        ("fromisoformat fast path, uncached", per_call(lambda ts: [timeutil.parse_utc(t).astimezone(timeutil.local_zone()) for t in ts], times)),
+        ("local_time(), cached", per_call(lambda ts: [timeutil.local_time(t) for t in ts], times)),
+        ("local_times() batch", per_call(timeutil.local_times, times)),
+    ]
+
+    baseline = results[0][1]
+    print(f'{len(times)} timestamps per call, mean of {REPEATS} calls')
+    for name, seconds in results:
+        print(f'{name:<36} {seconds * 1e6:>9.1f} us  {baseline / seconds:>7.1f}x')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+
+# Compares lining up the 96hr forecasts of many resorts from the getter dictionaries against forecast_matrices()
+# Run from the repository root: python benchmarks/bench_matrix.py
+
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from snowApp import fleet, matrix, snowReport
+
+RESOURCES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tests", "Resources")
+RESORTS = 500
+# The getter behind each field, the way a dashboard reads them today
+GETTERS = {
+    "temp": "get_temperature_96hr",
+    "precipitation": "get_precipitation_96hr",
+    "precipitation_type": "get_precipitation_type_96hr",
+    "feels_like": "get_feels_like_96hr",
+    "wind_speed": "get_wind_speed_96hr",
+}
+
+
+# Lines up the getter dictionaries by hand: a sorted union of their keys, then one lookup per resort per hour
+def getter_matrices(resorts):
+    matrices = {}
+    for field, getter in GETTERS.items():
+        dicts = [getattr(resort, getter)() for resort in resorts]
+        times = sorted(set().union(*dicts))
+        if field == "precipitation_type":
+            matrices[field] = [[forecast.get(local) for local in times] for forecast in dicts]
+        else:
+            matrices[field] = np.array([[forecast.get(local, np.nan) for local in times] for forecast in dicts], dtype=float)
+    return matrices
+
+
+# Returns the median seconds taken by build over a few runs, clear_getters empties the getter dictionaries first
+def time_build(build, resorts, clear_getters):
+    runs = []
+    for _ in range(5):
+        if clear_getters:
+            for resort in resorts:
+                resort._forecast_dicts["96hr"].clear()
+        start = time.perf_counter()
+        build(resorts)
+        runs.append(time.perf_counter() - start)
+    return sorted(runs)[len(runs) // 2]
+
+
+def main():
+    with open(os.path.join(RESOURCES, "test_96hrJson.json")) as f:
+        rows = json.load(f)
+    resort_keys = fleet.all_resort_keys()
+    resorts = []
+    for i in range(RESORTS):
+        resort = snowReport.Resort(resort_keys[i % len(resort_keys)], client=object())
+        resort.key = f'{resort.key}-{i}'
+        # Forecasts start up to 3 hours apart so the time axes don't all match
+        resort.set_96hr(rows[i % 4:])
+        resorts.append(resort)
+
+    cold_getters = time_build(getter_matrices, resorts, clear_getters=True)
+    warm_getters = time_build(getter_matrices, resorts, clear_getters=False)
+    matrices = time_build(matrix.forecast_matrices, resorts, clear_getters=False)
+
+    shape = matrix.forecast_matrices(resorts)["temp"].shape
+    print(f'{RESORTS} resorts, {len(GETTERS)} fields, {shape[0]} x {shape[1]} matrices')
+    print(f'{"getter dicts, first call":<28} {cold_getters * 1000:>8.1f} ms')
+    print(f'{"getter dicts, cached":<28} {warm_getters * 1000:>8.1f} ms')
+    print(f'{"forecast_matrices()":<28} {matrices * 1000:>8.1f} ms')
+    print(f'{cold_getters / matrices:.1f}x faster than the first getter calls, {warm_getters / matrices:.1f}x faster than cached getters')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+
+# Measures what logging and the stage timers cost the Resort getters
+# Compares the debug log written synchronously and by BackgroundHandler, on a normal and a slow disk, and turned off
+# Run from the repository root: python benchmarks/bench_metrics.py
+
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from snowApp import metrics, snowReport
+
+RESOURCES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tests", "Resources")
+ITERATIONS = 20000
+SLOW_ITERATIONS = 500
+SLOW_WRITE = 0.0002
+GETTERS = ("get_temperature_96hr", "get_precipitation_96hr", "get_precipitation_type_96hr", "get_feels_like_96hr", "get_wind_speed_96hr")
+
+
+# A FileHandler on a slow disk, every write stalls for SLOW_WRITE seconds
+class SlowFileHandler(logging.FileHandler):
+    def emit(self, record):
+        time.sleep(SLOW_WRITE)
+        super().emit(record)
+
+
+# Hands the fixture forecast to the Resort instead of requesting it
+class FixtureClient():
+    def __init__(self, forecast):
+        self.forecast = forecast
+        self.cache = None
+
+    def fetch_series(self, endpoint, url, params, **kwargs):
+        return self.forecast
+
+
+# Returns the median microseconds per getter call over a few runs
+def time_getters(resort, iterations=ITERATIONS):
+    runs = []
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(iterations // len(GETTERS)):
+            for getter in GETTERS:
+                getattr(resort, getter)()
+        runs.append((time.perf_counter() - start) / iterations * 1e6)
+    return sorted(runs)[len(runs) // 2]
+
+
+def main():
+    with open(os.path.join(RESOURCES, "test_96hrJson.json")) as f:
+        forecast = json.load(f)
+    resort = snowReport.Resort("fernie", client=FixtureClient(forecast))
+    resort.request_96hr()
+
+    log_dir = tempfile.mkdtemp()
+    formatter = snowReport.file_handler.formatter
+    file_handler = logging.FileHandler(os.path.join(log_dir, "file.log"), delay=True)
+    background_handler = metrics.BackgroundHandler(logging.FileHandler(os.path.join(log_dir, "background.log"), delay=True))
+    slow_handler = SlowFileHandler(os.path.join(log_dir, "slow.log"), delay=True)
+    slow_background_handler = metrics.BackgroundHandler(SlowFileHandler(os.path.join(log_dir, "slow_background.log"), delay=True))
+    for handler in (file_handler, background_handler.handler, slow_handler, slow_background_handler.handler):
+        handler.setFormatter(formatter)
+
+    snowReport.logger.removeHandler(snowReport.handler)
+    runs = []
+    try:
+        for name, handler, logging_on, metrics_on, iterations in (
+            ("file handler", file_handler, True, True, ITERATIONS),
+            ("background handler", background_handler, True, True, ITERATIONS),
+            ("slow disk, file handler", slow_handler, True, True, SLOW_ITERATIONS),
+            ("slow disk, background handler", slow_background_handler, True, True, SLOW_ITERATIONS),
+            ("logging off", background_handler, False, True, ITERATIONS),
+            ("logging and metrics off", background_handler, False, False, ITERATIONS),
+        ):
+            snowReport.logger.addHandler(handler)
+            snowReport.set_logging(logging_on)
+            metrics.set_enabled(metrics_on)
+            runs.append((name, time_getters(resort, iterations)))
+            snowReport.logger.removeHandler(handler)
+            # Drained outside the timing, a slow disk falls behind and catches up here
+            for background in (background_handler, slow_background_handler):
+                background.stop()
+    finally:
+        snowReport.logger.addHandler(snowReport.handler)
+        snowReport.set_logging(True)
+        metrics.set_enabled(True)
+        for handler in (file_handler, background_handler, slow_handler, slow_background_handler):
+            handler.close()
+
+    print(f'Resort getters on a {len(resort.series_96hr)} hour forecast, every call writes two debug lines when logging is on')
+    print(f'The slow disk stalls {SLOW_WRITE * 1e3:.1f} ms on every write')
+    for name, micros in runs:
+        print(f'{name:<32} {micros:>8.2f} us per call')
+    times = dict(runs)
+    print(f'On the slow disk the background handler is {times["slow disk, file handler"] / times["slow disk, background handler"]:.1f}x faster')
+    print(f'Turning logging off is {times["file handler"] / times["logging off"]:.1f}x faster, and metrics add {times["logging off"] - times["logging and metrics off"]:.2f} us per call')
+    getter = metrics.REGISTRY.histogram("snowapp_getter_seconds", span="96hr").as_dict()
+    print(f'snowapp_getter_seconds{{span="96hr"}}: {getter["count"]} calls, mean {getter["mean"] * 1e6:.2f} us')
+
+
+if __name__ == "__main__":
+    main()
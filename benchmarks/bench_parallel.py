@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+
+# Measures how the process pool sweep scales with 1, 2, 4 and 8 worker processes against the threaded sweep
+# The responses are replayed without latency so the sweep is bound by parsing, not by waiting on the network
+# Run from the repository root: python benchmarks/bench_parallel.py [--resorts 1000]
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from snowApp import fleet, parallel, snowReport
+from snowApp.client import ClimacellClient
+from snowApp.transport import ReplayTransport
+from bench_sweep import use_synthetic_registry
+
+PROCESSES = (1, 2, 4, 8)
+
+
+def client():
+    return ClimacellClient(transport=ReplayTransport.from_test_fixtures())
+
+
+# Returns (seconds, CPU seconds used by this process) of the fastest of a few runs of sweep()
+# The worker processes' CPU time isn't counted, what is left is the part of the sweep that can't be spread over cores
+def best_time(sweep, runs=3):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        cpu_start = time.process_time()
+        sweep()
+        times.append((time.perf_counter() - start, time.process_time() - cpu_start))
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Process pool sweep scaling")
+    parser.add_argument("--resorts", type=int, default=1000)
+    parser.add_argument("--processes", type=int, nargs="*", default=PROCESSES)
+    args = parser.parse_args()
+
+    snowReport.set_logging(False)
+    directory = tempfile.mkdtemp()
+    try:
+        resort_keys = use_synthetic_registry(directory, args.resorts)
+        threaded = best_time(lambda: fleet.fetch_fleet(resort_keys, client=client()))
+        runs = []
+        for processes in args.processes:
+            with parallel.SweepPool(processes) as pool:
+                pool.warm_up()
+                runs.append((processes, best_time(lambda: parallel.fetch_fleet_processes(resort_keys, pool=pool, client=client()))))
+    finally:
+        snowReport._registry = None
+        shutil.rmtree(directory)
+
+    print(f'{args.resorts} resorts x 3 endpoints, {os.cpu_count()} cores available')
+    print(f'{"threaded fetch_fleet()":<24} {threaded[0]:>7.2f} s  parent CPU {threaded[1]:>5.2f} s')
+    single = runs[0][1][0]
+    for processes, (seconds, parent_cpu) in runs:
+        print(
+            f'{f"{processes} processes":<24} {seconds:>7.2f} s  parent CPU {parent_cpu:>5.2f} s  '
+            f'{single / seconds:>5.2f}x vs 1 process  {threaded[0] / seconds:>5.2f}x vs threaded'
+        )
+    # Everything but the parent's share runs in the workers, so with enough cores the sweep approaches the parent's CPU time
+    print(f'With a core per worker the sweep could be up to {single / runs[0][1][1]:.1f}x faster than 1 process')
+
+
+if __name__ == "__main__":
+    main()
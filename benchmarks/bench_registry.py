@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+
+# Compares adding a region of resorts one add_new_resort() call at a time against one bulk add, and the JSON and
+# SQLite registries once the resort list grows into the thousands
+# Run from the repository root: python benchmarks/bench_registry.py
+
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from snowApp import snowReport
+from snowApp.registry import ResortRecord, ResortRegistry, SQLiteResortRegistry
+
+RESOURCES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tests", "Resources")
+REGION = 500
+LARGE = 5000
+LOOKUPS = 2000
+
+
+def make_records(count, prefix):
+    return [ResortRecord(f'{prefix}{i:05d}', f'{prefix} {i}', "Canada" if i % 2 else "USA", 45.0 + (i % 100) * 0.05, -120.0 + (i // 100) * 0.05) for i in range(count)]
+
+
+# Returns a ResortRegistry on a fresh copy of the test registry in directory
+def copy_registry(directory, file_name):
+    path = os.path.join(directory, file_name)
+    shutil.copy(os.path.join(RESOURCES, "test_skiResorts.json"), path)
+    return ResortRegistry(path)
+
+
+def timed(run):
+    start = time.perf_counter()
+    run()
+    return time.perf_counter() - start
+
+
+def main():
+    snowReport.set_logging(False)
+    directory = tempfile.mkdtemp()
+    try:
+        region = make_records(REGION, "region")
+
+        one_at_a_time = copy_registry(directory, "one.json")
+        snowReport._registry = one_at_a_time
+
+        def add_each():
+            for record in region:
+                snowReport.add_new_resort(record.key, record.name, record.country, record.lat, record.lon)
+
+        each = timed(add_each)
+        bulk = timed(lambda: copy_registry(directory, "bulk.json").add(region))
+
+        large = make_records(LARGE, "large")
+        json_registry = copy_registry(directory, "large.json")
+        json_write = timed(lambda: json_registry.add(large))
+        sqlite_registry = SQLiteResortRegistry(os.path.join(directory, "large.db"))
+        sqlite_write = timed(lambda: sqlite_registry.add(large))
+
+        keys = [random.choice(large).key for _ in range(LOOKUPS)]
+        # A registry opened by a new process parses the whole file on its first lookup
+        json_open = timed(lambda: ResortRegistry(json_registry.path).get(keys[0]))
+        sqlite_open = timed(lambda: SQLiteResortRegistry(sqlite_registry.path).get(keys[0]))
+        json_lookup = timed(lambda: [json_registry[key] for key in keys])
+        sqlite_lookup = timed(lambda: [sqlite_registry[key] for key in keys])
+        json_change = timed(lambda: json_registry.update([ResortRecord(keys[0], "Renamed", "Canada", 45.0, -120.0)]))
+        sqlite_change = timed(lambda: sqlite_registry.update([ResortRecord(keys[0], "Renamed", "Canada", 45.0, -120.0)]))
+        sqlite_registry.close()
+    finally:
+        snowReport._registry = None
+        shutil.rmtree(directory)
+
+    print(f'Adding {REGION} resorts')
+    print(f'{"add_new_resort() each":<28} {each * 1000:>9.1f} ms')
+    print(f'{"one bulk add()":<28} {bulk * 1000:>9.1f} ms   {each / bulk:.0f}x faster')
+    print(f'\n{LARGE} resorts              {"JSON":>12} {"SQLite":>12}')
+    print(f'{"bulk add":<28} {json_write * 1000:>9.1f} ms {sqlite_write * 1000:>9.1f} ms')
+    print(f'{"open + first lookup":<28} {json_open * 1000:>9.1f} ms {sqlite_open * 1000:>9.1f} ms')
+    print(f'{f"{LOOKUPS} lookups":<28} {json_lookup * 1000:>9.1f} ms {sqlite_lookup * 1000:>9.1f} ms')
+    print(f'{"update one resort":<28} {json_change * 1000:>9.1f} ms {sqlite_change * 1000:>9.1f} ms')
+
+
+if __name__ == "__main__":
+    main()
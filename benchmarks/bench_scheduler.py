@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+
+# Counts the requests made by the polling daemon on fixed cadences and with AdaptiveScheduler over the same
+# simulated hours, against the recorded fixtures. Half the resorts get a stormy copy of the fixtures (snow with
+# a high precipitation_probability in the next hours), the other half the dry fixtures as recorded
+# Run from the repository root: python benchmarks/bench_scheduler.py [--resorts 50] [--hours 6] [--json]
+
+import argparse
+import copy
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_sweep import use_synthetic_registry
+from snowApp import scheduler, snowReport
+from snowApp.client import ClimacellClient
+from snowApp.transport import TEST_FIXTURES, ReplayTransport
+
+RESOURCES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tests", "Resources")
+# Rows at the start of the forecasts that are made stormy
+STORM_ROWS = 12
+
+
+# Returns a copy of a recorded forecast with snow falling in its first STORM_ROWS rows
+def stormy(rows):
+    rows = copy.deepcopy(rows)
+    for row in rows[:STORM_ROWS]:
+        row["precipitation_type"]["value"] = "snow"
+        row["precipitation"]["value"] = 0.8
+        if "precipitation_probability" in row:
+            row["precipitation_probability"]["value"] = 80
+    return rows
+
+
+# Returns the bodies for a ReplayTransport: the dry fixtures for any location, stormy ones for every other resort
+def make_bodies(resort_keys):
+    bodies = {}
+    for endpoint, file_name in TEST_FIXTURES.items():
+        with open(os.path.join(RESOURCES, file_name), "rb") as f:
+            bodies[endpoint] = f.read()
+    storm = {endpoint: json.dumps(stormy(json.loads(bodies[endpoint]))).encode("utf-8") for endpoint in ("nowcast", "hourly")}
+
+    stormy_keys = set(resort_keys[::2])
+    for resort_key in stormy_keys:
+        querystring = snowReport.Resort(resort_key, client=object()).request_args("96hr")[2]
+        for endpoint, body in storm.items():
+            bodies[(endpoint, str(querystring["lat"]), str(querystring["lon"]))] = body
+    return bodies, stormy_keys
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calls saved by the adaptive refresh scheduler against fixed interval polling")
+    parser.add_argument("--resorts", type=int, default=50)
+    parser.add_argument("--hours", type=float, default=6)
+    parser.add_argument("--json", action="store_true", help="print the comparison as one JSON line")
+    args = parser.parse_args()
+
+    snowReport.set_logging(False)
+    directory = tempfile.mkdtemp()
+    try:
+        resort_keys = use_synthetic_registry(directory, args.resorts)
+        bodies, stormy_keys = make_bodies(resort_keys)
+        duration = args.hours * 3600
+        runs = {}
+        for name, adaptive in (("fixed", None), ("adaptive", scheduler.AdaptiveScheduler())):
+            # No response cache, every refresh the daemon makes is a call to the api
+            client = ClimacellClient(transport=ReplayTransport(bodies))
+            runs[name] = scheduler.simulate(resort_keys, client, duration, scheduler=adaptive)
+    finally:
+        snowReport._registry = None
+        shutil.rmtree(directory)
+
+    comparison = scheduler.calls_saved(runs["fixed"], runs["adaptive"])
+    for name, run in runs.items():
+        comparison[f'{name}_stormy'] = sum(count for (resort_key, _), count in run["refreshes"].items() if resort_key in stormy_keys)
+        comparison[f'{name}_dry'] = run["total"] - comparison[f'{name}_stormy']
+    if args.json:
+        print(json.dumps(comparison))
+        return
+
+    print(f'{args.resorts} resorts ({len(stormy_keys)} stormy) over {args.hours:g} simulated hours')
+    print(f'{"":<10} {"fixed":>8} {"adaptive":>9} {"saved":>8}')
+    for endpoint, saved in comparison["by_endpoint"].items():
+        print(f'{endpoint:<10} {runs["fixed"]["by_endpoint"][endpoint]:>8} {runs["adaptive"]["by_endpoint"][endpoint]:>9} {saved:>8}')
+    print(f'{"total":<10} {comparison["fixed"]:>8} {comparison["adaptive"]:>9} {comparison["saved"]:>8}  ({comparison["saved_share"]:.0%} fewer calls)')
+    print(f'stormy resorts: {comparison["fixed_stormy"]} calls fixed, {comparison["adaptive_stormy"]} adaptive')
+    print(f'dry resorts:    {comparison["fixed_dry"]} calls fixed, {comparison["adaptive_dry"]} adaptive')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+
+# Load test of the HTTP service in server.py, the upstream Climacell API is the local stub server
+# Compares the precomputed bodies against serializing on every hit, and shows what If-None-Match saves
+# Run from the repository root: python benchmarks/bench_server.py
+
+import json
+import logging
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+from flask import Flask, Response, request
+from werkzeug.serving import make_server
+
+from snowApp import daemon, server, snowReport
+from snowApp.client import ClimacellClient
+from stub_server import StubServer
+
+CLIENTS = 8
+REQUESTS_PER_CLIENT = 300
+PATHS = ("/resorts/{key}/96hr", "/resorts/{key}/96hr?fields=temp,precipitation", "/resorts/{key}/now", "/snow-alerts")
+
+
+# The same routes serialized from the Resort objects on every hit, what the service would cost without ReportStore
+def naive_app(resorts, alert_engine):
+    app = Flask(__name__)
+
+    @app.route("/resorts/<resort_key>/<endpoint>")
+    def resort_endpoint(resort_key, endpoint):
+        resort = resorts[resort_key]
+        if endpoint == "now":
+            data = server.now_data(resort)
+        else:
+            fields = request.args.get("fields")
+            series = getattr(resort, f'series_{endpoint}')
+            data = server.series_data(resort_key, endpoint, series, fields.split(",") if fields else None)
+        return Response(json.dumps(data), mimetype="application/json")
+
+    @app.route("/snow-alerts")
+    def snow_alerts():
+        alerts = alert_engine.check(list(resorts.values()))
+        return Response(json.dumps([alert.resort_key for alert in alerts]), mimetype="application/json")
+
+    return app
+
+
+def serve(app):
+    http_server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=http_server.serve_forever, daemon=True).start()
+    return http_server, f'http://127.0.0.1:{http_server.server_port}'
+
+
+# Runs CLIENTS threads that each send REQUESTS_PER_CLIENT requests, returns (requests a second, latencies in seconds)
+def load(base_url, resort_keys, conditional=False):
+    latencies = []
+    lock = threading.Lock()
+
+    def client(offset):
+        session = requests.Session()
+        etags = {}
+        mine = []
+        for i in range(REQUESTS_PER_CLIENT):
+            path = PATHS[i % len(PATHS)].format(key=resort_keys[(i + offset) % len(resort_keys)])
+            headers = {"If-None-Match": etags[path]} if conditional and path in etags else {}
+            start = time.perf_counter()
+            response = session.get(base_url + path, headers=headers)
+            mine.append(time.perf_counter() - start)
+            if "ETag" in response.headers:
+                etags[path] = response.headers["ETag"]
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=client, args=(offset,)) for offset in range(CLIENTS)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return len(latencies) / (time.perf_counter() - start), sorted(latencies)
+
+
+def main():
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    with StubServer(latency=0.05) as stub:
+        snowReport.URL_REALTIME, snowReport.URL_NOWCAST, snowReport.URL_HOURLY = stub.urls()
+        with ClimacellClient(pool_size=16) as climacell:
+            polling_daemon = daemon.PollingDaemon(client=climacell, max_workers=16)
+            store = server.ReportStore(polling_daemon.resorts)
+            polling_daemon.on_cycle = store.on_cycle
+            polling_daemon.run_cycle()
+            polling_daemon.close()
+        resort_keys = list(polling_daemon.resorts)
+        upstream = stub.request_count
+
+        runs = []
+        for name, app, conditional in (
+            ("serialize on every hit", naive_app(polling_daemon.resorts, store.alert_engine), False),
+            ("precomputed bodies", server.create_app(store), False),
+            ("precomputed + If-None-Match", server.create_app(store), True),
+        ):
+            http_server, base_url = serve(app)
+            throughput, latencies = load(base_url, resort_keys, conditional)
+            http_server.shutdown()
+            runs.append((name, throughput, latencies))
+
+        print(f'{len(resort_keys)} resorts, {CLIENTS} clients x {REQUESTS_PER_CLIENT} requests over {len(PATHS)} routes')
+        print(f'upstream requests: {upstream} for the refresh, {stub.request_count - upstream} while under load')
+        for name, throughput, latencies in runs:
+            p50 = statistics.median(latencies) * 1000
+            p99 = latencies[int(len(latencies) * 0.99)] * 1000
+            print(f'{name:<30} {throughput:>7.0f} req/s  p50 {p50:>6.2f} ms  p99 {p99:>6.2f} ms')
+
+
+if __name__ == "__main__":
+    main()
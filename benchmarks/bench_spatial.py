@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+
+# Compares SpatialIndex queries against a brute-force haversine loop on a synthetic 10k resort file
+# Run from the repository root: python benchmarks/bench_spatial.py
+
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from snowApp.registry import ResortRegistry
+from snowApp.spatial import SpatialIndex, haversine_km
+
+RESORT_COUNT = 10000
+QUERY_COUNT = 200
+RADIUS_KM = 200
+K = 10
+
+
+# Writes a skiResorts.json style file with resorts scattered over the mid latitudes
+def write_synthetic_resorts(path, count, seed=0):
+    rng = random.Random(seed)
+    resorts = {
+        f'resort{i}': {
+            "name": f'Synthetic Resort {i}',
+            "country": rng.choice(["Canada", "USA", "France", "Japan"]),
+            "lat": rng.uniform(25, 70),
+            "lon": rng.uniform(-180, 180),
+        }
+        for i in range(count)
+    }
+    with open(path, "w") as f:
+        json.dump(resorts, f)
+
+
+def brute_within(records, lat, lon, radius_km):
+    found = [(haversine_km(lat, lon, record.lat, record.lon), record) for record in records]
+    return sorted((distance, record.key) for distance, record in found if distance <= radius_km)
+
+
+def brute_nearest(records, lat, lon, k):
+    return sorted((haversine_km(lat, lon, record.lat, record.lon), record.key) for record in records)[:k]
+
+
+def timed(function, queries):
+    start = time.perf_counter()
+    results = [function(lat, lon) for lat, lon in queries]
+    return (time.perf_counter() - start) / len(queries), results
+
+
+def main():
+    temp_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(temp_dir, "skiResorts.json")
+        write_synthetic_resorts(path, RESORT_COUNT)
+        records = list(ResortRegistry(path))
+    finally:
+        shutil.rmtree(temp_dir)
+
+    start = time.perf_counter()
+    index = SpatialIndex(records)
+    build_time = time.perf_counter() - start
+
+    rng = random.Random(1)
+    queries = [(rng.uniform(25, 70), rng.uniform(-180, 180)) for _ in range(QUERY_COUNT)]
+
+    brute_within_time, brute_within_results = timed(lambda lat, lon: brute_within(records, lat, lon, RADIUS_KM), queries)
+    index_within_time, index_within_results = timed(lambda lat, lon: index.within_radius(lat, lon, RADIUS_KM), queries)
+    brute_nearest_time, brute_nearest_results = timed(lambda lat, lon: brute_nearest(records, lat, lon, K), queries)
+    index_nearest_time, index_nearest_results = timed(lambda lat, lon: index.nearest(lat, lon, K), queries)
+
+    for brute, indexed in zip(brute_within_results + brute_nearest_results, index_within_results + index_nearest_results):
+        assert [key for _, key in brute] == [record.key for record, _ in indexed]
+
+    print(f'{RESORT_COUNT} resorts, index built in {build_time * 1000:.0f} ms, mean of {QUERY_COUNT} queries')
+    print(f'within {RADIUS_KM} km   brute force {brute_within_time * 1000:8.3f} ms   index {index_within_time * 1000:8.3f} ms   {brute_within_time / index_within_time:6.1f}x')
+    print(f'{K} nearest       brute force {brute_nearest_time * 1000:8.3f} ms   index {index_nearest_time * 1000:8.3f} ms   {brute_nearest_time / index_nearest_time:6.1f}x')
+
+
+if __name__ == "__main__":
+    main()
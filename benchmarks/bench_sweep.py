@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+
+# Runs full fleet sweeps of 10, 100 and 1000 synthetic resorts against the recorded fixtures, without network access
+# Every request goes through Resort, fetch_fleet() and ClimacellClient, only the network is replaced by ReplayTransport
+# Run from the repository root: python benchmarks/bench_sweep.py [--latency 0.02] [--json]
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from snowApp import fleet, metrics, snowReport
+from snowApp.client import ClimacellClient
+from snowApp.registry import ResortRegistry
+from snowApp.transport import ReplayTransport
+
+SIZES = (10, 100, 1000)
+MAX_WORKERS = 32
+
+
+# Writes a skiResorts.json of count resorts spread over the Rockies and points snowReport at it
+def use_synthetic_registry(directory, count):
+    resorts = {
+        f'synthetic{i:04d}': {"name": f'Synthetic Resort {i}', "country": "Canada", "lat": 49.0 + (i % 50) * 0.1, "lon": -120.0 + (i // 50) * 0.1}
+        for i in range(count)
+    }
+    path = os.path.join(directory, f'skiResorts{count}.json')
+    with open(path, "w") as f:
+        json.dump(resorts, f)
+    snowReport._registry = ResortRegistry(path)
+    return list(resorts)
+
+
+# Runs one sweep of every endpoint for every resort, returns a dictionary of its timings
+def sweep(resort_keys, args):
+    transport = ReplayTransport.from_test_fixtures(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate, seed=0)
+    metrics.REGISTRY.reset()
+    with ClimacellClient(transport=transport) as client:
+        start = time.perf_counter()
+        results = fleet.fetch_fleet(resort_keys, max_workers=args.workers, client=client)
+        seconds = time.perf_counter() - start
+
+    snapshot = metrics.REGISTRY.snapshot()
+    http = snapshot["snowapp_http_request_seconds"]
+    parse = snapshot["snowapp_parse_seconds"]
+    return {
+        "resorts": len(resort_keys),
+        "requests": transport.request_count,
+        "seconds": seconds,
+        "resorts_per_second": len(resort_keys) / seconds,
+        "requests_per_second": transport.request_count / seconds,
+        "failed_resorts": sum(1 for result in results.values() if not result.ok),
+        "http_p99": max(sample["p99"] for sample in http),
+        "parse_mean": sum(sample["sum"] for sample in parse) / sum(sample["count"] for sample in parse),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fleet sweep throughput and latency against recorded fixtures")
+    parser.add_argument("--sizes", type=int, nargs="*", default=SIZES)
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS)
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds every replayed request takes")
+    parser.add_argument("--jitter", type=float, default=0.01, help="up to this many extra seconds per request")
+    parser.add_argument("--error-rate", type=float, default=0.01, help="share of requests answered with a 503")
+    parser.add_argument("--json", action="store_true", help="print one JSON line per sweep, for tracking over time")
+    args = parser.parse_args()
+
+    # Logging every request to snowApp.log would be part of what is measured
+    snowReport.set_logging(False)
+    directory = tempfile.mkdtemp()
+    try:
+        runs = []
+        for size in args.sizes:
+            resort_keys = use_synthetic_registry(directory, size)
+            runs.append(sweep(resort_keys, args))
+    finally:
+        snowReport._registry = None
+        shutil.rmtree(directory)
+
+    if args.json:
+        for run in runs:
+            print(json.dumps(run))
+        return
+
+    print(f'{args.workers} workers, {args.latency * 1000:.0f} ms latency + up to {args.jitter * 1000:.0f} ms jitter, {args.error_rate:.0%} errors')
+    print(f'{"resorts":>8} {"requests":>9} {"seconds":>8} {"resorts/s":>10} {"requests/s":>11} {"failed":>7} {"http p99":>9} {"parse mean":>11}')
+    for run in runs:
+        print(
+            f'{run["resorts"]:>8} {run["requests"]:>9} {run["seconds"]:>8.2f} {run["resorts_per_second"]:>10.1f} '
+            f'{run["requests_per_second"]:>11.1f} {run["failed_resorts"]:>7} {run["http_p99"] * 1000:>7.0f} ms {run["parse_mean"] * 1000:>8.2f} ms'
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+
+# http.server is used to stand in for the Climacell API on localhost
+# threading is used to serve the stub in the background while a benchmark runs
+# select_fields is shared with transport.ReplayTransport so both stand-ins filter fields the same way
+
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from snowApp.transport import select_fields
+
+"""
+A local stand-in for the Climacell API used by the benchmarks.
+
+Every request is answered with the recorded fixture from tests/Resources for that endpoint after
+sleeping for `latency` seconds, so the benchmarks measure how well the client overlaps round trips
+rather than how fast the real API happens to be that day. Like the real API, only the fields named in
+the querystring are returned, and bytes_sent counts the response bytes written.
+"""
+
+RESOURCES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tests", "Resources")
+
+FIXTURES = {
+    "/v3/weather/realtime": "test_realtimeJson.json",
+    "/v3/weather/nowcast": "test_360minJson.json",
+    "/v3/weather/forecast/hourly": "test_96hrJson.json",
+}
+
+
+def load_fixtures():
+    bodies = {}
+    for path, file_name in FIXTURES.items():
+        with open(os.path.join(RESOURCES, file_name), "rb") as f:
+            bodies[path] = f.read()
+    return bodies
+
+
+class StubServer():
+    def __init__(self, latency=0.05):
+        self.latency = latency
+        self.bodies = load_fixtures()
+        self.request_count = 0
+        self.bytes_sent = 0
+        self._selected = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address
+        return f'http://{host}:{port}'
+
+    # Returns the three endpoint URLs in the same order as snowReport's URL_REALTIME, URL_NOWCAST, URL_HOURLY
+    def urls(self):
+        return tuple(self.base_url + path for path in FIXTURES)
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                with stub._lock:
+                    stub.request_count += 1
+                time.sleep(stub.latency)
+                path, _, query = self.path.partition("?")
+                body = stub.bodies.get(path)
+                if body is None:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                fields = parse_qs(query).get("fields")
+                if fields:
+                    with stub._lock:
+                        key = (path, fields[0])
+                        if key not in stub._selected:
+                            stub._selected[key] = select_fields(body, fields[0])
+                        body = stub._selected[key]
+                with stub._lock:
+                    stub.bytes_sent += len(body)
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+
+# numpy is used to compute the snow totals for every resort at once
+
+import logging
+
+import numpy as np
+
+"""
+This module flags the resorts that are expecting significant snowfall in the 96 hour forecast.
+
+The hourly forecasts of every resort are stacked into resort x hour matrices (padded with NaN when
+a forecast is shorter than the others) and all the numbers are computed together with NumPy:
+    - snow totals over rolling windows (6, 12, 24, 48 and 96 hours by default), both for the window
+      starting now and the snowiest window anywhere in the forecast
+    - the peak hourly snowfall rate
+    - the expected accumulation, where each hour's snowfall is weighted by precipitation_probability
+Snowfall is the precipitation (mm/hr, water equivalent) in hours whose precipitation_type is "snow",
+the same quantity the old checkSnow() added up one resort at a time.
+"""
+
+logger = logging.getLogger(__name__)
+
+HOURS = 96
+DEFAULT_WINDOWS = (6, 12, 24, 48, 96)
+# Minimum snowfall (mm) over a window, in hours, that raises an alert
+DEFAULT_THRESHOLDS = {24: 10.0, 48: 20.0}
+# The only fields the engine reads, a sweep that feeds it can request just these
+SNOW_FIELDS = {"96hr": ("precipitation", "precipitation_type", "precipitation_probability")}
+
+
+# Stacks the first `hours` rows of each hourly forecast into (precipitation, snow, probability) matrices
+# Missing hours are NaN precipitation, and missing probabilities are treated as 100%
+def stack_snow_fields(series_list, hours=HOURS):
+    count = len(series_list)
+    precipitation = np.full((count, hours), np.nan)
+    snow = np.zeros((count, hours), dtype=bool)
+    probability = np.full((count, hours), 100.0)
+
+    for row, series in enumerate(series_list):
+        length = min(len(series), hours)
+        if length == 0:
+            continue
+        if "precipitation" in series:
+            precipitation[row, :length] = series["precipitation"][:length]
+        if "precipitation_type" in series:
+            snow[row, :length] = series["precipitation_type"][:length] == "snow"
+        if "precipitation_probability" in series:
+            probability[row, :length] = series["precipitation_probability"][:length]
+
+    return precipitation, snow, np.nan_to_num(probability, nan=100.0)
+
+
+# The snow numbers for a set of resorts, each attribute holds one value per resort in resort_keys order
+class SnowOutlook():
+    def __init__(self, resort_keys, totals, max_rolling, expected, peak_rate):
+        self.resort_keys = resort_keys
+        # window: array of snowfall over the next `window` hours
+        self.totals = totals
+        # window: array of snowfall over the snowiest `window` hours anywhere in the forecast
+        self.max_rolling = max_rolling
+        # window: array of probability weighted snowfall over the next `window` hours
+        self.expected = expected
+        self.peak_rate = peak_rate
+
+    # Returns a list of (resort_key, snowfall) sorted from the snowiest resort down
+    def ranking(self, window=HOURS, weighted=False):
+        values = (self.expected if weighted else self.totals)[window]
+        order = np.argsort(-values, kind="stable")
+        return [(self.resort_keys[i], float(values[i])) for i in order]
+
+    # Returns the snow numbers for one resort as a dictionary
+    def summary(self, resort_key):
+        i = self.resort_keys.index(resort_key)
+        return {
+            "totals": {window: float(values[i]) for window, values in self.totals.items()},
+            "max_rolling": {window: float(values[i]) for window, values in self.max_rolling.items()},
+            "expected": {window: float(values[i]) for window, values in self.expected.items()},
+            "peak_rate": float(self.peak_rate[i]),
+        }
+
+
+class SnowAlert():
+    def __init__(self, resort_key, window, snowfall, threshold):
+        self.resort_key = resort_key
+        self.window = window
+        self.snowfall = snowfall
+        self.threshold = threshold
+
+    def __repr__(self):
+        return f'SnowAlert({self.resort_key!r}, {self.window}hr, {self.snowfall:.2f} mm >= {self.threshold:.2f} mm)'
+
+
+class SnowAlertEngine():
+    # windows are the rolling window lengths in hours, thresholds maps a window to the snowfall (mm) that raises an alert
+    # weighted=True compares the probability weighted snowfall against the thresholds instead of the raw forecast
+    def __init__(self, windows=DEFAULT_WINDOWS, thresholds=None, weighted=False, hours=HOURS):
+        self.thresholds = dict(DEFAULT_THRESHOLDS if thresholds is None else thresholds)
+        self.windows = tuple(sorted(set(windows) | set(self.thresholds)))
+        self.weighted = weighted
+        self.hours = hours
+
+        for window in self.windows:
+            if not 0 < window <= hours:
+                raise ValueError(f'Window of {window} hours is outside the {hours} hour forecast')
+
+    # Computes the snow numbers for every resort in one batched pass, resorts is a list of Resort objects
+    def evaluate(self, resorts):
+        return self.evaluate_series([resort.key for resort in resorts], [resort.series_96hr for resort in resorts])
+
+    # Same as evaluate() for a list of resort keys and their matching hourly ForecastSeries
+    def evaluate_series(self, resort_keys, series_list):
+        precipitation, snow, probability = stack_snow_fields(series_list, self.hours)
+        snowfall = np.where(snow, np.nan_to_num(precipitation), 0.0)
+        expected = snowfall * (probability / 100.0)
+
+        # Prefix sums with a leading zero column, the snowfall between hours a and b is cumulative[:, b] - cumulative[:, a]
+        cumulative = np.zeros((len(resort_keys), self.hours + 1))
+        np.cumsum(snowfall, axis=1, out=cumulative[:, 1:])
+        expected_cumulative = np.zeros_like(cumulative)
+        np.cumsum(expected, axis=1, out=expected_cumulative[:, 1:])
+
+        totals = {}
+        max_rolling = {}
+        expected_totals = {}
+        for window in self.windows:
+            rolling = cumulative[:, window:] - cumulative[:, :-window]
+            totals[window] = rolling[:, 0]
+            max_rolling[window] = rolling.max(axis=1)
+            expected_totals[window] = expected_cumulative[:, window]
+
+        peak_rate = snowfall.max(axis=1)
+        logger.debug(f'Evaluated snow outlook for {len(resort_keys)} resorts')
+        return SnowOutlook(list(resort_keys), totals, max_rolling, expected_totals, peak_rate)
+
+    # Returns the alerts raised by an outlook, the furthest above its threshold first
+    def alerts(self, outlook):
+        values = outlook.expected if self.weighted else outlook.totals
+        alerts = []
+        for window, threshold in self.thresholds.items():
+            for i in np.flatnonzero(values[window] >= threshold):
+                alerts.append(SnowAlert(outlook.resort_keys[i], window, float(values[window][i]), threshold))
+        alerts.sort(key=lambda alert: (-alert.snowfall / alert.threshold, alert.resort_key))
+        return alerts
+
+    # Evaluates the resorts and returns their alerts
+    def check(self, resorts):
+        return self.alerts(self.evaluate(resorts))
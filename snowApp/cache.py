@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+
+# OrderedDict is used to keep the in-memory tier in least recently used order
+# hashlib and json are used to name and store the on-disk tier
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from . import metrics
+from .series import ForecastSeries
+
+"""
+This module holds the TTL cache that sits in front of the Climacell API.
+
+Responses are keyed on (endpoint, lat, lon, fields) and kept for a per-endpoint time to live, since
+the realtime, nowcast and hourly data refresh at very different rates upstream. The in-memory tier
+is an LRU bounded by max_entries. If disk_dir is given, every response is also written there so a
+freshly started process can reuse responses fetched by the previous one. ForecastSeries values are
+written to disk as plain lists and rebuilt when they are read back.
+"""
+
+logger = logging.getLogger(__name__)
+
+# Seconds each endpoint's response stays fresh
+DEFAULT_TTLS = {
+    "realtime": 60,
+    "nowcast": 5 * 60,
+    "hourly": 30 * 60,
+}
+DEFAULT_MAX_ENTRIES = 256
+
+
+# Counters used to tune the TTLs against the API quota
+class CacheStats():
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.disk_hits = 0
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def as_dict(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "disk_hits": self.disk_hits,
+            "hit_rate": self.hit_rate,
+        }
+
+
+class ResponseCache():
+    # ttls maps an endpoint to its time to live in seconds, endpoints missing from ttls are never cached
+    # clock is used to read the current time, it can be replaced in tests
+    def __init__(self, ttls=None, max_entries=DEFAULT_MAX_ENTRIES, disk_dir=None, clock=time.time):
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.clock = clock
+        self.stats = CacheStats()
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        if disk_dir is not None:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    # Builds the cache key for a request from its endpoint and querystring
+    @staticmethod
+    def make_key(endpoint, querystring):
+        return (endpoint, str(querystring["lat"]), str(querystring["lon"]), querystring.get("fields", ""))
+
+    # Builds the cache key for the ForecastSeries parsed from a response, fields are the fields it keeps
+    # (those in the querystring by default), so a series parsed for other fields is never handed back
+    @staticmethod
+    def make_series_key(endpoint, querystring, fields=None):
+        if fields is None:
+            fields = querystring.get("fields", "")
+        return ResponseCache.make_key(endpoint, querystring) + ("series", fields if isinstance(fields, str) else ",".join(fields))
+
+    # Returns the cached payload for key, or None if it is missing or has expired
+    def get(self, key):
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, payload = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.stats.hits += 1
+                    metrics.count("snowapp_cache_requests_total", endpoint=key[0], result="hit")
+                    return payload
+                del self._entries[key]
+                self.stats.expirations += 1
+
+        entry = self._read_disk(key, now)
+        with self._lock:
+            if entry is None:
+                self.stats.misses += 1
+                metrics.count("snowapp_cache_requests_total", endpoint=key[0], result="miss")
+                return None
+            self.stats.hits += 1
+            self.stats.disk_hits += 1
+            self._store(key, entry)
+        metrics.count("snowapp_cache_requests_total", endpoint=key[0], result="disk_hit")
+        return entry[1]
+
+    # Stores payload under key for the endpoint's time to live
+    def set(self, key, payload):
+        ttl = self.ttls.get(key[0])
+        if not ttl:
+            return
+        entry = (self.clock() + ttl, payload)
+        with self._lock:
+            self._store(key, entry)
+        self._write_disk(key, entry)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.disk_dir is not None:
+            for file_name in os.listdir(self.disk_dir):
+                if file_name.endswith(".json"):
+                    os.remove(os.path.join(self.disk_dir, file_name))
+
+    def __len__(self):
+        return len(self._entries)
+
+    # Adds an entry to the in-memory tier, evicting the least recently used entries past max_entries
+    def _store(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats.evictions += 1
+
+    def _disk_path(self, key):
+        digest = hashlib.sha1(json.dumps(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.disk_dir, digest + ".json")
+
+    def _read_disk(self, key, now):
+        if self.disk_dir is None:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, "r") as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if stored["expires_at"] <= now:
+            with self._lock:
+                self.stats.expirations += 1
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        if "series" in stored:
+            return (stored["expires_at"], ForecastSeries.from_dict(stored["series"]))
+        return (stored["expires_at"], stored["payload"])
+
+    # Writes to a temporary file first so a reader never sees a half written entry
+    def _write_disk(self, key, entry):
+        if self.disk_dir is None:
+            return
+        expires_at, payload = entry
+        try:
+            fd, temp_path = tempfile.mkstemp(dir=self.disk_dir, suffix=".tmp")
+            if isinstance(payload, ForecastSeries):
+                stored = {"expires_at": expires_at, "series": payload.to_dict()}
+            else:
+                stored = {"expires_at": expires_at, "payload": payload}
+            with os.fdopen(fd, "w") as f:
+                json.dump(stored, f)
+            os.replace(temp_path, self._disk_path(key))
+        except OSError as e:
+            logger.debug(f'Could not write cache entry for {key}: {e!r}')
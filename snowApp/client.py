@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+
+# Requests is used to access the api through a pooled session
+# HTTPAdapter and Retry are used to size the connection pool and retry failed requests with backoff
+# JSON is used to parse API response from JSON format into a list of dictionaries
+
+import json
+import logging
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .cache import ResponseCache
+from . import metrics
+from .ingest import CHUNK_SIZE, stream_series
+from .ratelimit import DEFAULT_PRIORITY, QuotaExceeded, RateLimitExceeded, parse_retry_after
+
+"""
+This module holds the HTTP client used to talk to the Climacell API.
+
+A single ClimacellClient owns a requests.Session so that every Resort reuses the same pool of
+keep-alive connections instead of opening a new connection (and TLS handshake) per call. Every
+request has a connect and read timeout, and 429/5xx responses are retried a bounded number of
+times with exponential backoff. If the client has a ResponseCache, fetch() answers repeat requests
+for the same coordinates from it until the endpoint's TTL runs out. Identical requests made at the
+same time by different threads are coalesced, so only the first one reaches the api and the others
+wait for its response. fetch_series() parses nowcast and hourly responses into a ForecastSeries while
+the body is still downloading, see ingest.py.
+
+Requests go through a transport, the pooled requests.Session unless another one is given, see
+transport.py for a replay transport that serves recorded responses without network access.
+
+With a RateLimiter every request that reaches the api first waits for its permission, in priority
+order, and a 429 response pauses every request for as long as its Retry-After header asks before
+the request is tried again. The 429/5xx retries are then made by the client rather than inside the
+connection pool, so every attempt takes its own permission and counts against the daily quota.
+"""
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_CONNECT_TIMEOUT = 3.05
+DEFAULT_READ_TIMEOUT = 10
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF_FACTOR = 0.5
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# The longest a request waits for the rate limiter before it is given up on
+DEFAULT_RATE_LIMIT_TIMEOUT = 30
+
+
+# Coalesces concurrent calls that share a key so only one of them runs
+class SingleFlight():
+    def __init__(self):
+        self.coalesced = 0
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    # Runs function for key, or waits for and returns the result of a call for key that is already running
+    def do(self, key, function):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = function()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+
+class _Call():
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class ClimacellClient():
+    # pool_size is the number of connections kept open to the api, it should match the number of requests made at once
+    # cache is an optional ResponseCache used by fetch()
+    # rate_limiter is an optional RateLimiter, requests wait up to rate_limit_timeout seconds for it
+    # transport replaces the pooled requests.Session, for example with a transport.ReplayTransport, pool_size and
+    # retries then only apply if the transport does its own pooling and retrying
+    def __init__(
+        self,
+        pool_size=DEFAULT_POOL_SIZE,
+        connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+        read_timeout=DEFAULT_READ_TIMEOUT,
+        retries=DEFAULT_RETRIES,
+        backoff_factor=DEFAULT_BACKOFF_FACTOR,
+        cache=None,
+        rate_limiter=None,
+        rate_limit_timeout=DEFAULT_RATE_LIMIT_TIMEOUT,
+        transport=None,
+    ):
+        self.pool_size = pool_size
+        self.cache = cache
+        self.rate_limiter = rate_limiter
+        self.rate_limit_timeout = rate_limit_timeout
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.sleep = time.sleep
+        self.in_flight = SingleFlight()
+        self.timeout = (connect_timeout, read_timeout)
+
+        if transport is not None:
+            self.session = transport
+            logger.debug(f'New ClimacellClient sending requests through {type(transport).__name__}')
+            return
+
+        # With a rate limiter only failed connections are retried here, a request that reached the api is retried
+        # by _send() so every attempt waits for the limiter and is counted against the quota
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=retries if rate_limiter is None else 0,
+            status=retries if rate_limiter is None else 0,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUSES if rate_limiter is None else (),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        logger.debug(f'New ClimacellClient with a pool of {pool_size} connections, timeout {self.timeout}')
+
+    # Makes a GET request through the pooled session (or the transport), returns the requests.Response
+    # stream=True leaves the body unread so it can be consumed in chunks
+    # Raises requests.RequestException if the request times out or the retries are used up
+    def get(self, url, params, stream=False):
+        return self.session.get(url, params=params, timeout=self.timeout, stream=stream)
+
+    # Sends a request once the rate limiter allows it, 429 and 5xx responses are tried again up to self.retries times
+    # A 429 pauses the limiter for its Retry-After, a 5xx waits with exponential backoff, each attempt takes a permission
+    # Raises ratelimit.QuotaExceeded or ratelimit.RateLimitExceeded if the rate limiter won't allow the first attempt,
+    # when it won't allow a retry the failed response is returned
+    def _send(self, url, params, priority, stream=False):
+        if self.rate_limiter is None:
+            return self.get(url, params, stream=stream)
+        response = None
+        for attempt in range(self.retries + 1):
+            try:
+                self.rate_limiter.acquire(priority, timeout=self.rate_limit_timeout)
+            except (QuotaExceeded, RateLimitExceeded):
+                if response is None:
+                    raise
+                logger.debug(f'Retry of {url} not allowed by the rate limiter, returning status {response.status_code}')
+                return response
+            if response is not None:
+                response.close()
+            response = self.get(url, params, stream=stream)
+            if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                return response
+            if response.status_code == 429:
+                self.rate_limiter.retry_after(parse_retry_after(response.headers.get("Retry-After")))
+            else:
+                self.sleep(self.backoff_factor * 2 ** attempt)
+        return response
+
+    # Returns the parsed JSON response of a request to one of the Climacell endpoints ("realtime", "nowcast" or "hourly")
+    # priority orders the request when it has to wait for the rate limiter, see ratelimit.request_priority()
+    # Returns None if the api responded with an error, cached responses are returned without a request
+    def fetch(self, endpoint, url, params, priority=DEFAULT_PRIORITY):
+        key = ResponseCache.make_key(endpoint, params)
+        if self.cache is not None:
+            payload = self.cache.get(key)
+            if payload is not None:
+                logger.debug(f'{endpoint} response for ({params["lat"]}, {params["lon"]}) served from cache')
+                return payload
+
+        return self.in_flight.do(key, lambda: self._fetch(endpoint, key, url, params, priority))
+
+    def _fetch(self, endpoint, key, url, params, priority):
+        with metrics.timer("snowapp_http_request_seconds", endpoint=endpoint):
+            response = self._send(url, params, priority)
+        if not response.ok:
+            logger.debug(f'{endpoint} request to Climacell API failed with status {response.status_code}')
+            return None
+
+        with metrics.timer("snowapp_parse_seconds", endpoint=endpoint):
+            payload = json.loads(response.text)
+        if self.cache is not None:
+            self.cache.set(key, payload)
+        return payload
+
+    # Returns the raw body of a request to one of the Climacell endpoints, None if the api responded with an error
+    # The cache isn't used, this is for callers that parse the body elsewhere, see parallel.py
+    def fetch_raw(self, endpoint, url, params, priority=DEFAULT_PRIORITY):
+        with metrics.timer("snowapp_http_request_seconds", endpoint=endpoint):
+            response = self._send(url, params, priority)
+        if not response.ok:
+            logger.debug(f'{endpoint} request to Climacell API failed with status {response.status_code}')
+            return None
+        return response.content
+
+    # Returns the ForecastSeries of a request to the "nowcast" or "hourly" endpoint, parsed while the body downloads
+    # fields limits which fields are kept, by default the fields in the querystring
+    # Returns None if the api responded with an error, cached series are returned without a request
+    def fetch_series(self, endpoint, url, params, fields=None, priority=DEFAULT_PRIORITY):
+        if fields is None and params.get("fields"):
+            fields = params["fields"].split(",")
+        key = ResponseCache.make_series_key(endpoint, params, fields)
+        if self.cache is not None:
+            series = self.cache.get(key)
+            if series is not None:
+                logger.debug(f'{endpoint} series for ({params["lat"]}, {params["lon"]}) served from cache')
+                return series
+
+        return self.in_flight.do(key, lambda: self._fetch_series(endpoint, key, url, params, fields, priority))
+
+    def _fetch_series(self, endpoint, key, url, params, fields, priority):
+        with metrics.timer("snowapp_http_request_seconds", endpoint=endpoint):
+            response = self._send(url, params, priority, stream=True)
+        with response:
+            if not response.ok:
+                logger.debug(f'{endpoint} request to Climacell API failed with status {response.status_code}')
+                return None
+            # The body is parsed while it downloads, so this includes reading the body
+            with metrics.timer("snowapp_parse_seconds", endpoint=endpoint):
+                series = stream_series(response.iter_content(CHUNK_SIZE), fields)
+
+        if self.cache is not None:
+            self.cache.set(key, series)
+        return series
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+# Returns the client shared by every Resort that isn't given its own, creating it on first use
+# The shared client caches responses in memory using the default TTLs
+def get_default_client(pool_size=DEFAULT_POOL_SIZE):
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = ClimacellClient(pool_size=pool_size, cache=ResponseCache())
+        return _default_client
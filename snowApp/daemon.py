@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+
+# signal is used to stop the daemon cleanly on SIGTERM and SIGINT
+# concurrent.futures keeps one pool of worker threads alive between cycles
+
+import argparse
+import logging
+import signal
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from . import fleet, metrics, snowReport
+from .cache import ResponseCache
+from .client import ClimacellClient
+from .history import RECORDED_ENDPOINTS, ForecastHistory, fetched_series
+from .ratelimit import RateLimiter
+
+"""
+This module runs the fleet sweep as a resident process instead of a one-shot script run from cron.
+
+PollingDaemon keeps one Resort per resort key, one ClimacellClient (so connections and the response
+cache stay warm) and one pool of worker threads for its whole life. Every endpoint of every resort
+has its own next due time: the realtime weather is refreshed every minute, the 6hr nowcast every
+5 minutes and the 96hr forecast every 30 minutes by default. Each cycle requests only what is due,
+logs how long the cycle took, then sleeps until the next request is due. SIGTERM or SIGINT finish
+the cycle in progress and shut the daemon down.
+
+With a scheduler (see scheduler.AdaptiveScheduler, --adaptive on the command line) each refresh
+asks it when that resort's endpoint is next due instead of using the fixed cadence, so quiet
+resorts are polled less often and resorts with snow coming more often.
+
+Run it from the repository root with: python -m snowApp.daemon
+"""
+
+logger = logging.getLogger(__name__)
+
+# Seconds between refreshes of each endpoint
+DEFAULT_CADENCES = {
+    "now": 60,
+    "6hr": 5 * 60,
+    "96hr": 30 * 60,
+}
+# The daemon's response cache keeps each endpoint for this share of its cadence
+CACHE_TTL_FACTOR = 0.5
+# Number of recent cycles kept in PollingDaemon.cycles
+CYCLE_HISTORY = 100
+
+
+# Returns response cache TTLs for the Climacell endpoints behind cadences, a share of each cadence
+# A response is cached when it arrives, after its refresh was due, so a TTL equal to the cadence would outlive it and
+# the next refresh would be answered from the cache
+def cache_ttls(cadences, factor=CACHE_TTL_FACTOR):
+    return {fleet.API_ENDPOINTS[endpoint]: cadence * factor for endpoint, cadence in cadences.items()}
+
+
+# The outcome and timing of one polling cycle
+class CycleStats():
+    def __init__(self, number, started, elapsed, requests, errors, by_endpoint):
+        self.number = number
+        self.started = started
+        self.elapsed = elapsed
+        self.requests = requests
+        self.errors = errors
+        # endpoint: number of resorts refreshed
+        self.by_endpoint = by_endpoint
+
+    def as_dict(self):
+        return {
+            "number": self.number,
+            "started": self.started,
+            "elapsed": self.elapsed,
+            "requests": self.requests,
+            "errors": self.errors,
+            "by_endpoint": dict(self.by_endpoint),
+        }
+
+    def __repr__(self):
+        return f'CycleStats({self.number}, {self.requests} requests, {self.errors} errors, {self.elapsed:.3f} s)'
+
+
+class PollingDaemon():
+    # resort_keys defaults to every resort in skiResorts.json, cadences maps an endpoint to its refresh interval in seconds
+    # client defaults to a new pooled client with a response cache that expires before every refresh, grid_resolution and fields are passed to every Resort
+    # history is an optional ForecastHistory that every refresh is recorded in
+    # on_cycle is called with (daemon, CycleStats, results) after every cycle that made requests
+    # scheduler, when given, has an interval(resort, endpoint) method that returns the seconds until the next refresh
+    # clock is used to schedule the refreshes, it can be replaced in tests
+    def __init__(
+        self,
+        resort_keys=None,
+        cadences=None,
+        client=None,
+        max_workers=fleet.DEFAULT_MAX_WORKERS,
+        grid_resolution=None,
+        fields=None,
+        history=None,
+        on_cycle=None,
+        scheduler=None,
+        clock=time.monotonic,
+    ):
+        self.cadences = dict(DEFAULT_CADENCES if cadences is None else cadences)
+        for endpoint in self.cadences:
+            if endpoint not in fleet.REQUEST_METHODS:
+                raise ValueError(f'Unknown endpoint {endpoint!r}, expected one of {fleet.ENDPOINTS}')
+
+        if resort_keys is None:
+            resort_keys = fleet.all_resort_keys()
+        # With nothing scheduled run() would never sleep or finish a cycle
+        if not resort_keys or not self.cadences:
+            raise ValueError(f'Nothing to poll, got {len(resort_keys)} resorts and cadences for {list(self.cadences)}')
+        self.owns_client = client is None
+        self.client = client if client is not None else ClimacellClient(pool_size=max_workers, cache=ResponseCache(cache_ttls(self.cadences)))
+        self.max_workers = max_workers
+        self.grid_resolution = grid_resolution
+        self.history = history
+        self.on_cycle = on_cycle
+        self.scheduler = scheduler
+        self.clock = clock
+
+        self.resorts = {
+            resort_key: snowReport.Resort(resort_key, self.client, grid_resolution=grid_resolution, fields=fields)
+            for resort_key in resort_keys
+        }
+        # (resort_key, endpoint): time the next refresh is due, everything is due straight away
+        now = clock()
+        self.next_due = {(resort_key, endpoint): now for resort_key in self.resorts for endpoint in self.cadences}
+        self.cycles = deque(maxlen=CYCLE_HISTORY)
+        self.cycle_count = 0
+        # (resort_key, endpoint): number of times it has been refreshed
+        self.refreshes = {}
+
+        self._stop = threading.Event()
+        self._executor = None
+
+    # Requests every endpoint that is due, returns the CycleStats, or None if nothing was due
+    def run_cycle(self, now=None):
+        now = self.clock() if now is None else now
+        due = {}
+        for (resort_key, endpoint), due_at in self.next_due.items():
+            if due_at <= now:
+                due.setdefault(endpoint, []).append(self.resorts[resort_key])
+        if not due:
+            return None
+
+        requests = []
+        results = {}
+        for endpoint, resorts in due.items():
+            for resort in resorts:
+                results.setdefault(resort.key, fleet.FleetResult(resort.key, resort))
+            for cell in fleet.group_by_cell(resorts, self.grid_resolution).values():
+                requests.append((cell, endpoint))
+
+        started = time.time()
+        timer = time.perf_counter()
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        fleet.run_requests(results, requests, self._executor)
+        elapsed = time.perf_counter() - timer
+        metrics.observe("snowapp_cycle_seconds", elapsed)
+
+        # The next refresh is one cadence after this one was due, or after now if the daemon fell behind
+        # A scheduler picks the interval instead, a failed refresh is retried after the usual cadence
+        for endpoint, resorts in due.items():
+            for resort in resorts:
+                key = (resort.key, endpoint)
+                self.refreshes[key] = self.refreshes.get(key, 0) + 1
+                if self.scheduler is None or endpoint in results[resort.key].errors:
+                    cadence = self.cadences[endpoint]
+                else:
+                    cadence = self.scheduler.interval(resort, endpoint)
+                due_at = self.next_due[key] + cadence
+                self.next_due[key] = due_at if due_at > now else now + cadence
+
+        errors = sum(len(result.errors) for result in results.values())
+        self.cycle_count += 1
+        stats = CycleStats(
+            self.cycle_count,
+            started,
+            elapsed,
+            len(requests),
+            errors,
+            {endpoint: len(resorts) for endpoint, resorts in due.items()},
+        )
+        self.cycles.append(stats)
+        logger.info(
+            f'Cycle {stats.number}: {stats.requests} requests for {stats.by_endpoint} in {elapsed:.3f} s, {errors} errors'
+        )
+        if self.client.cache is not None:
+            logger.debug(f'Cache after cycle {stats.number}: {self.client.cache.stats.as_dict()}')
+        if self.client.rate_limiter is not None:
+            logger.debug(f'Rate limit after cycle {stats.number}: {self.client.rate_limiter.usage()}')
+
+        if self.history is not None:
+            self._record(due, results)
+        if self.on_cycle is not None:
+            self.on_cycle(self, stats, results)
+        return stats
+
+    # Returns the number of seconds until the next refresh is due
+    def seconds_until_due(self, now=None):
+        now = self.clock() if now is None else now
+        return max(0.0, min(self.next_due.values(), default=now) - now)
+
+    # Runs cycles until stop() is called or the process gets SIGTERM or SIGINT
+    # max_cycles stops the daemon after that many cycles with requests, it is used in tests and benchmarks
+    def run(self, max_cycles=None, handle_signals=True):
+        previous_handlers = None
+        if handle_signals and threading.current_thread() is threading.main_thread():
+            previous_handlers = self._install_signal_handlers()
+        logger.info(f'Polling {len(self.resorts)} resorts every {self.cadences} seconds')
+        try:
+            while not self._stop.is_set():
+                if self.run_cycle() is not None and max_cycles is not None and self.cycle_count >= max_cycles:
+                    break
+                self._stop.wait(self.seconds_until_due())
+        finally:
+            self.close()
+            if previous_handlers is not None:
+                for signum, handler in previous_handlers.items():
+                    signal.signal(signum, handler)
+        logger.info(f'Stopped after {self.cycle_count} cycles')
+
+    # Asks the daemon to stop once the cycle in progress has finished, safe to call from any thread or a signal handler
+    def stop(self):
+        self._stop.set()
+
+    # Waits for requests in flight and closes the client if the daemon created it
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        if self.owns_client:
+            self.client.close()
+
+    # Returns the handlers that were replaced so run() can put them back
+    def _install_signal_handlers(self):
+        def handle(signum, frame):
+            logger.info(f'Received signal {signum}, stopping after the current cycle')
+            self.stop()
+
+        return {signum: signal.signal(signum, handle) for signum in (signal.SIGTERM, signal.SIGINT)}
+
+    # Records the realtime weather and the forecasts refreshed in this cycle in the history
+    def _record(self, due, results):
+        fetches = []
+        for endpoint in RECORDED_ENDPOINTS:
+            for resort in due.get(endpoint, []):
+                series = fetched_series(resort, endpoint)
+                if endpoint not in results[resort.key].errors and len(series):
+                    fetches.append((resort.key, endpoint, series))
+        if fetches:
+            self.history.record_many(fetches)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Poll the Climacell API for every resort until stopped")
+    parser.add_argument("--resorts", nargs="*", help="resort keys to poll, every resort by default")
+    parser.add_argument("--workers", type=int, default=fleet.DEFAULT_MAX_WORKERS, help="requests in flight at once")
+    parser.add_argument("--grid-resolution", type=float, help="share requests between resorts in the same grid cell")
+    parser.add_argument("--daily-limit", type=int, help="daily Climacell quota, enables the rate limiter")
+    parser.add_argument("--history", help="SQLite file to record every forecast in")
+    parser.add_argument("--adaptive", action="store_true", help="refresh each resort sooner or later depending on its forecast")
+    parser.add_argument("--log-level", default="INFO")
+    for endpoint, cadence in DEFAULT_CADENCES.items():
+        parser.add_argument(f'--every-{endpoint}', type=float, default=cadence, help=f'seconds between {endpoint} refreshes')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=args.log_level, format="%(asctime)s:%(levelname)s:%(name)s: %(message)s")
+    rate_limiter = RateLimiter(daily_limit=args.daily_limit) if args.daily_limit else None
+    cadences = {endpoint: getattr(args, f'every_{endpoint}') for endpoint in DEFAULT_CADENCES}
+    scheduler = None
+    if args.adaptive:
+        # scheduler imports this module, so it is only imported when it is used
+        from .scheduler import AdaptiveScheduler
+
+        scheduler = AdaptiveScheduler(cadences)
+    # The cache TTLs are kept below the shortest interval so no refresh is answered from the cache
+    cache = ResponseCache(ttls=scheduler.cache_ttls() if scheduler is not None else cache_ttls(cadences))
+    client = ClimacellClient(pool_size=args.workers, cache=cache, rate_limiter=rate_limiter)
+    history = ForecastHistory(args.history) if args.history else None
+
+    daemon = PollingDaemon(
+        resort_keys=args.resorts or None,
+        cadences=cadences,
+        client=client,
+        max_workers=args.workers,
+        grid_resolution=args.grid_resolution,
+        history=history,
+        scheduler=scheduler,
+    )
+    try:
+        daemon.run()
+    finally:
+        client.close()
+        if history is not None:
+            history.close()
+
+
+if __name__ == "__main__":
+    main()
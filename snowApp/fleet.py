@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+
+# concurrent.futures is used to run the Climacell requests for every resort on a pool of threads
+# logging is used to record the outcome of each request in the fleet sweep
+
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from . import snowReport
+from .matrix import forecast_matrices
+from .spatial import snap_to_grid
+
+"""
+This module fetches the weather for a whole fleet of resorts at once.
+
+Each resort needs three requests (realtime, 6hr nowcast and 96hr hourly forecast). Rather than
+calling Resort.process_requests() one resort at a time, every (resort, endpoint) pair is submitted
+to a thread pool so the round trips overlap. The number of requests in flight is bounded by
+max_workers.
+
+With grid_resolution set, resorts whose coordinates snap to the same grid cell (for example Lake
+Louise, Sunshine and Norquay at a coarse resolution) share a single request per endpoint, and the
+response is handed to every resort in the cell.
+
+fields limits every request in the sweep to the fields its consumers read, for example
+alerts.SNOW_FIELDS when the sweep only feeds the snow alerts.
+
+fleet_matrices() turns the results of a sweep into one resort x time matrix per field, see matrix.py.
+"""
+
+logger = logging.getLogger(__name__)
+
+# Maps the endpoint name used in the results to the Resort method that makes the request
+REQUEST_METHODS = {
+    "now": "request_now",
+    "6hr": "request_6hr",
+    "96hr": "request_96hr",
+}
+# The Resort methods used to make a request once for a grid cell and then store its response on every resort in the cell
+FETCH_METHODS = {
+    "now": ("fetch_now", "set_now"),
+    "6hr": ("fetch_6hr", "set_6hr"),
+    "96hr": ("fetch_96hr", "set_96hr"),
+}
+ENDPOINTS = tuple(REQUEST_METHODS)
+# The Climacell endpoint behind each of the endpoint names used in the results
+API_ENDPOINTS = {
+    "now": "realtime",
+    "6hr": "nowcast",
+    "96hr": "hourly",
+}
+DEFAULT_MAX_WORKERS = 8
+
+
+# Holds the Resort object for one resort key along with any errors raised by its requests
+class FleetResult():
+    def __init__(self, resort_key, resort):
+        self.resort_key = resort_key
+        self.resort = resort
+        self.errors = {}
+
+    # True if every endpoint requested for this resort succeeded
+    @property
+    def ok(self):
+        return not self.errors
+
+    def __repr__(self):
+        return f'FleetResult({self.resort_key!r}, errors={self.errors!r})'
+
+
+# Returns the list of every resort key in skiResorts.json
+def all_resort_keys():
+    return snowReport.get_registry().keys()
+
+
+# This method makes one request for one resort, returns None if it succeeded or the error if it didn't
+def _run_request(resort, endpoint):
+    request = getattr(resort, REQUEST_METHODS[endpoint])
+    try:
+        if request():
+            return None
+        return f'{endpoint} request to Climacell API failed'
+    except Exception as e:
+        logger.debug(f'{endpoint} request for {resort.name} raised {e!r}')
+        return e
+
+
+# This method makes one request for a grid cell and stores the response on every resort in it
+# Returns None if it succeeded or the error if it didn't
+def _run_cell_request(resorts, endpoint):
+    fetch, store = FETCH_METHODS[endpoint]
+    try:
+        payload = getattr(resorts[0], fetch)()
+        if payload is None:
+            return f'{endpoint} request to Climacell API failed'
+        # A response that can't be stored fails the whole cell, like one that couldn't be fetched
+        for resort in resorts:
+            getattr(resort, store)(payload)
+    except Exception as e:
+        logger.debug(f'{endpoint} request for grid cell of {resorts[0].name} raised {e!r}')
+        return e
+    return None
+
+
+# Groups resorts that share a grid cell, each resort is its own group when grid_resolution is None
+def group_by_cell(resorts, grid_resolution=None):
+    cells = {}
+    for resort in resorts:
+        cell = snap_to_grid(resort.lat, resort.lon, grid_resolution) if grid_resolution else resort.key
+        cells.setdefault(cell, []).append(resort)
+    return cells
+
+
+# This method runs a list of (resorts, endpoint) requests on an executor and waits for them
+# Each request is made once for its list of resorts (one resort, or every resort in a grid cell), errors are
+# recorded on the matching FleetResult in results
+def run_requests(results, requests, executor):
+    # The most urgent requests (starred resorts, near-term endpoints) are submitted first so they reach the
+    # client's rate limiter, if it has one, before the rest of the sweep
+    requests = sorted(requests, key=lambda request: min(resort.priority(API_ENDPOINTS[request[1]]) for resort in request[0]))
+
+    futures = {}
+    for resorts, endpoint in requests:
+        if len(resorts) == 1:
+            future = executor.submit(_run_request, resorts[0], endpoint)
+        else:
+            future = executor.submit(_run_cell_request, resorts, endpoint)
+        futures[future] = (resorts, endpoint)
+
+    for future in as_completed(futures):
+        resorts, endpoint = futures[future]
+        error = future.result()
+        if error is not None:
+            for resort in resorts:
+                results[resort.key].errors[endpoint] = error
+    return results
+
+
+# This method runs the requested endpoints for every resort concurrently, returns a dict of resort_key: FleetResult
+# resort_keys defaults to every resort in skiResorts.json, max_workers limits the number of requests in flight
+# client defaults to the pooled client shared by every Resort
+# grid_resolution (degrees) makes resorts in the same grid cell share one request per endpoint
+# fields limits what is requested to the fields the sweep's consumers read, see snowReport.resolve_fields()
+def fetch_fleet(resort_keys=None, max_workers=DEFAULT_MAX_WORKERS, endpoints=ENDPOINTS, client=None, grid_resolution=None, fields=None):
+    logger.debug(f'Function call: fetch_fleet()')
+    if resort_keys is None:
+        resort_keys = all_resort_keys()
+
+    for endpoint in endpoints:
+        if endpoint not in REQUEST_METHODS:
+            raise ValueError(f'Unknown endpoint {endpoint!r}, expected one of {ENDPOINTS}')
+
+    results = {
+        resort_key: FleetResult(resort_key, snowReport.Resort(resort_key, client, grid_resolution=grid_resolution, fields=fields))
+        for resort_key in resort_keys
+    }
+    cells = list(group_by_cell([result.resort for result in results.values()], grid_resolution).values())
+    if grid_resolution:
+        logger.debug(f'{len(results)} resorts share {len(cells)} grid cells at {grid_resolution} degrees')
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        run_requests(results, [(resorts, endpoint) for resorts in cells for endpoint in endpoints], executor)
+
+    failed = sum(1 for result in results.values() if not result.ok)
+    logger.debug(f'fetch_fleet() completed for {len(results)} resorts, {failed} with errors \n')
+    return results
+
+
+# This method runs the same sweep one request at a time, it is kept to compare against fetch_fleet()
+def fetch_fleet_serial(resort_keys=None, endpoints=ENDPOINTS, client=None, fields=None):
+    logger.debug(f'Function call: fetch_fleet_serial()')
+    if resort_keys is None:
+        resort_keys = all_resort_keys()
+
+    results = {}
+    for resort_key in resort_keys:
+        result = FleetResult(resort_key, snowReport.Resort(resort_key, client, fields=fields))
+        for endpoint in endpoints:
+            error = _run_request(result.resort, endpoint)
+            if error is not None:
+                result.errors[endpoint] = error
+        results[resort_key] = result
+    return results
+
+
+# Returns a dictionary of field: ForecastMatrix for the 6hr or 96hr forecasts in the results of a sweep
+# Resorts whose request for the span failed are left out, fields defaults to the fields read by the Resort getters
+def fleet_matrices(results, span="96hr", fields=snowReport.GETTER_FIELDS):
+    resorts = [result.resort for result in results.values() if span not in result.errors]
+    return forecast_matrices(resorts, span, fields)
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+
+# sqlite3 is used to keep every fetched forecast in a local append-only database
+# numpy is used to turn the stored rows back into arrays
+
+import logging
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from .series import ForecastSeries
+
+"""
+This module records every forecast that is fetched so it can be compared later against what
+actually fell, or used to look at how a forecast trended.
+
+Each fetch of a resort's endpoint is one row in `fetches`, and every hour (or 5 minute step) of the
+forecast is one row in `observations` with the numeric fields as columns. Both tables are only ever
+appended to. Indexes on (resort_key, endpoint, fetch_time) and (resort_key, endpoint, observation_time,
+fetch_time) keep queries such as "every 96hr forecast for fernie issued in the last week" fast after
+a season of hourly polling. record_sweep() writes a whole fleet sweep in one transaction.
+
+The realtime weather is recorded as well, as a forecast of one row (the observation) under the
+endpoint "now", so every fetch of every endpoint ends up in the history.
+"""
+
+logger = logging.getLogger(__name__)
+
+# The numeric forecast fields stored as columns, any other numeric field is ignored
+NUMERIC_FIELDS = (
+    "temp",
+    "feels_like",
+    "humidity",
+    "wind_speed",
+    "wind_direction",
+    "precipitation",
+    "precipitation_probability",
+    "cloud_cover",
+    "cloud_base",
+    "visibility",
+)
+TEXT_FIELDS = ("precipitation_type",)
+STORED_FIELDS = NUMERIC_FIELDS + TEXT_FIELDS
+
+SCHEMA = f'''
+CREATE TABLE IF NOT EXISTS fetches (
+    fetch_id INTEGER PRIMARY KEY,
+    resort_key TEXT NOT NULL,
+    endpoint TEXT NOT NULL,
+    fetch_time INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS observations (
+    fetch_id INTEGER NOT NULL REFERENCES fetches(fetch_id),
+    resort_key TEXT NOT NULL,
+    endpoint TEXT NOT NULL,
+    observation_time INTEGER NOT NULL,
+    fetch_time INTEGER NOT NULL,
+    {", ".join(f"{field} REAL" for field in NUMERIC_FIELDS)},
+    {", ".join(f"{field} TEXT" for field in TEXT_FIELDS)}
+);
+CREATE INDEX IF NOT EXISTS fetches_by_resort ON fetches (resort_key, endpoint, fetch_time);
+CREATE INDEX IF NOT EXISTS observations_by_resort ON observations (resort_key, endpoint, observation_time, fetch_time);
+CREATE INDEX IF NOT EXISTS observations_by_fetch ON observations (fetch_id, observation_time);
+'''
+
+
+# The endpoints recorded for every resort, in the form Resort and the daemon use
+RECORDED_ENDPOINTS = ("now", "6hr", "96hr")
+
+
+# Returns what a resort last fetched from an endpoint as a ForecastSeries, the realtime weather is a series of one row
+def fetched_series(resort, endpoint):
+    if endpoint == "now":
+        return ForecastSeries.from_payload([resort.weather_now]) if resort.weather_now else ForecastSeries.empty()
+    return getattr(resort, f'series_{endpoint}')
+
+
+# Converts a datetime64 array to integer milliseconds since the epoch
+def to_epoch_ms(times):
+    return times.astype("datetime64[ms]").astype(np.int64)
+
+
+# Raises ValueError if a field isn't one of the stored columns, the names are used to build the SQL
+def check_fields(fields):
+    for field in fields:
+        if field not in STORED_FIELDS:
+            raise ValueError(f'{field!r} is not stored in the history, expected one of {STORED_FIELDS}')
+
+
+class ForecastHistory():
+    # path is the SQLite database file, ":memory:" keeps the history in memory
+    def __init__(self, path, clock=time.time):
+        self.path = path
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(SCHEMA)
+
+    # Records one forecast, see record_many()
+    def record(self, resort_key, endpoint, series, fetch_time=None):
+        self.record_many([(resort_key, endpoint, series)], fetch_time)
+
+    # Records a list of (resort_key, endpoint, ForecastSeries) in a single transaction
+    # fetch_time is in seconds since the epoch and defaults to now
+    def record_many(self, fetches, fetch_time=None):
+        fetch_ms = int(round((self.clock() if fetch_time is None else fetch_time) * 1000))
+        with self._lock, self._connection:
+            cursor = self._connection.cursor()
+            for resort_key, endpoint, series in fetches:
+                cursor.execute(
+                    "INSERT INTO fetches (resort_key, endpoint, fetch_time) VALUES (?, ?, ?)",
+                    (resort_key, endpoint, fetch_ms),
+                )
+                fetch_id = cursor.lastrowid
+                cursor.executemany(
+                    f'INSERT INTO observations VALUES ({", ".join("?" * (5 + len(STORED_FIELDS)))})',
+                    self._rows(fetch_id, resort_key, endpoint, fetch_ms, series),
+                )
+        logger.debug(f'Recorded {len(fetches)} forecasts in the history')
+
+    # Records the realtime weather and the 6hr and 96hr forecasts of every resort in a fleet sweep
+    # results is the dict returned by fetch_fleet()
+    def record_sweep(self, results, fetch_time=None):
+        fetches = []
+        for resort_key, result in results.items():
+            for endpoint in RECORDED_ENDPOINTS:
+                series = fetched_series(result.resort, endpoint)
+                if endpoint not in result.errors and len(series):
+                    fetches.append((resort_key, endpoint, series))
+        self.record_many(fetches, fetch_time)
+        return len(fetches)
+
+    def _rows(self, fetch_id, resort_key, endpoint, fetch_ms, series):
+        columns = []
+        for field in NUMERIC_FIELDS:
+            if field in series and series[field].dtype != object:
+                # NaN is stored as NULL
+                columns.append([None if value != value else value for value in series[field].tolist()])
+            else:
+                columns.append([None] * len(series))
+        for field in TEXT_FIELDS:
+            columns.append(series[field].tolist() if field in series else [None] * len(series))
+
+        observation_times = to_epoch_ms(series.times).tolist()
+        for i, observation_ms in enumerate(observation_times):
+            yield (fetch_id, resort_key, endpoint, observation_ms, fetch_ms) + tuple(column[i] for column in columns)
+
+    # Returns a list of (fetch_time, times, {field: array}) for every forecast of a resort's endpoint issued between two times
+    # since and until are in seconds since the epoch, times is a datetime64[ms] array
+    def forecasts(self, resort_key, endpoint, since=None, until=None, fields=("temp", "precipitation", "precipitation_type")):
+        check_fields(fields)
+        # The fetches are found through the fetches index, then their rows through observations_by_fetch
+        query, params = self._range_query(
+            f'SELECT f.fetch_time, o.observation_time, {", ".join("o." + field for field in fields)} '
+            "FROM fetches f JOIN observations o ON o.fetch_id = f.fetch_id WHERE f.resort_key = ? AND f.endpoint = ?",
+            [resort_key, endpoint],
+            "f.fetch_time",
+            since,
+            until,
+        )
+        with self._lock:
+            rows = self._connection.execute(query + " ORDER BY f.fetch_time, f.fetch_id, o.observation_time", params).fetchall()
+
+        forecasts = []
+        start = 0
+        while start < len(rows):
+            fetch_ms = rows[start][0]
+            end = start
+            while end < len(rows) and rows[end][0] == fetch_ms:
+                end += 1
+            observation_ms, columns = self._arrays([row[1:] for row in rows[start:end]], fields)
+            forecasts.append((fetch_ms / 1000.0, np.array(observation_ms, dtype="datetime64[ms]"), columns))
+            start = end
+        return forecasts
+
+    # Returns (fetch_times, {field: array}) with every forecast made for one hour of a resort's endpoint, oldest first
+    # This shows how the forecast for that hour changed as it got closer
+    def forecasts_for_hour(self, resort_key, endpoint, observation_time, fields=("temp", "precipitation", "precipitation_type")):
+        check_fields(fields)
+        observation_ms = int(to_epoch_ms(np.array([observation_time], dtype="datetime64[ms]"))[0])
+        with self._lock:
+            rows = self._connection.execute(
+                f'SELECT fetch_time, {", ".join(fields)} FROM observations '
+                "WHERE resort_key = ? AND endpoint = ? AND observation_time = ? ORDER BY fetch_time",
+                (resort_key, endpoint, observation_ms),
+            ).fetchall()
+        fetch_ms, columns = self._arrays(rows, fields)
+        return np.array(fetch_ms, dtype=np.int64) / 1000.0, columns
+
+    # Returns the number of fetches recorded for a resort's endpoint, or for everything when resort_key is None
+    def fetch_count(self, resort_key=None, endpoint=None):
+        query, params = "SELECT COUNT(*) FROM fetches WHERE 1 = 1", []
+        if resort_key is not None:
+            query, params = query + " AND resort_key = ?", params + [resort_key]
+        if endpoint is not None:
+            query, params = query + " AND endpoint = ?", params + [endpoint]
+        with self._lock:
+            return self._connection.execute(query, params).fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @staticmethod
+    def _range_query(query, params, column, since, until):
+        if since is not None:
+            query, params = query + f' AND {column} >= ?', params + [int(since * 1000)]
+        if until is not None:
+            query, params = query + f' AND {column} < ?', params + [int(until * 1000)]
+        return query, params
+
+    # Splits rows of (time, field values...) into a list of times and one array per field
+    @staticmethod
+    def _arrays(rows, fields):
+        times = [row[0] for row in rows]
+        columns = {}
+        for i, field in enumerate(fields):
+            values = [row[1 + i] for row in rows]
+            if field in TEXT_FIELDS:
+                columns[field] = np.array(values, dtype=object)
+            else:
+                columns[field] = np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+        return times, columns
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+
+# numpy is used to evaluate every index over the whole fleet's resort x time matrices at once
+
+import logging
+
+import numpy as np
+
+from .matrix import ForecastMatrix, forecast_matrices
+
+"""
+This module derives ski condition indices from the forecast fields of every resort.
+
+An index is a function declared with the @indicator decorator along with the forecast fields it
+reads. It is given a dictionary of field: ForecastMatrix (resort x time, see matrix.py) and returns
+a resort x time array, NaN where its inputs are missing. IndexEngine builds the matrices for every
+field its indices read in one pass, evaluates every index on them and returns one ForecastMatrix
+per index. The result is kept while it is asked for the same Resort objects and none of their forecasts
+has changed (Resort.forecast_versions), so asking again between refreshes costs nothing.
+
+The built in indices:
+    wind_chill       the Environment Canada wind chill (C) from temp and wind_speed, temp where it doesn't apply
+    wind_chill_risk  0 (low) to 5 (extreme), the Environment Canada risk levels of the colder of wind_chill and feels_like
+    rain_on_snow     liquid precipitation (mm/hr) falling above freezing, or as freezing rain at any temperature
+    powder_score     estimated fresh snow (cm) over the trailing POWDER_HOURS, wind affected snow counts for half
+    visibility       1 in hours with little cloud, no precipitation and dry enough air to keep the views, else 0
+
+Register another index with:
+
+    @indicator("bluebird", ("cloud_cover", "wind_speed"))
+    def bluebird(matrices):
+        return (matrices["cloud_cover"].values < 10) & (matrices["wind_speed"].values < 5)
+"""
+
+logger = logging.getLogger(__name__)
+
+# name: Indicator, every index registered with @indicator
+INDICATORS = {}
+
+# Wind chill only applies at or below 10 C with winds of at least 4.8 km/h
+WIND_CHILL_MAX_TEMP = 10.0
+WIND_CHILL_MIN_WIND = 4.8
+# Upper bounds (C) of Environment Canada's wind chill risk levels, from extreme (5) up to moderate (1)
+WIND_CHILL_RISK_LEVELS = (-55.0, -48.0, -40.0, -28.0, -10.0)
+LIQUID_TYPES = ("rain", "freezing rain")
+POWDER_HOURS = 24
+# Wind (m/s) above which new snow is wind affected
+POWDER_WIND = 10.0
+VISIBILITY_MAX_CLOUD = 50.0
+VISIBILITY_MAX_HUMIDITY = 90.0
+VISIBILITY_MAX_PRECIPITATION = 0.1
+
+
+# An index derived from forecast fields, compute takes a dictionary of field: ForecastMatrix
+class Indicator():
+    def __init__(self, name, fields, compute, description=""):
+        self.name = name
+        self.fields = tuple(fields)
+        self.compute = compute
+        self.description = description
+
+    def __repr__(self):
+        return f'Indicator({self.name!r}, {self.fields})'
+
+
+# Decorator that registers a function as the index name, reading fields
+def indicator(name, fields, registry=INDICATORS):
+    def register(compute):
+        registry[name] = Indicator(name, fields, compute, (compute.__doc__ or "").strip())
+        return compute
+
+    return register
+
+
+# Returns the fields the indices read in the form snowReport.resolve_fields() takes, so a sweep can request them
+def index_fields(names=None, span="96hr", registry=INDICATORS):
+    fields = set()
+    for name in names or registry:
+        fields.update(registry[name].fields)
+    return {span: tuple(sorted(fields))}
+
+
+# Returns a boolean array marking the hours whose precipitation_type is one of the categories
+def is_category(types, categories):
+    codes = [types.code(category) for category in categories]
+    return np.isin(types.values, [code for code in codes if code >= 0])
+
+
+# Returns the Environment Canada wind chill for temp (C) and wind_speed (m/s), temp where wind chill doesn't apply
+def wind_chill_values(temp, wind_speed):
+    wind = wind_speed * 3.6
+    with np.errstate(invalid="ignore"):
+        power = np.power(np.maximum(wind, WIND_CHILL_MIN_WIND), 0.16)
+        chill = 13.12 + 0.6215 * temp - 11.37 * power + 0.3965 * temp * power
+        applies = (temp <= WIND_CHILL_MAX_TEMP) & (wind >= WIND_CHILL_MIN_WIND)
+    return np.where(applies, chill, temp)
+
+
+@indicator("wind_chill", ("temp", "wind_speed"))
+def wind_chill(matrices):
+    return wind_chill_values(matrices["temp"].values, matrices["wind_speed"].values)
+
+
+@indicator("wind_chill_risk", ("temp", "wind_speed", "feels_like"))
+def wind_chill_risk(matrices):
+    chill = wind_chill_values(matrices["temp"].values, matrices["wind_speed"].values)
+    coldest = np.fmin(chill, matrices["feels_like"].values)
+    # digitize counts the level bounds at or above each value, 0 levels above it is extreme
+    levels = len(WIND_CHILL_RISK_LEVELS) - np.digitize(coldest, WIND_CHILL_RISK_LEVELS, right=True)
+    return np.where(np.isnan(coldest), np.nan, levels)
+
+
+@indicator("rain_on_snow", ("temp", "precipitation", "precipitation_type"))
+def rain_on_snow(matrices):
+    precipitation = matrices["precipitation"].values
+    types = matrices["precipitation_type"]
+    liquid = is_category(types, LIQUID_TYPES) & (matrices["temp"].values > 0)
+    liquid |= is_category(types, ("freezing rain",))
+    return np.where(liquid, precipitation, np.where(np.isnan(precipitation), np.nan, 0.0))
+
+
+@indicator("powder_score", ("temp", "precipitation", "precipitation_type", "wind_speed"))
+def powder_score(matrices):
+    temp = matrices["temp"].values
+    snow = is_category(matrices["precipitation_type"], ("snow",))
+    # Colder snow is lighter, the snow to liquid ratio goes from 10:1 at 0 C to 25:1 at -15 C
+    ratio = np.clip(10.0 - temp, 8.0, 25.0)
+    fresh = np.where(snow, np.nan_to_num(matrices["precipitation"].values) * np.nan_to_num(ratio, nan=10.0) / 10.0, 0.0)
+    fresh = np.where(matrices["wind_speed"].values > POWDER_WIND, fresh * 0.5, fresh)
+
+    # Trailing sums over POWDER_HOURS columns from prefix sums, the first hours sum what is available
+    cumulative = np.cumsum(fresh, axis=1)
+    trailing = cumulative.copy()
+    trailing[:, POWDER_HOURS:] -= cumulative[:, :-POWDER_HOURS]
+    return np.where(np.isnan(temp) & np.isnan(matrices["precipitation"].values), np.nan, trailing)
+
+
+@indicator("visibility", ("cloud_cover", "humidity", "precipitation"))
+def visibility(matrices):
+    cloud = matrices["cloud_cover"].values
+    humidity = matrices["humidity"].values
+    precipitation = matrices["precipitation"].values
+    with np.errstate(invalid="ignore"):
+        clear = (cloud < VISIBILITY_MAX_CLOUD) & (humidity < VISIBILITY_MAX_HUMIDITY) & (precipitation < VISIBILITY_MAX_PRECIPITATION)
+    missing = np.isnan(cloud) | np.isnan(humidity) | np.isnan(precipitation)
+    return np.where(missing, np.nan, clear.astype(float))
+
+
+class IndexEngine():
+    # names are the indices to evaluate, every registered index by default, span is "96hr" or "6hr"
+    def __init__(self, names=None, span="96hr", registry=INDICATORS):
+        names = list(registry) if names is None else list(names)
+        for name in names:
+            if name not in registry:
+                raise ValueError(f'Unknown index {name!r}, expected one of {list(registry)}')
+        self.indicators = [registry[name] for name in names]
+        self.span = span
+        self.fields = tuple(sorted({field for indicator in self.indicators for field in indicator.fields}))
+        self.evaluations = 0
+        self._key = None
+        self._resorts = None
+        self._results = None
+
+    # Returns a dictionary of index name: ForecastMatrix for a list of Resort objects
+    # The last result is returned again for the same Resort objects while every resort's forecast is unchanged
+    def evaluate(self, resorts):
+        # Versions only count merges into one Resort, so the key holds the object's identity rather than its resort key
+        key = tuple((id(resort), resort.forecast_versions[self.span]) for resort in resorts)
+        if key == self._key:
+            return self._results
+
+        matrices = forecast_matrices(resorts, self.span, self.fields)
+        first = matrices[self.fields[0]]
+        results = {}
+        with np.errstate(invalid="ignore"):
+            for indicator in self.indicators:
+                values = np.asarray(indicator.compute(matrices), dtype=float)
+                if values.shape != first.shape:
+                    raise ValueError(f'Index {indicator.name} returned shape {values.shape}, expected {first.shape}')
+                results[indicator.name] = ForecastMatrix(indicator.name, first.resort_keys, first.times, first.local_times, values)
+
+        self.evaluations += 1
+        self._key = key
+        # Keeps the resorts alive so their ids can't be given to new objects while the key holds them
+        self._resorts = list(resorts)
+        self._results = results
+        logger.debug(f'Evaluated {len(results)} indices for {len(resorts)} resorts')
+        return results
+
+    # Forgets the last result so the next evaluate() computes every index again
+    def clear(self):
+        self._key = None
+        self._resorts = None
+        self._results = None
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+
+# codecs is used to decode the response body chunk by chunk without splitting a multi-byte character
+# JSON is used to decode one row of the response at a time
+
+import codecs
+import json
+import logging
+
+from .series import SKIPPED_KEYS, ForecastSeries
+
+"""
+This module parses nowcast and hourly responses while they are still being downloaded.
+
+The usual path reads the whole response body into one string, decodes it into a list of nested
+dicts (one {"value": ..., "units": ...} dict per field per row) and only then copies the values into
+a ForecastSeries. For a large response that holds three copies of the data at once. Here the body is
+read in chunks and the top level array is decoded one row at a time: each {"value": ..., "units": ...}
+dict is collapsed to its value as soon as it is decoded, fields that weren't requested are dropped,
+and the values are appended straight onto the columns of the series. Only the current chunk and the
+row being decoded are held in memory besides the columns.
+"""
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+WHITESPACE = " \t\n\r"
+
+
+# Returns the object_pairs_hook used to decode rows
+# Each {"value": ..., "units": ...} dict is collapsed to its value, and rows keep only the fields that were asked for
+def row_hook(fields=None):
+    kept = None if fields is None else frozenset(fields) | {"observation_time"}
+
+    def collapse_value(pairs):
+        # The api always puts "value" first, so the loop below only runs for rows
+        if pairs and pairs[0][0] == "value":
+            return pairs[0][1]
+        for name, value in pairs:
+            if name == "value":
+                return value
+        if kept is None:
+            return dict(pairs)
+        return {name: value for name, value in pairs if name in kept}
+
+    return collapse_value
+
+
+# Yields the elements of the JSON array spread over an iterable of bytes or str chunks, one at a time
+# decoder is the json.JSONDecoder used to decode each element
+# Raises ValueError if the chunks don't hold a JSON array
+def iter_json_array(chunks, decoder=None):
+    decoder = decoder or json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    chunks = iter(chunks)
+    buffer = ""
+    position = 0
+    started = False
+    finished = False
+
+    while True:
+        chunk = next(chunks, None)
+        if chunk is None:
+            buffer += text_decoder.decode(b"", final=True)
+            finished = True
+        else:
+            buffer += text_decoder.decode(chunk) if isinstance(chunk, bytes) else chunk
+
+        while True:
+            while position < len(buffer) and buffer[position] in WHITESPACE:
+                position += 1
+            if position == len(buffer):
+                break
+
+            if not started:
+                if buffer[position] != "[":
+                    raise ValueError(f'Expected a JSON array, found {buffer[position]!r}')
+                started = True
+                position += 1
+                continue
+
+            if buffer[position] == "]":
+                return
+            if buffer[position] == ",":
+                position += 1
+                continue
+
+            try:
+                element, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # The element continues in the next chunk
+                if finished:
+                    raise
+                break
+            # A number at the very end of the buffer may still have digits in the next chunk
+            if end == len(buffer) and not finished:
+                break
+            position = end
+            yield element
+
+        # Drop what has been decoded so the buffer only ever holds the element being read
+        buffer = buffer[position:]
+        position = 0
+        if finished:
+            raise ValueError("JSON array ended before its closing bracket")
+
+
+# Reads a nowcast or hourly response body given as an iterable of chunks into plain columns
+# Returns (list of ISO 8601 UTC observation times, dictionary of field: list of values)
+# fields limits which fields are kept, by default every field in the first row is kept
+def parse_columns(chunks, fields=None):
+    decoder = json.JSONDecoder(object_pairs_hook=row_hook(fields))
+    utc_times = []
+    values = None
+    if fields is not None:
+        values = {field: [] for field in fields}
+
+    for row in iter_json_array(chunks, decoder):
+        if values is None:
+            values = {field: [] for field in row if field not in SKIPPED_KEYS}
+        utc_times.append(row["observation_time"])
+        for field, column in values.items():
+            column.append(row.get(field))
+    return utc_times, values or {}
+
+
+# Builds a ForecastSeries from a nowcast or hourly response body given as an iterable of chunks
+# fields limits which fields are kept, by default every field in the first row is kept
+def stream_series(chunks, fields=None):
+    utc_times, values = parse_columns(chunks, fields)
+    if not utc_times:
+        return ForecastSeries.empty()
+    logger.debug(f'Streamed {len(utc_times)} rows of {len(values)} fields')
+    return ForecastSeries.from_columns(utc_times, values)
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+
+# numpy is used to scatter every resort's forecast into one resort x time array per field
+
+import logging
+
+import numpy as np
+
+from .series import TEXT_FIELDS
+from .snowReport import GETTER_FIELDS
+from .timeutil import to_local_times
+
+"""
+This module lines up the forecasts of many resorts so they can be compared hour by hour.
+
+forecast_matrices() returns one ForecastMatrix per field, a resort x time array whose columns are
+the union of every resort's observation times. Hours a resort's forecast doesn't have are NaN. The
+arrays are built in one pass: the times and values of every resort are concatenated, np.unique()
+gives each time its column, and each field is written into its matrix with a single fancy-indexed
+assignment, so no per-resort time:value dictionaries are built.
+
+Text fields such as precipitation_type can't be NaN, so they are stored as int8 codes into
+ForecastMatrix.categories, with MISSING_CODE where there is no value. The usual Climacell
+precipitation types always have the same codes (PRECIPITATION_TYPES), any other value is given the
+next free code.
+"""
+
+logger = logging.getLogger(__name__)
+
+SPANS = ("6hr", "96hr")
+# The precipitation_type values documented by Climacell, their position is their code
+PRECIPITATION_TYPES = ("none", "rain", "snow", "ice pellets", "freezing rain")
+# The code of a text field where there is no value
+MISSING_CODE = -1
+
+
+class ForecastMatrix():
+    __slots__ = ("field", "resort_keys", "times", "local_times", "values", "categories", "_rows")
+
+    # values has one row per resort in resort_keys order and one column per time, times is a datetime64[ms] array in UTC
+    # categories is the list of labels behind the codes of a text field, None for a numeric field
+    def __init__(self, field, resort_keys, times, local_times, values, categories=None):
+        self.field = field
+        self.resort_keys = resort_keys
+        self.times = times
+        self.local_times = local_times
+        self.values = values
+        self.categories = categories
+        self._rows = {resort_key: i for i, resort_key in enumerate(resort_keys)}
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    @property
+    def categorical(self):
+        return self.categories is not None
+
+    # Returns the row of values for one resort
+    def __getitem__(self, resort_key):
+        return self.values[self._rows[resort_key]]
+
+    def __contains__(self, resort_key):
+        return resort_key in self._rows
+
+    # Returns the column of values at one local or UTC time, one value per resort
+    def at(self, time):
+        if isinstance(time, np.datetime64):
+            column = int(np.searchsorted(self.times, time.astype("datetime64[ms]")))
+            found = column < len(self.times) and self.times[column] == time
+        else:
+            column = self.local_times.index(time) if time in self.local_times else None
+            found = column is not None
+        if not found:
+            raise KeyError(time)
+        return self.values[:, column]
+
+    # Returns the code of a category, MISSING_CODE if no value in the matrix has it
+    def code(self, category):
+        return self.categories.index(category) if category in self.categories else MISSING_CODE
+
+    # Returns the values of a text field as an object array of labels, None where there is no value
+    def labels(self):
+        lookup = np.array(list(self.categories) + [None], dtype=object)
+        # MISSING_CODE is -1, which picks the None on the end of lookup
+        return lookup[self.values]
+
+    def __repr__(self):
+        return f'ForecastMatrix({self.field!r}, {len(self.resort_keys)} resorts x {len(self.times)} times)'
+
+
+# Returns a dictionary of field: ForecastMatrix for the 6hr or 96hr forecasts of a list of Resort objects
+# fields defaults to the fields read by the Resort getters, a field a resort didn't request is NaN for that resort
+def forecast_matrices(resorts, span="96hr", fields=GETTER_FIELDS):
+    if span not in SPANS:
+        raise ValueError(f'Unknown span {span!r}, expected one of {SPANS}')
+    return series_matrices([resort.key for resort in resorts], [getattr(resort, f'series_{span}') for resort in resorts], fields)
+
+
+# Same as forecast_matrices() for a list of resort keys and their matching ForecastSeries
+def series_matrices(resort_keys, series_list, fields=GETTER_FIELDS):
+    resort_keys = list(resort_keys)
+    lengths = np.array([len(series) for series in series_list], dtype=np.intp)
+    rows = np.repeat(np.arange(len(series_list)), lengths)
+    if len(rows):
+        times, columns = np.unique(np.concatenate([series.times for series in series_list]), return_inverse=True)
+    else:
+        times, columns = np.array([], dtype="datetime64[ms]"), np.array([], dtype=np.intp)
+    local_times = to_local_times(times)
+    shape = (len(series_list), len(times))
+
+    matrices = {}
+    for field in fields:
+        # Only the rows of resorts whose forecast has this field are written, the others keep the fill value
+        present = [i for i, series in enumerate(series_list) if field in series and len(series)]
+        mask = np.isin(rows, present)
+        values = np.concatenate([series_list[i][field] for i in present]) if present else np.array([])
+
+        if field in TEXT_FIELDS or values.dtype == object:
+            codes, categories = encode_categories(values, PRECIPITATION_TYPES if field == "precipitation_type" else ())
+            matrix = np.full(shape, MISSING_CODE, dtype=np.int8)
+            matrix[rows[mask], columns[mask]] = codes
+        else:
+            categories = None
+            matrix = np.full(shape, np.nan)
+            matrix[rows[mask], columns[mask]] = values
+        matrices[field] = ForecastMatrix(field, resort_keys, times, local_times, matrix, categories)
+
+    logger.debug(f'Built {len(matrices)} matrices of {shape[0]} resorts x {shape[1]} times')
+    return matrices
+
+
+# Returns (int8 codes, categories) for an object array of text values, None becomes MISSING_CODE
+# known are categories that always get the same codes, any other value gets the next code in sorted order
+def encode_categories(values, known=()):
+    categories = list(known)
+    present = ~np.equal(values, None) if len(values) else np.zeros(0, dtype=bool)
+    codes = np.full(len(values), MISSING_CODE, dtype=np.int8)
+    if present.any():
+        uniques, inverse = np.unique(values[present].astype(str), return_inverse=True)
+        uniques = uniques.tolist()
+        categories.extend(value for value in uniques if value not in categories)
+        if len(categories) > np.iinfo(np.int8).max:
+            raise ValueError(f'{len(categories)} categories don\'t fit in int8 codes')
+        lookup = np.array([categories.index(value) for value in uniques], dtype=np.int8)
+        codes[present] = lookup[inverse.ravel()]
+    return codes, categories
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+
+# bisect is used to find the histogram bucket of each observation
+# QueueHandler and QueueListener move log writes off the calling thread, logging.handlers is imported with the first
+# record because it loads socket and would double the time it takes to import snowReport
+
+import atexit
+import bisect
+import logging
+import queue
+import threading
+import time
+
+"""
+This module collects timings from the hot paths of snowApp and exports them.
+
+Each stage records its durations in a histogram labelled by endpoint or span:
+    snowapp_http_request_seconds    time to the response headers, per Climacell endpoint
+    snowapp_parse_seconds           JSON parsing of a response body, per endpoint
+    snowapp_timestamp_seconds       converting observation times to datetime64 and local time
+    snowapp_getter_seconds          building or returning a Resort getter's time:value dictionary
+    snowapp_cycle_seconds           a whole PollingDaemon cycle
+and snowapp_cache_requests_total counts response cache hits and misses per endpoint. REGISTRY.prometheus()
+returns everything in the Prometheus text format and snapshot() as a dictionary for JSON, along with
+the cache hit rate of each endpoint.
+set_enabled(False) turns every timer into a shared no-op.
+
+BackgroundHandler wraps a logging handler so records are put on a queue and written by a
+background thread, which keeps file writes out of the getters.
+"""
+
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+METRIC_HELP = {
+    "snowapp_http_request_seconds": "Time from sending a Climacell request to its response headers",
+    "snowapp_parse_seconds": "Time to parse a Climacell response body",
+    "snowapp_timestamp_seconds": "Time to convert the observation times of a forecast",
+    "snowapp_getter_seconds": "Time spent in the Resort forecast getters",
+    "snowapp_cycle_seconds": "Time taken by a polling daemon cycle",
+    "snowapp_cache_requests_total": "Response cache lookups by result",
+}
+
+
+class Histogram():
+    # buckets are the upper bounds of each bucket in seconds, an extra +Inf bucket holds everything larger
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    # Returns the upper bound of the bucket holding quantile q, an estimate good to the bucket width
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else None,
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+        }
+
+
+class Counter():
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+# Times the block it wraps and records the duration in a histogram
+class _Timer():
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+# Used in place of _Timer when metrics are disabled
+class _NoTimer():
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+NO_TIMER = _NoTimer()
+
+
+class MetricsRegistry():
+    def __init__(self):
+        self.enabled = True
+        # name: (kind, {labels: Histogram or Counter}), labels is a sorted tuple of (label, value)
+        self._metrics = {}
+        # (kind, name, *labels in the order they were given): the metric, a shortcut for _get()
+        self._recent = {}
+        self._lock = threading.Lock()
+
+    # Returns the histogram for a metric name and labels, creating it on first use
+    def histogram(self, name, buckets=DEFAULT_BUCKETS, **labels):
+        return self._get("histogram", name, labels, lambda: Histogram(buckets))
+
+    # Returns the counter for a metric name and labels, creating it on first use
+    def counter(self, name, **labels):
+        return self._get("counter", name, labels, Counter)
+
+    # Returns a context manager that records how long its block takes in the histogram for name and labels
+    def timer(self, name, **labels):
+        if not self.enabled:
+            return NO_TIMER
+        return _Timer(self.histogram(name, **labels))
+
+    # Records value in the histogram for name and labels
+    def observe(self, name, value, **labels):
+        if self.enabled:
+            self.histogram(name, **labels).observe(value)
+
+    # Adds amount to the counter for name and labels
+    def count(self, name, amount=1, **labels):
+        if self.enabled:
+            self.counter(name, **labels).inc(amount)
+
+    def reset(self):
+        with self._lock:
+            self._metrics = {}
+            self._recent = {}
+
+    # Returns every metric in the Prometheus text exposition format
+    def prometheus(self):
+        lines = []
+        for name, (kind, series) in sorted(self._items()):
+            if name in METRIC_HELP:
+                lines.append(f'# HELP {name} {METRIC_HELP[name]}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, metric in sorted(series.items()):
+                if kind == "counter":
+                    lines.append(f'{name}{format_labels(labels)} {metric.value}')
+                    continue
+                cumulative = 0
+                for bound, count in zip(metric.buckets + (float("inf"),), metric.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'{name}_bucket{format_labels(labels + (("le", le),))} {cumulative}')
+                lines.append(f'{name}_sum{format_labels(labels)} {metric.sum!r}')
+                lines.append(f'{name}_count{format_labels(labels)} {metric.count}')
+        return "\n".join(lines) + "\n"
+
+    # Returns every metric as a dictionary of name: list of {"labels": ..., and the values}
+    def snapshot(self):
+        snapshot = {}
+        for name, (kind, series) in sorted(self._items()):
+            snapshot[name] = [
+                dict({"labels": dict(labels)}, **(metric.as_dict() if kind == "histogram" else {"value": metric.value}))
+                for labels, metric in sorted(series.items())
+            ]
+        return snapshot
+
+    def _items(self):
+        with self._lock:
+            return [(name, (kind, dict(series))) for name, (kind, series) in self._metrics.items()]
+
+    def _get(self, kind, name, labels, factory):
+        # Call sites pass their labels in the same order every time, so this lookup skips sorting them
+        metric = self._recent.get((kind, name) + tuple(labels.items()))
+        if metric is not None:
+            return metric
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            entry = self._metrics.setdefault(name, (kind, {}))
+            if entry[0] != kind:
+                raise ValueError(f'{name} is already registered as a {entry[0]}')
+            metric = entry[1].setdefault(key, factory())
+            self._recent[(kind, name) + tuple(labels.items())] = metric
+            return metric
+
+
+# Returns labels as {label="value",...}, or an empty string when there are none
+def format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (f'{label}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"' for label, value in labels)
+    return "{" + ",".join(escaped) + "}"
+
+
+# The registry every module in snowApp records into
+REGISTRY = MetricsRegistry()
+
+
+def timer(name, **labels):
+    return REGISTRY.timer(name, **labels)
+
+
+def observe(name, value, **labels):
+    REGISTRY.observe(name, value, **labels)
+
+
+def count(name, amount=1, **labels):
+    REGISTRY.count(name, amount, **labels)
+
+
+# Returns the share of response cache lookups that were hits for each endpoint, counting disk hits
+def cache_hit_rates(registry=REGISTRY):
+    lookups = {}
+    for sample in registry.snapshot().get("snowapp_cache_requests_total", []):
+        hits, total = lookups.get(sample["labels"]["endpoint"], (0, 0))
+        if sample["labels"]["result"] != "miss":
+            hits += sample["value"]
+        lookups[sample["labels"]["endpoint"]] = (hits, total + sample["value"])
+    return {endpoint: hits / total for endpoint, (hits, total) in sorted(lookups.items()) if total}
+
+
+# Returns REGISTRY.snapshot() with the cache hit rate of each endpoint added, ready to be written as JSON
+def snapshot(registry=REGISTRY):
+    return dict(registry.snapshot(), cache_hit_rate=cache_hit_rates(registry))
+
+
+# Turns the collection of every metric on or off
+def set_enabled(enabled):
+    REGISTRY.enabled = enabled
+
+
+# A handler that puts records on a queue for another handler to write on a background thread
+# The QueueHandler and QueueListener doing the work are created with the first record, so creating it does nothing
+class BackgroundHandler(logging.Handler):
+    def __init__(self, handler):
+        super().__init__()
+        self.handler = handler
+        self.queue = queue.SimpleQueue()
+        self.listener = None
+        self.running = False
+        self._queue_handler = None
+        self._lock = threading.Lock()
+
+    def emit(self, record):
+        if not self.running:
+            self._start()
+        self._queue_handler.emit(record)
+
+    # Writes the records still on the queue and stops the background thread, the next record starts it again
+    def stop(self):
+        with self._lock:
+            if self.running:
+                self.listener.stop()
+                self.running = False
+
+    def close(self):
+        self.stop()
+        self.handler.close()
+        super().close()
+
+    def _start(self):
+        from logging.handlers import QueueHandler, QueueListener
+
+        with self._lock:
+            if self.running:
+                return
+            if self.listener is None:
+                self._queue_handler = QueueHandler(self.queue)
+                self.listener = QueueListener(self.queue, self.handler, respect_handler_level=True)
+                atexit.register(self.stop)
+            self.listener.start()
+            self.running = True
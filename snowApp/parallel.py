@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+
+# concurrent.futures runs the requests on threads and the parsing on a pool of processes
+# multiprocessing is used to start the worker processes with spawn, forking a process that has threads running can deadlock
+
+import json
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+import numpy as np
+
+from . import fleet, snowReport
+from .cache import ResponseCache
+from .ingest import parse_columns
+from .matrix import encode_categories
+from .series import ForecastSeries, to_column
+from .timeutil import parse_utc, to_local_times, utc_datetime64
+
+"""
+This module runs the fleet sweep with the response parsing spread over several processes.
+
+In fetch_fleet() every response is parsed on the thread that requested it, so with thousands of
+resorts the sweep is limited by how fast one core can decode JSON and convert timestamps. Here
+the threads only download the raw bodies. As they arrive the bodies are sent in batches to a
+pool of worker processes, which parse them and send back a CompactSeries per forecast: the
+observation times as one datetime64 array, every numeric field as a float64 array and every text
+field (precipitation_type and so on) as int8 codes plus its list of categories. NumPy arrays are
+pickled as flat buffers, so what crosses between processes is about the size of the data rather
+than a tree of dicts. The parent only turns the codes back into labels and merges the series into
+its Resort, the per-field getter dictionaries are still built only when a getter is called.
+
+The realtime responses are single small rows and are parsed by the worker processes as well so the
+parent does no JSON decoding at all.
+
+    with SweepPool(processes=4) as pool:
+        results = fetch_fleet_processes(resort_keys, pool=pool)
+
+A SweepPool can be kept and reused for every sweep so the worker processes are started once.
+"""
+
+logger = logging.getLogger(__name__)
+
+# Number of bodies sent to a worker process at once
+DEFAULT_BATCH_SIZE = 32
+
+
+# A forecast in the compact form sent back by the worker processes
+class CompactSeries():
+    __slots__ = ("times", "numeric", "text")
+
+    # times is a datetime64[ms] array, numeric maps a field to a float64 array
+    # text maps a field to (int8 codes, list of categories) as returned by matrix.encode_categories()
+    def __init__(self, times, numeric, text):
+        self.times = times
+        self.numeric = numeric
+        self.text = text
+
+    @classmethod
+    def from_columns(cls, utc_times, values):
+        numeric = {}
+        text = {}
+        for field, column in values.items():
+            array = to_column(field, column)
+            if array.dtype == object:
+                text[field] = encode_categories(array)
+            else:
+                numeric[field] = array
+        return cls(utc_datetime64(utc_times), numeric, text)
+
+    # Builds the ForecastSeries, field_order puts the columns in the order they were requested
+    def to_series(self, field_order=None):
+        columns = {}
+        for field, (codes, categories) in self.text.items():
+            # The code -1 for a missing value picks the None on the end of the lookup
+            columns[field] = np.array(list(categories) + [None], dtype=object)[codes]
+        columns.update(self.numeric)
+        if field_order is not None:
+            columns = {field: columns[field] for field in field_order if field in columns}
+        return ForecastSeries(self.times, to_local_times(self.times), columns)
+
+    @property
+    def nbytes(self):
+        return self.times.nbytes + sum(column.nbytes for column in self.numeric.values()) + sum(codes.nbytes for codes, _ in self.text.values())
+
+
+# Parses a batch of response bodies in a worker process
+# jobs is a list of (job id, span, body, fields), returns a list of (job id, parsed value, error message or None)
+# A "now" body becomes its dict, "6hr" and "96hr" bodies become a CompactSeries
+# A body that can't be parsed, whether it isn't JSON or is missing fields, only fails its own job
+def parse_bodies(jobs):
+    parsed = []
+    for job_id, span, body, fields in jobs:
+        try:
+            if span == "now":
+                weather_now = json.loads(body)
+                # Resort.set_now() reads the observation time in the parent, a body without one fails here instead
+                parse_utc(weather_now["observation_time"]["value"])
+                parsed.append((job_id, weather_now, None))
+            else:
+                utc_times, values = parse_columns([body], fields)
+                parsed.append((job_id, CompactSeries.from_columns(utc_times, values), None))
+        except Exception as e:
+            parsed.append((job_id, None, f'{span} response could not be parsed: {e!r}'))
+    return parsed
+
+
+# A pool of worker processes that parse response bodies, it can be reused for many sweeps
+class SweepPool():
+    # processes defaults to the number of cores
+    def __init__(self, processes=None):
+        self.processes = processes or multiprocessing.cpu_count()
+        self.executor = ProcessPoolExecutor(max_workers=self.processes, mp_context=multiprocessing.get_context("spawn"))
+
+    # Starts every worker process now rather than on the first sweep
+    def warm_up(self):
+        list(self.executor.map(parse_bodies, [[]] * self.processes))
+
+    def submit(self, jobs):
+        return self.executor.submit(parse_bodies, jobs)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# Downloads the body of one request, returns (body or None, error or None)
+def _fetch_body(resort, span):
+    endpoint, url, querystring = resort.request_args(span)
+    try:
+        body = resort.client.fetch_raw(endpoint, url, querystring, priority=resort.priority(endpoint))
+    except Exception as e:
+        logger.debug(f'{span} request for {resort.name} raised {e!r}')
+        return None, e
+    if body is None:
+        return None, f'{span} request to Climacell API failed'
+    return body, None
+
+
+# Returns the cache key the client would store this request's parsed response under
+def _cache_key(resort, span):
+    endpoint, _, querystring = resort.request_args(span)
+    return ResponseCache.make_key(endpoint, querystring) if span == "now" else ResponseCache.make_series_key(endpoint, querystring)
+
+
+# Stores a parsed response on every resort that shares the request, returns None if it succeeded or the error if it didn't
+def _store(resorts, span, value):
+    try:
+        for resort in resorts:
+            getattr(resort, fleet.FETCH_METHODS[span][1])(value)
+    except Exception as e:
+        logger.debug(f'{span} response for {resorts[0].name} could not be stored: {e!r}')
+        return e
+    return None
+
+
+# Records the error of a request against every resort that shares it
+def _record_error(results, resorts, span, error):
+    for resort in resorts:
+        results[resort.key].errors[span] = error
+
+
+# Runs the same sweep as fleet.fetch_fleet() with the responses parsed by a pool of worker processes
+# Returns a dict of resort_key: FleetResult, pool is a SweepPool (a new one with `processes` workers is made and closed by default)
+# max_workers is the number of requests in flight, batch_size the number of bodies sent to a worker process at once
+def fetch_fleet_processes(
+    resort_keys=None,
+    pool=None,
+    processes=None,
+    max_workers=fleet.DEFAULT_MAX_WORKERS,
+    endpoints=fleet.ENDPOINTS,
+    client=None,
+    grid_resolution=None,
+    fields=None,
+    batch_size=DEFAULT_BATCH_SIZE,
+):
+    logger.debug(f'Function call: fetch_fleet_processes()')
+    if resort_keys is None:
+        resort_keys = fleet.all_resort_keys()
+    for endpoint in endpoints:
+        if endpoint not in fleet.REQUEST_METHODS:
+            raise ValueError(f'Unknown endpoint {endpoint!r}, expected one of {fleet.ENDPOINTS}')
+
+    results = {
+        resort_key: fleet.FleetResult(resort_key, snowReport.Resort(resort_key, client, grid_resolution=grid_resolution, fields=fields))
+        for resort_key in resort_keys
+    }
+    cells = list(fleet.group_by_cell([result.resort for result in results.values()], grid_resolution).values())
+    requests = sorted(
+        [(resorts, span) for resorts in cells for span in endpoints],
+        key=lambda request: min(resort.priority(fleet.API_ENDPOINTS[request[1]]) for resort in request[0]),
+    )
+
+    owns_pool = pool is None
+    if owns_pool:
+        pool = SweepPool(processes)
+    cache = next(iter(results.values())).resort.client.cache if results else None
+
+    # job id: (resorts, span, cache key)
+    jobs = {}
+    parse_futures = []
+    batch = []
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as threads:
+            futures = {}
+            for resorts, span in requests:
+                key = _cache_key(resorts[0], span)
+                cached = cache.get(key) if cache is not None else None
+                if cached is not None:
+                    error = _store(resorts, span, cached)
+                    if error is not None:
+                        _record_error(results, resorts, span, error)
+                    continue
+                futures[threads.submit(_fetch_body, resorts[0], span)] = (resorts, span, key)
+
+            for future in as_completed(futures):
+                resorts, span, key = futures[future]
+                body, error = future.result()
+                if error is not None:
+                    _record_error(results, resorts, span, error)
+                    continue
+                job_id = len(jobs)
+                jobs[job_id] = (resorts, span, key)
+                batch.append((job_id, span, body, resorts[0].fields[span].split(",")))
+                if len(batch) >= batch_size:
+                    parse_futures.append(pool.submit(batch))
+                    batch = []
+        if batch:
+            parse_futures.append(pool.submit(batch))
+
+        for future in as_completed(parse_futures):
+            for job_id, value, error in future.result():
+                resorts, span, key = jobs[job_id]
+                if error is None:
+                    if span != "now":
+                        value = value.to_series(resorts[0].fields[span].split(","))
+                    error = _store(resorts, span, value)
+                if error is not None:
+                    _record_error(results, resorts, span, error)
+                elif cache is not None:
+                    cache.set(key, value)
+    finally:
+        if owns_pool:
+            pool.close()
+
+    failed = sum(1 for result in results.values() if not result.ok)
+    logger.debug(f'fetch_fleet_processes() completed for {len(results)} resorts in {len(jobs)} parsed responses, {failed} with errors')
+    return results
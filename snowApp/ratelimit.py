@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+
+# heapq is used to hand out tokens to the most urgent waiting request first
+# email.utils is used to read Retry-After headers given as an HTTP date, it is imported when one arrives
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+"""
+This module keeps the requests sent to the Climacell API inside our allowance.
+
+RateLimiter combines:
+    - a token bucket that caps the request rate (rate tokens a second, up to burst at once)
+    - a quota of daily_limit requests per window (a UTC day by default), with a share reserved for
+      urgent requests
+    - pacing of low priority requests, which may only spend their share of the quota as fast as the
+      window passes (plus low_burst), so a sweep every few minutes can't use the whole day's quota
+      by mid-morning
+    - a pause for every request after the api answers 429, for as long as its Retry-After header asks
+
+Requests have a priority where lower numbers are more urgent, see request_priority(). When several
+threads are waiting, the token goes to the most urgent one. usage() reports how much of the budget
+has been spent.
+"""
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RATE = 3.0
+DEFAULT_BURST = 10
+DEFAULT_RESERVE = 0.2
+DEFAULT_LOW_BURST = 50
+DAY = 24 * 60 * 60
+# Seconds to pause after a 429 without a readable Retry-After header
+DEFAULT_RETRY_AFTER = 60
+
+# Near-term endpoints are refreshed first, their data goes stale fastest
+ENDPOINT_PRIORITY = {
+    "realtime": 0,
+    "nowcast": 1,
+    "hourly": 2,
+}
+# Added to the priority of resorts that aren't starred, every request at or above LOW_PRIORITY is paced
+UNSTARRED_OFFSET = 3
+LOW_PRIORITY = UNSTARRED_OFFSET
+DEFAULT_PRIORITY = LOW_PRIORITY
+
+
+class QuotaExceeded(Exception):
+    pass
+
+
+# Raised when a request would have to wait longer than the caller allowed
+class RateLimitExceeded(Exception):
+    pass
+
+
+# Returns the priority of a request to an endpoint ("realtime", "nowcast" or "hourly"), lower is more urgent
+def request_priority(endpoint, starred=False):
+    return ENDPOINT_PRIORITY.get(endpoint, ENDPOINT_PRIORITY["hourly"]) + (0 if starred else UNSTARRED_OFFSET)
+
+
+# Returns the number of seconds asked for by a Retry-After header, which is either a number of seconds or an HTTP date
+def parse_retry_after(value, now=None):
+    if value is None:
+        return DEFAULT_RETRY_AFTER
+    value = value.strip()
+    if value.isdigit():
+        return int(value)
+    from email.utils import parsedate_to_datetime
+
+    try:
+        retry_at = parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return DEFAULT_RETRY_AFTER
+    return max(0.0, retry_at - (time.time() if now is None else now))
+
+
+class TokenBucket():
+    # rate is the number of tokens added a second, capacity the most tokens held at once
+    def __init__(self, rate, capacity, clock=time.time):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = float(capacity)
+        self.updated = clock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    # Returns the number of seconds until a token is available
+    def wait_time(self, now=None):
+        self._refill(self.clock() if now is None else now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    # Takes a token if one is available, returns True if it did
+    def try_take(self, now=None):
+        if self.wait_time(now) > 0:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class RateLimiter():
+    # rate and burst size the token bucket, daily_limit is the number of requests allowed per window (None for no quota)
+    # reserve is the share of daily_limit kept for requests more urgent than LOW_PRIORITY
+    # low_burst is how far low priority requests may run ahead of spreading their share evenly over the window
+    def __init__(
+        self,
+        rate=DEFAULT_RATE,
+        burst=DEFAULT_BURST,
+        daily_limit=None,
+        reserve=DEFAULT_RESERVE,
+        low_burst=DEFAULT_LOW_BURST,
+        window=DAY,
+        clock=time.time,
+    ):
+        self.bucket = TokenBucket(rate, burst, clock)
+        self.daily_limit = daily_limit
+        self.reserve = reserve
+        self.low_burst = low_burst
+        self.window = window
+        self.clock = clock
+
+        self.blocked_until = 0.0
+        self.throttled = 0
+        self.deferred = 0
+        self._window_start = self._current_window(clock())
+        self._used = 0
+        self._low_used = 0
+        self._by_priority = {}
+
+        self._condition = threading.Condition()
+        self._waiting = []
+        self._sequence = itertools.count()
+
+    # Waits for permission to send one request, the most urgent waiting request goes first
+    # Raises QuotaExceeded if the quota left can't be spent on this priority, and RateLimitExceeded if the
+    # request would have to wait longer than timeout seconds
+    def acquire(self, priority=DEFAULT_PRIORITY, timeout=None):
+        deadline = None if timeout is None else self.clock() + timeout
+        with self._condition:
+            ticket = (priority, next(self._sequence))
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    now = self.clock()
+                    self._check_quota(priority, now)
+                    if self._waiting[0] == ticket:
+                        wait = self._wait_time(priority, now)
+                        if wait <= 0:
+                            self._take(priority, now)
+                            return
+                    else:
+                        # A more urgent request is waiting, check again when it has gone
+                        wait = None
+                    if deadline is None:
+                        self._condition.wait(wait)
+                        continue
+                    remaining = deadline - now
+                    if remaining <= 0 or wait is not None and wait > remaining:
+                        self.deferred += 1
+                        raise RateLimitExceeded(f'Request of priority {priority} can\'t be sent within {timeout} s')
+                    self._condition.wait(remaining if wait is None else wait)
+            finally:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._condition.notify_all()
+
+    # Takes permission to send one request without waiting, returns True if it was given
+    def try_acquire(self, priority=DEFAULT_PRIORITY):
+        try:
+            self.acquire(priority, timeout=0)
+        except (QuotaExceeded, RateLimitExceeded):
+            return False
+        return True
+
+    # Pauses every request for the number of seconds the api asked for in a 429 response
+    def retry_after(self, seconds):
+        with self._condition:
+            self.throttled += 1
+            self.blocked_until = max(self.blocked_until, self.clock() + seconds)
+            logger.debug(f'Climacell API asked to retry after {seconds:.0f} s, pausing every request')
+
+    # Returns a dictionary describing how much of the budget has been spent
+    def usage(self):
+        with self._condition:
+            now = self.clock()
+            self._roll_window(now)
+            self.bucket.wait_time(now)
+            usage = {
+                "used": self._used,
+                "low_priority_used": self._low_used,
+                "daily_limit": self.daily_limit,
+                "remaining": None if self.daily_limit is None else self.daily_limit - self._used,
+                "used_fraction": None if not self.daily_limit else self._used / self.daily_limit,
+                "resets_in": self._window_start + self.window - now,
+                "tokens": self.bucket.tokens,
+                "rate": self.bucket.rate,
+                "blocked_for": max(0.0, self.blocked_until - now),
+                "throttled": self.throttled,
+                "deferred": self.deferred,
+                "waiting": len(self._waiting),
+                "by_priority": dict(sorted(self._by_priority.items())),
+            }
+        return usage
+
+    def _current_window(self, now):
+        return now - now % self.window
+
+    def _roll_window(self, now):
+        window_start = self._current_window(now)
+        if window_start != self._window_start:
+            logger.debug(f'New quota window, {self._used} requests were sent in the last one')
+            self._window_start = window_start
+            self._used = 0
+            self._low_used = 0
+            self._by_priority = {}
+
+    @property
+    def _low_limit(self):
+        return self.daily_limit - int(self.daily_limit * self.reserve)
+
+    def _check_quota(self, priority, now):
+        self._roll_window(now)
+        if self.daily_limit is None:
+            return
+        if self._used >= self.daily_limit:
+            raise QuotaExceeded(f'Daily quota of {self.daily_limit} requests used up')
+        if priority >= LOW_PRIORITY and self._low_used >= self._low_limit:
+            raise QuotaExceeded(f'Only the {self.daily_limit - self._used} requests reserved for urgent requests are left')
+
+    # Returns the seconds this request has to wait for the token bucket, a Retry-After pause or low priority pacing
+    def _wait_time(self, priority, now):
+        wait = max(self.bucket.wait_time(now), self.blocked_until - now)
+        if priority >= LOW_PRIORITY and self.daily_limit is not None:
+            # The low priority share may be spent evenly over the window, plus low_burst ahead of that
+            allowed_at = self._window_start + (self._low_used + 1 - self.low_burst) / self._low_limit * self.window
+            wait = max(wait, allowed_at - now)
+        return wait
+
+    def _take(self, priority, now):
+        self.bucket.try_take(now)
+        self._used += 1
+        if priority >= LOW_PRIORITY:
+            self._low_used += 1
+        self._by_priority[priority] = self._by_priority.get(priority, 0) + 1
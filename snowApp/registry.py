@@ -0,0 +1,440 @@
+#!/usr/bin/env python3
+
+# JSON is used to read and write the skiResorts.json file
+# os is used to check the file's modification time before reusing the parsed copy, and to replace it atomically
+# csv, sqlite3 and tempfile are imported when a CSV is read, a SQLite registry is opened or the file is written,
+# so importing snowReport doesn't load them
+
+import json
+import logging
+import math
+import os
+import re
+import threading
+
+"""
+This module holds the registry of ski resorts read from skiResorts.json.
+
+The file is parsed once and kept in memory as ResortRecord objects indexed by key, by name and by
+country. Every lookup checks the file's modification time and size, and the file is only parsed
+again when one of them has changed, so a resort added with add_new_resort() is picked up without
+re-reading the file for every Resort that is created.
+
+Changes are applied in bulk with apply(add=..., update=..., remove=...), or add(), update() and
+remove(). Every change in a call is validated first (coordinates in range, keys that exist or don't),
+then the whole file is written once to a temporary file that replaces skiResorts.json, so a crash
+mid-write leaves the previous file in place and adding a region of 500 resorts is one write rather
+than 500. read_records() reads resorts to add from a CSV or GeoJSON file.
+
+For registries of thousands of resorts SQLiteResortRegistry keeps the same records in a SQLite
+database: lookups are indexed queries rather than a parsed file held in memory, and a change only
+writes the rows it touches. open_registry() picks the backing from the file extension.
+"""
+
+logger = logging.getLogger(__name__)
+
+# File extensions opened as a SQLiteResortRegistry by open_registry()
+SQLITE_EXTENSIONS = (".db", ".sqlite", ".sqlite3")
+# Columns of a resort CSV, key is optional and made from the name when it is missing or empty
+CSV_COLUMNS = ("key", "name", "country", "lat", "lon")
+
+SQLITE_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS resorts (
+    position INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    country TEXT NOT NULL,
+    lat REAL NOT NULL,
+    lon REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS resorts_by_name ON resorts (name);
+CREATE INDEX IF NOT EXISTS resorts_by_country ON resorts (country COLLATE NOCASE);
+'''
+
+
+# The location parameters of one resort in skiResorts.json
+class ResortRecord():
+    __slots__ = ("key", "name", "country", "lat", "lon")
+
+    def __init__(self, key, name, country, lat, lon):
+        self.key = key
+        self.name = name
+        self.country = country
+        self.lat = lat
+        self.lon = lon
+
+    # Builds a record from a key and its entry in skiResorts.json
+    @classmethod
+    def from_dict(cls, key, resort_dict):
+        return cls(key, resort_dict["name"], resort_dict["country"], resort_dict["lat"], resort_dict["lon"])
+
+    # Returns the entry as it is stored in skiResorts.json
+    def as_dict(self):
+        return {"name": self.name, "country": self.country, "lat": self.lat, "lon": self.lon}
+
+    def __eq__(self, other):
+        if not isinstance(other, ResortRecord):
+            return NotImplemented
+        return all(getattr(self, slot) == getattr(other, slot) for slot in self.__slots__)
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __repr__(self):
+        return f'ResortRecord({self.key!r}, {self.name!r}, {self.country!r}, {self.lat!r}, {self.lon!r})'
+
+
+# Raises ValueError if a record has an empty key, name or country, or coordinates that aren't a real place
+# Coordinates may be numbers or numeric strings, skiResorts.json has both
+def validate_record(record):
+    for slot in ("key", "name", "country"):
+        value = getattr(record, slot)
+        if not isinstance(value, str) or not value.strip():
+            raise ValueError(f'Resort {record.key!r} has no {slot}')
+    for slot, limit in (("lat", 90), ("lon", 180)):
+        value = getattr(record, slot)
+        try:
+            value = float(value) if not isinstance(value, bool) else math.nan
+        except (TypeError, ValueError):
+            value = math.nan
+        if not math.isfinite(value):
+            raise ValueError(f'Resort {record.key!r} has a {slot} of {getattr(record, slot)!r}, expected a number')
+        if not -limit <= value <= limit:
+            raise ValueError(f'Resort {record.key!r} has a {slot} of {value}, expected -{limit} to {limit}')
+
+
+# Returns a resort key made from a name in the style of skiResorts.json, "Lake Louise" becomes "lakeLouise"
+def make_key(name):
+    words = re.findall(r"[A-Za-z0-9]+", name)
+    if not words:
+        raise ValueError(f'Cannot make a resort key from the name {name!r}')
+    return words[0].lower() + "".join(word[:1].upper() + word[1:] for word in words[1:])
+
+
+# Checks a set of changes against the keys a registry holds, contains tells whether a key is in the registry
+# add and update are lists of ResortRecord, remove a list of keys
+# Raises ValueError (or KeyError for a key to update or remove that isn't there) before anything is written
+def check_changes(contains, add, update, remove):
+    seen = set()
+    for record in add + update:
+        validate_record(record)
+    for key in [record.key for record in add + update] + remove:
+        if key in seen:
+            raise ValueError(f'Resort {key!r} is changed more than once')
+        seen.add(key)
+    for record in add:
+        if contains(record.key):
+            raise ValueError(f'Resort {record.key!r} already exists')
+    for key in [record.key for record in update] + remove:
+        if not contains(key):
+            raise KeyError(key)
+
+
+# Splits records into (new records, records of resorts that exist), replace=False raises ValueError for a resort that exists
+def split_new(contains, records, replace):
+    add = []
+    update = []
+    for record in records:
+        if not contains(record.key):
+            add.append(record)
+        elif replace:
+            update.append(record)
+        else:
+            raise ValueError(f'Resort {record.key!r} already exists')
+    return add, update
+
+
+# Returns the list of ResortRecord in a CSV file with the columns key (optional), name, country, lat and lon
+def read_csv(path):
+    import csv
+
+    records = []
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        missing = [column for column in CSV_COLUMNS[1:] if column not in (reader.fieldnames or ())]
+        if missing:
+            raise ValueError(f'{path} is missing the columns {missing}')
+        for line, row in enumerate(reader, start=2):
+            try:
+                lat, lon = float(row["lat"]), float(row["lon"])
+            except (TypeError, ValueError):
+                raise ValueError(f'{path} line {line}: lat and lon must be numbers, got {row["lat"]!r} and {row["lon"]!r}')
+            name = row["name"].strip()
+            key = (row.get("key") or "").strip() or make_key(name)
+            records.append(ResortRecord(key, name, row["country"].strip(), lat, lon))
+    return records
+
+
+# Returns the list of ResortRecord in a GeoJSON FeatureCollection of Point features
+# Each feature's properties hold the name, the country and optionally the key, its coordinates are [lon, lat]
+def read_geojson(path):
+    with open(path, "r", encoding="utf-8") as f:
+        collection = json.load(f)
+
+    records = []
+    for i, feature in enumerate(collection.get("features", ())):
+        geometry = feature.get("geometry") or {}
+        if geometry.get("type") != "Point":
+            raise ValueError(f'{path} feature {i} is a {geometry.get("type")!r}, expected a Point')
+        lon, lat = geometry["coordinates"][:2]
+        properties = feature.get("properties") or {}
+        name = properties.get("name", "")
+        key = properties.get("key") or make_key(name)
+        records.append(ResortRecord(key, name, properties.get("country", ""), lat, lon))
+    return records
+
+
+# Returns the records in a .csv, .geojson or .json (GeoJSON) file
+def read_records(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        return read_csv(path)
+    if extension in (".geojson", ".json"):
+        return read_geojson(path)
+    raise ValueError(f'Cannot read resorts from {path}, expected a .csv, .geojson or .json file')
+
+
+# Returns a SQLiteResortRegistry for a .db, .sqlite or .sqlite3 path and a ResortRegistry for anything else
+def open_registry(path):
+    if os.path.splitext(path)[1].lower() in SQLITE_EXTENSIONS:
+        return SQLiteResortRegistry(path)
+    return ResortRegistry(path)
+
+
+class ResortRegistry():
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._signature = None
+        self._by_key = {}
+        self._by_name = {}
+        self._by_country = {}
+
+    # Returns the record for resort_key, raises KeyError if there is no such resort
+    def get(self, resort_key):
+        return self._indexes()[0][resort_key]
+
+    def __getitem__(self, resort_key):
+        return self.get(resort_key)
+
+    def __contains__(self, resort_key):
+        return resort_key in self._indexes()[0]
+
+    def __len__(self):
+        return len(self._indexes()[0])
+
+    # Iterates over the records in the order they appear in the file
+    def __iter__(self):
+        return iter(list(self._indexes()[0].values()))
+
+    def keys(self):
+        return list(self._indexes()[0])
+
+    # Returns the record for the resort called name, raises KeyError if there is no such resort
+    def by_name(self, name):
+        return self._indexes()[1][name]
+
+    # Returns the list of records for the resorts in country, the match ignores case
+    def in_country(self, country):
+        return list(self._indexes()[2].get(country.lower(), ()))
+
+    # Parses the file again even if it hasn't changed
+    def reload(self):
+        with self._lock:
+            self._load(self._stat())
+
+    # Applies every change with a single write of the file, add and update are lists of ResortRecord, remove a list of keys
+    # Updated resorts keep their place in the file and added ones go on the end
+    # Nothing is written if any change is invalid, see check_changes()
+    def apply(self, add=(), update=(), remove=()):
+        add, update, remove = list(add), list(update), list(remove)
+        with self._lock:
+            signature = self._stat()
+            if signature != self._signature:
+                self._load(signature)
+            check_changes(self._by_key.__contains__, add, update, remove)
+
+            by_key = dict(self._by_key)
+            for key in remove:
+                del by_key[key]
+            for record in update + add:
+                by_key[record.key] = record
+            self._write(by_key)
+            self._index(by_key.values())
+            self._signature = self._stat()
+        logger.debug(f'Registry changed: {len(add)} added, {len(update)} updated, {len(remove)} removed')
+
+    # Adds a list of ResortRecord, replace=True updates the resorts that already exist instead of raising ValueError
+    def add(self, records, replace=False):
+        with self._lock:
+            self._refresh()
+            add, update = split_new(self._by_key.__contains__, records, replace)
+        self.apply(add=add, update=update)
+
+    def update(self, records):
+        self.apply(update=records)
+
+    def remove(self, resort_keys):
+        self.apply(remove=resort_keys)
+
+    # Returns the (by key, by name, by country) indexes, parsing the file first if it has changed
+    def _indexes(self):
+        with self._lock:
+            self._refresh()
+            return self._by_key, self._by_name, self._by_country
+
+    # Parses the file if it has changed, the lock must be held
+    def _refresh(self):
+        signature = self._stat()
+        if signature != self._signature:
+            self._load(signature)
+
+    def _stat(self):
+        stat = os.stat(self.path)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _load(self, signature):
+        logger.debug(f'Loading resort registry from {self.path}')
+        with open(self.path, "r") as f:
+            resort_dict_list = json.load(f)
+
+        self._index(ResortRecord.from_dict(resort_key, resort_dict) for resort_key, resort_dict in resort_dict_list.items())
+        self._signature = signature
+
+    def _index(self, records):
+        by_key = {}
+        by_name = {}
+        by_country = {}
+        for record in records:
+            by_key[record.key] = record
+            by_name[record.name] = record
+            by_country.setdefault(record.country.lower(), []).append(record)
+
+        self._by_key, self._by_name, self._by_country = by_key, by_name, by_country
+
+    # Writes the records to a temporary file next to skiResorts.json then renames it over the file
+    # The rename is atomic, so the file is always either the old registry or the new one
+    def _write(self, by_key):
+        import tempfile
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".skiResorts.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump({key: record.as_dict() for key, record in by_key.items()}, f, indent=4)
+                f.flush()
+                os.fsync(f.fileno())
+            # mkstemp creates the file readable only by its owner, keep the permissions the registry had
+            os.chmod(temp_path, os.stat(self.path).st_mode & 0o7777)
+            os.replace(temp_path, self.path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+
+# The same registry kept in a SQLite database, for resort lists that grow into the thousands
+# Every lookup is a query on an indexed table, so nothing is parsed up front and a change only writes the rows it touches
+# Coordinates are stored as numbers, a "51.1784" in skiResorts.json comes back as 51.1784
+class SQLiteResortRegistry():
+    # path is the database file, ":memory:" keeps the registry in memory
+    def __init__(self, path):
+        import sqlite3
+
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(SQLITE_SCHEMA)
+
+    # Copies every resort in a skiResorts.json file into a new or empty database at path
+    @classmethod
+    def from_json(cls, json_path, path):
+        registry = cls(path)
+        registry.apply(add=list(ResortRegistry(json_path)))
+        return registry
+
+    # Writes the registry out as a skiResorts.json file
+    def to_json(self, json_path):
+        with open(json_path, "w") as f:
+            json.dump({record.key: record.as_dict() for record in self}, f, indent=4)
+
+    def get(self, resort_key):
+        rows = self._query("SELECT key, name, country, lat, lon FROM resorts WHERE key = ?", (resort_key,))
+        if not rows:
+            raise KeyError(resort_key)
+        return ResortRecord(*rows[0])
+
+    def __getitem__(self, resort_key):
+        return self.get(resort_key)
+
+    def __contains__(self, resort_key):
+        return bool(self._query("SELECT 1 FROM resorts WHERE key = ?", (resort_key,)))
+
+    def __len__(self):
+        return self._query("SELECT COUNT(*) FROM resorts")[0][0]
+
+    def __iter__(self):
+        return iter([ResortRecord(*row) for row in self._query("SELECT key, name, country, lat, lon FROM resorts ORDER BY position")])
+
+    def keys(self):
+        return [row[0] for row in self._query("SELECT key FROM resorts ORDER BY position")]
+
+    # Like ResortRegistry, the last resort in the registry with the name wins
+    def by_name(self, name):
+        rows = self._query("SELECT key, name, country, lat, lon FROM resorts WHERE name = ? ORDER BY position DESC LIMIT 1", (name,))
+        if not rows:
+            raise KeyError(name)
+        return ResortRecord(*rows[0])
+
+    def in_country(self, country):
+        rows = self._query("SELECT key, name, country, lat, lon FROM resorts WHERE country = ? COLLATE NOCASE ORDER BY position", (country,))
+        return [ResortRecord(*row) for row in rows]
+
+    # Every query reads the database, there is nothing to reload
+    def reload(self):
+        pass
+
+    # Applies every change in one transaction, see ResortRegistry.apply()
+    def apply(self, add=(), update=(), remove=()):
+        add, update, remove = list(add), list(update), list(remove)
+        with self._lock, self._connection:
+            check_changes(self._contains, add, update, remove)
+            self._connection.executemany("DELETE FROM resorts WHERE key = ?", [(key,) for key in remove])
+            self._connection.executemany(
+                "UPDATE resorts SET name = ?, country = ?, lat = ?, lon = ? WHERE key = ?",
+                [(record.name, record.country, record.lat, record.lon, record.key) for record in update],
+            )
+            self._connection.executemany(
+                "INSERT INTO resorts (key, name, country, lat, lon) VALUES (?, ?, ?, ?, ?)",
+                [(record.key, record.name, record.country, record.lat, record.lon) for record in add],
+            )
+        logger.debug(f'Registry changed: {len(add)} added, {len(update)} updated, {len(remove)} removed')
+
+    def add(self, records, replace=False):
+        with self._lock:
+            add, update = split_new(self._contains, records, replace)
+        self.apply(add=add, update=update)
+
+    def update(self, records):
+        self.apply(update=records)
+
+    def remove(self, resort_keys):
+        self.apply(remove=resort_keys)
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _query(self, query, params=()):
+        with self._lock:
+            return self._connection.execute(query, params).fetchall()
+
+    # The lock must be held
+    def _contains(self, resort_key):
+        return self._connection.execute("SELECT 1 FROM resorts WHERE key = ?", (resort_key,)).fetchone() is not None
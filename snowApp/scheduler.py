@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+
+# numpy is used to score the forecasts and to compare a forecast with the one fetched before it
+
+import logging
+
+import numpy as np
+
+from . import fleet
+from .daemon import DEFAULT_CADENCES, PollingDaemon, cache_ttls
+
+"""
+This module picks how soon each resort's forecasts are refreshed from what the last fetch showed.
+
+PollingDaemon refreshes every resort on the same cadence, so a resort with a bone dry 96 hour
+forecast costs as many calls as one in the middle of a storm. AdaptiveScheduler gives the daemon a
+refresh interval per resort and endpoint instead. After every refresh it scores the resort's
+activity from 0 (quiet) to 1 (busy), taking the highest of:
+    - the highest precipitation_probability over the next HORIZON_HOURS of the 96hr forecast
+    - the heaviest precipitation in that time, HEAVY_PRECIPITATION mm/hr or more scores 1
+    - SNOW_ACTIVITY if any of it falls as snow
+    - how far the forecast moved since the previous fetch: the mean change in temp over TEMP_SHIFT,
+      in precipitation_probability over PROBABILITY_SHIFT, and the share of hours whose precipitation_type changed
+The 6hr nowcast is scored over its whole length, and the realtime weather on its own values and the nowcast.
+The endpoint's cadence is then scaled between max_factor (activity 0) and min_factor (activity 1) on
+a geometric scale, so an activity of 0.5 keeps the daemon's cadence.
+
+    scheduler = AdaptiveScheduler()
+    daemon = PollingDaemon(scheduler=scheduler)
+
+simulate() runs a daemon against recorded fixtures on a simulated clock and counts the requests, so
+the calls saved against fixed interval polling can be measured, see benchmarks/bench_scheduler.py.
+"""
+
+logger = logging.getLogger(__name__)
+
+# Shortest and longest interval as a multiple of the endpoint's cadence
+DEFAULT_MIN_FACTOR = 0.5
+DEFAULT_MAX_FACTOR = 4.0
+# Hours of the 96hr forecast that are scored, the nowcast is scored over its whole length
+HORIZON_HOURS = 24
+SNOW_ACTIVITY = 0.75
+# mm/hr of precipitation that scores an activity of 1
+HEAVY_PRECIPITATION = 1.0
+# Mean change between fetches that scores an activity of 1
+TEMP_SHIFT = 3.0
+PROBABILITY_SHIFT = 30.0
+
+
+# Returns the highest value of a column, 0 when it is empty or every value is missing
+def column_max(column):
+    column = np.asarray(column, dtype=float)
+    if not len(column) or np.isnan(column).all():
+        return 0.0
+    return float(np.nanmax(column))
+
+
+# Returns the activity of the first `rows` rows of a ForecastSeries (every row when rows is None)
+def forecast_activity(series, rows=None):
+    if not len(series):
+        return 0.0
+    window = slice(0, rows)
+    activity = 0.0
+    if "precipitation_probability" in series:
+        activity = max(activity, column_max(series["precipitation_probability"][window]) / 100.0)
+    if "precipitation" in series:
+        activity = max(activity, column_max(series["precipitation"][window]) / HEAVY_PRECIPITATION)
+    if "precipitation_type" in series and bool(np.any(series["precipitation_type"][window] == "snow")):
+        activity = max(activity, SNOW_ACTIVITY)
+    return min(activity, 1.0)
+
+
+# Returns how far a forecast moved from the previous one over the hours both cover, 0 (unchanged) to 1
+def forecast_shift(previous, current):
+    if previous is None or not len(previous) or not len(current):
+        return 0.0
+    _, old, new = np.intersect1d(previous.times, current.times, return_indices=True)
+    if not len(old):
+        return 0.0
+
+    shift = 0.0
+    for field, scale in (("temp", TEMP_SHIFT), ("precipitation_probability", PROBABILITY_SHIFT)):
+        if field in previous and field in current:
+            change = np.abs(current[field][new] - previous[field][old])
+            if not np.isnan(change).all():
+                shift = max(shift, float(np.nanmean(change)) / scale)
+    if "precipitation_type" in previous and "precipitation_type" in current:
+        changed = current["precipitation_type"][new] != previous["precipitation_type"][old]
+        shift = max(shift, float(np.mean(changed)))
+    return min(shift, 1.0)
+
+
+class AdaptiveScheduler():
+    # cadences maps an endpoint to its usual refresh interval in seconds, the daemon's defaults by default
+    # min_factor and max_factor bound the interval as multiples of the cadence
+    def __init__(self, cadences=None, min_factor=DEFAULT_MIN_FACTOR, max_factor=DEFAULT_MAX_FACTOR, horizon=HORIZON_HOURS):
+        if not 0 < min_factor <= max_factor:
+            raise ValueError(f'Expected 0 < min_factor <= max_factor, got {min_factor} and {max_factor}')
+        self.cadences = dict(DEFAULT_CADENCES if cadences is None else cadences)
+        self.min_factor = min_factor
+        self.max_factor = max_factor
+        self.horizon = horizon
+        # (resort_key, endpoint): the forecast seen at the last refresh, to measure how far the next one moved
+        self._previous = {}
+        # (resort_key, endpoint): the last activity scored
+        self.activities = {}
+
+    # Returns the activity of a resort's endpoint from 0 to 1, previous is the forecast seen at the last refresh
+    def activity(self, resort, endpoint, previous=None):
+        if endpoint == "now":
+            precipitation = resort.now_precipitation or 0.0
+            activity = min(precipitation / HEAVY_PRECIPITATION, 1.0)
+            if resort.now_precipitation_type == "snow":
+                activity = max(activity, SNOW_ACTIVITY)
+            return max(activity, forecast_activity(resort.series_6hr))
+
+        series = getattr(resort, f'series_{endpoint}')
+        rows = self.horizon if endpoint == "96hr" else None
+        return max(forecast_activity(series, rows), forecast_shift(previous, series))
+
+    # Returns the seconds until a resort's endpoint should be refreshed again, call it once after every refresh
+    def interval(self, resort, endpoint):
+        key = (resort.key, endpoint)
+        previous = self._previous.get(key)
+        activity = self.activity(resort, endpoint, previous)
+        if endpoint != "now":
+            self._previous[key] = getattr(resort, f'series_{endpoint}')
+        self.activities[key] = activity
+
+        factor = self.max_factor * (self.min_factor / self.max_factor) ** activity
+        interval = self.cadences[endpoint] * factor
+        logger.debug(f'{resort.key} {endpoint} activity {activity:.2f}, next refresh in {interval:.0f} s')
+        return interval
+
+    # Returns response cache TTLs short enough that the quickest refresh of each endpoint still reaches the api
+    def cache_ttls(self):
+        return cache_ttls({endpoint: cadence * self.min_factor for endpoint, cadence in self.cadences.items()})
+
+
+# A clock that only moves when it is told to
+class SimulatedClock():
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+# Runs a PollingDaemon for `duration` simulated seconds and returns how many times it refreshed each endpoint
+# client should answer from recorded responses (a ClimacellClient with a ReplayTransport and no cache)
+# scheduler is an AdaptiveScheduler, None polls every endpoint on its fixed cadence
+# Returns {"refreshes": {(resort_key, endpoint): count}, "by_endpoint": {endpoint: count}, "total": count}
+def simulate(resort_keys, client, duration, scheduler=None, cadences=None, max_workers=fleet.DEFAULT_MAX_WORKERS):
+    clock = SimulatedClock()
+    cadences = scheduler.cadences if cadences is None and scheduler is not None else cadences
+    daemon = PollingDaemon(resort_keys, cadences=cadences, client=client, max_workers=max_workers, scheduler=scheduler, clock=clock)
+    try:
+        while clock.now < duration:
+            daemon.run_cycle()
+            clock.now += daemon.seconds_until_due()
+    finally:
+        daemon.close()
+
+    by_endpoint = {}
+    for (_, endpoint), count in daemon.refreshes.items():
+        by_endpoint[endpoint] = by_endpoint.get(endpoint, 0) + count
+    return {"refreshes": dict(daemon.refreshes), "by_endpoint": by_endpoint, "total": sum(by_endpoint.values())}
+
+
+# Returns the calls saved by the adaptive run against the fixed one, both as returned by simulate()
+def calls_saved(fixed, adaptive):
+    saved = {endpoint: fixed["by_endpoint"][endpoint] - adaptive["by_endpoint"].get(endpoint, 0) for endpoint in fixed["by_endpoint"]}
+    return {
+        "fixed": fixed["total"],
+        "adaptive": adaptive["total"],
+        "saved": fixed["total"] - adaptive["total"],
+        "saved_share": (fixed["total"] - adaptive["total"]) / fixed["total"] if fixed["total"] else 0.0,
+        "by_endpoint": saved,
+    }
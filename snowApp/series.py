@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+
+# numpy is used to hold each forecast field as one compact array
+
+import numpy as np
+
+from . import metrics
+from .timeutil import local_time, to_local_times, utc_datetime64
+
+"""
+This module holds ForecastSeries, the columnar form of a nowcast or hourly forecast response.
+
+The Climacell responses are lists of rows where every field is a nested {"value": ..., "units": ...}
+dict. ForecastSeries walks the rows once, parses every observation time once, and keeps one NumPy
+array per field next to a single shared array of timestamps. Numeric fields are float64 arrays with
+NaN where the api returned null; text fields such as precipitation_type are object arrays.
+
+Because the hourly forecast slides forward one hour at a time, most rows of a new response repeat
+the previous one. merge() combines a new series with the existing one by timestamp, drops the hours
+that have passed, and returns a ForecastDelta listing only the hours that are new or changed.
+"""
+
+# Fields whose values are text rather than numbers
+TEXT_FIELDS = frozenset(["precipitation_type", "weather_code", "sunrise", "sunset"])
+# Keys present in every row that are not forecast fields
+SKIPPED_KEYS = frozenset(["lat", "lon", "observation_time"])
+
+
+class ForecastSeries():
+    __slots__ = ("times", "local_times", "columns")
+
+    # times is a datetime64[ms] array in UTC, local_times the same instants as local datetime objects
+    # columns maps each field name to an array with one value per time
+    def __init__(self, times, local_times, columns):
+        self.times = times
+        self.local_times = local_times
+        self.columns = columns
+
+    # Returns a series with no rows, used before the first request has been made
+    @classmethod
+    def empty(cls):
+        return cls(np.array([], dtype="datetime64[ms]"), [], {})
+
+    # Builds a series from the list of rows returned by the api in a single pass
+    # fields limits which fields are kept, by default every field in the first row is kept
+    @classmethod
+    def from_payload(cls, rows, fields=None):
+        rows = list(rows)
+        if not rows:
+            return cls.empty()
+        if fields is None:
+            fields = [key for key in rows[0] if key not in SKIPPED_KEYS]
+
+        utc_times = []
+        values = {field: [] for field in fields}
+        for row in rows:
+            utc_times.append(row["observation_time"]["value"])
+            for field, column in values.items():
+                item = row.get(field)
+                column.append(None if item is None else item.get("value"))
+
+        return cls.from_columns(utc_times, values)
+
+    # Builds a series from a list of ISO 8601 UTC observation times and a dictionary of field: list of values
+    @classmethod
+    def from_columns(cls, utc_times, values):
+        with metrics.timer("snowapp_timestamp_seconds"):
+            times = utc_datetime64(utc_times)
+            # local_time() remembers converted strings, every resort in a sweep shares the same hourly timestamps
+            local_times = [local_time(utc_time) for utc_time in utc_times]
+        columns = {field: to_column(field, column) for field, column in values.items()}
+        return cls(times, local_times, columns)
+
+    # Returns the series as plain JSON types, used to store it in the on-disk cache
+    def to_dict(self):
+        return {
+            "times": self.times.astype(np.int64).tolist(),
+            "columns": {field: [None if value != value else value for value in column.tolist()] for field, column in self.columns.items()},
+        }
+
+    # Builds a series from the output of to_dict()
+    @classmethod
+    def from_dict(cls, series_dict):
+        times = np.array(series_dict["times"], dtype=np.int64).astype("datetime64[ms]")
+        columns = {field: to_column(field, values) for field, values in series_dict["columns"].items()}
+        return cls(times, to_local_times(times), columns)
+
+    # Returns the array of values for field
+    def __getitem__(self, field):
+        return self.columns[field]
+
+    def __contains__(self, field):
+        return field in self.columns
+
+    def __len__(self):
+        return len(self.times)
+
+    @property
+    def fields(self):
+        return list(self.columns)
+
+    # Returns a dictionary of local time: value for field, the form returned by the Resort getters
+    # Values the api returned as null are None, as they were before the series stored them as NaN
+    def as_dict(self, field):
+        return dict(zip(self.local_times, to_values(self.columns[field])))
+
+    # Number of bytes held by the timestamp and field arrays
+    @property
+    def nbytes(self):
+        return self.times.nbytes + sum(column.nbytes for column in self.columns.values())
+
+    # Merges a newer series into this one by timestamp, returns (merged series, ForecastDelta)
+    # Hours before now (by default the first hour of the new series) are dropped, hours in both series take the
+    # newer values, and hours only in this series that are still ahead are kept
+    def merge(self, new, now=None):
+        # The first forecast of a resort is merged into an empty series, every hour of it is new
+        if not len(self) and len(new) and bool(np.all(new.times[1:] > new.times[:-1])):
+            merged = ForecastSeries(new.times, list(new.local_times), dict(new.columns))
+            changed_index = np.arange(len(new))
+            return merged, ForecastDelta(new.times, changed_index, list(new.local_times), self.times, [])
+
+        if now is None:
+            now = new.times[0] if len(new) else None
+        keep = np.ones(len(self), dtype=bool) if now is None else self.times >= np.datetime64(now, "ms")
+
+        times = np.union1d(new.times, self.times[keep])
+        old_index = np.flatnonzero(keep)
+        old_positions = np.searchsorted(times, self.times[old_index])
+        new_positions = np.searchsorted(times, new.times)
+
+        local_times = [None] * len(times)
+        for position, i in zip(old_positions.tolist(), old_index.tolist()):
+            local_times[position] = self.local_times[i]
+        for position, local in zip(new_positions.tolist(), new.local_times):
+            local_times[position] = local
+
+        # A new row changed if its hour wasn't in this series or any of its values differ
+        matched = np.isin(new.times, self.times[old_index])
+        old_match = np.searchsorted(self.times[old_index], new.times[matched])
+        changed = ~matched
+        matched_index = np.flatnonzero(matched)
+
+        columns = {}
+        for field, new_column in new.columns.items():
+            column = np.full(len(times), np.nan) if new_column.dtype != object else np.full(len(times), None, dtype=object)
+            old_column = self.columns.get(field)
+            if old_column is not None:
+                column[old_positions] = old_column[old_index]
+                changed[matched_index] |= ~same_values(old_column[old_index][old_match], new_column[matched])
+            else:
+                changed[matched_index] = True
+            column[new_positions] = new_column
+            columns[field] = column
+
+        merged = ForecastSeries(times, local_times, columns)
+        changed_index = new_positions[changed]
+        expired_index = np.flatnonzero(~keep)
+        delta = ForecastDelta(
+            times[changed_index],
+            changed_index,
+            [local_times[i] for i in changed_index.tolist()],
+            self.times[expired_index],
+            [self.local_times[i] for i in expired_index.tolist()],
+        )
+        return merged, delta
+
+
+# The hours that changed when a new forecast was merged into an existing one
+class ForecastDelta():
+    __slots__ = ("changed_times", "changed_index", "changed_local_times", "expired_times", "expired_local_times")
+
+    # changed_index holds the positions of the changed hours in the merged series
+    def __init__(self, changed_times, changed_index, changed_local_times, expired_times, expired_local_times):
+        self.changed_times = changed_times
+        self.changed_index = changed_index
+        self.changed_local_times = changed_local_times
+        self.expired_times = expired_times
+        self.expired_local_times = expired_local_times
+
+    def __bool__(self):
+        return bool(len(self.changed_times) or len(self.expired_times))
+
+    def __repr__(self):
+        return f'ForecastDelta({len(self.changed_times)} changed, {len(self.expired_times)} expired)'
+
+
+# Compares two columns element by element, treating NaN as equal to NaN
+def same_values(old, new):
+    if old.dtype == object or new.dtype == object:
+        return np.array([a == b for a, b in zip(old.tolist(), new.tolist())], dtype=bool)
+    return (old == new) | (np.isnan(old) & np.isnan(new))
+
+
+# Converts a column into a list of Python values with NaN turned back into None
+def to_values(column):
+    return [None if value != value else value for value in column.tolist()]
+
+
+# Converts a list of values into a float64 array, or an object array for text fields
+def to_column(field, values):
+    if field in TEXT_FIELDS:
+        return np.array(values, dtype=object)
+    try:
+        return np.array(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        return np.array(values, dtype=object)
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+
+# Flask is used to serve the snow reports over HTTP
+# hashlib is used to build the ETag of each response body
+
+import argparse
+import hashlib
+import json
+import logging
+import math
+import threading
+
+from flask import Flask, Response, request
+
+from . import daemon, fleet, metrics
+from .alerts import SnowAlertEngine
+
+"""
+This module serves the snow reports over HTTP so consumers don't each create Resorts and call the
+Climacell API themselves.
+
+A PollingDaemon refreshes every resort in a background thread, and after every cycle ReportStore
+serializes the resorts that changed once and keeps the JSON body and its ETag. Requests are
+answered with those bytes as they are, and a request whose If-None-Match matches the ETag gets an
+empty 304. Bodies for a subset of fields (?fields=temp,precipitation) are built on first use and
+kept until the resort is refreshed again.
+
+    GET /resorts                                the resorts being polled
+    GET /resorts/<key>/now                      the current weather
+    GET /resorts/<key>/6hr?fields=temp,...      the 6hr nowcast, every field by default
+    GET /resorts/<key>/96hr?fields=temp,...     the 96hr forecast, every field by default
+    GET /snow-alerts                            resorts expecting significant snow, snowiest first
+    GET /metrics                                stage timings and cache lookups in the Prometheus text format
+    GET /metrics.json                           the same as JSON, with the cache hit rate of each endpoint
+
+Run it from the repository root with: python -m snowApp.server
+"""
+
+logger = logging.getLogger(__name__)
+
+SPANS = ("6hr", "96hr")
+# Seconds clients may reuse a response before asking again, the realtime weather changes every minute
+MAX_AGE = 60
+
+
+# A serialized response body and its ETag, the ETag is stored without quotes
+class CachedBody():
+    __slots__ = ("body", "etag")
+
+    def __init__(self, body, etag):
+        self.body = body
+        self.etag = etag
+
+    @classmethod
+    def from_data(cls, data):
+        body = json.dumps(data, separators=(",", ":"), allow_nan=False).encode("utf-8")
+        return cls(body, hashlib.sha1(body).hexdigest())
+
+
+# Replaces NaN with None so it is written as null
+def json_value(value):
+    return None if isinstance(value, float) and math.isnan(value) else value
+
+
+# Returns the JSON form of a 6hr or 96hr ForecastSeries, limited to fields when given
+def series_data(resort_key, span, series, fields=None):
+    fields = series.fields if fields is None else fields
+    return {
+        "resort": resort_key,
+        "span": span,
+        "times": [local.isoformat() for local in series.local_times],
+        "fields": {field: [json_value(value) for value in series[field].tolist()] for field in fields},
+    }
+
+
+# Returns the JSON form of a resort's current weather, each field as its value
+def now_data(resort):
+    return {
+        "resort": resort.key,
+        "time": resort.now_time.isoformat(),
+        "fields": {
+            field: item.get("value") if isinstance(item, dict) else item
+            for field, item in resort.weather_now.items()
+            if field not in ("lat", "lon", "observation_time")
+        },
+    }
+
+
+class ReportStore():
+    # resorts maps each resort key to its Resort, alert_engine computes /snow-alerts
+    def __init__(self, resorts, alert_engine=None):
+        self.resorts = resorts
+        self.alert_engine = alert_engine or SnowAlertEngine()
+        # (resort_key, "now" | "6hr" | "96hr"): CachedBody
+        self._bodies = {}
+        # (resort_key, span, fields): CachedBody, cleared for a resort when it is refreshed
+        self._subsets = {}
+        self._lock = threading.Lock()
+        self.resort_list = CachedBody.from_data(
+            [
+                {"key": resort.key, "name": resort.name, "country": resort.country, "lat": resort.lat, "lon": resort.lon}
+                for resort in resorts.values()
+            ]
+        )
+        self.alerts = CachedBody.from_data([])
+
+    # Serializes the endpoints refreshed in a fleet sweep, results is the dict returned by fetch_fleet() or a daemon cycle
+    # endpoints are the endpoints that were requested, by default every endpoint
+    def update(self, results, endpoints=fleet.ENDPOINTS):
+        bodies = {}
+        for resort_key, result in results.items():
+            resort = result.resort
+            for endpoint in endpoints:
+                if endpoint in result.errors:
+                    continue
+                if endpoint == "now" and resort.weather_now:
+                    bodies[(resort_key, "now")] = CachedBody.from_data(now_data(resort))
+                elif endpoint in SPANS and len(getattr(resort, f'series_{endpoint}')):
+                    bodies[(resort_key, endpoint)] = CachedBody.from_data(
+                        series_data(resort_key, endpoint, getattr(resort, f'series_{endpoint}'))
+                    )
+
+        alerts = None
+        if "96hr" in endpoints:
+            alerts = CachedBody.from_data(
+                [
+                    {"resort": alert.resort_key, "window": alert.window, "snowfall": alert.snowfall, "threshold": alert.threshold}
+                    for alert in self.alert_engine.check(list(self.resorts.values()))
+                ]
+            )
+
+        with self._lock:
+            self._bodies.update(bodies)
+            refreshed = set(bodies)
+            self._subsets = {key: body for key, body in self._subsets.items() if key[:2] not in refreshed}
+            if alerts is not None:
+                self.alerts = alerts
+        logger.debug(f'Serialized {len(bodies)} responses')
+
+    # Used as the PollingDaemon's on_cycle callback
+    def on_cycle(self, polling_daemon, stats, results):
+        self.update(results, tuple(stats.by_endpoint))
+
+    # Returns the CachedBody for a resort's endpoint, None if it hasn't been fetched yet
+    # Raises KeyError for an unknown resort and ValueError for a field the forecast doesn't have
+    def body(self, resort_key, endpoint, fields=None):
+        if resort_key not in self.resorts:
+            raise KeyError(resort_key)
+        cached = self._bodies.get((resort_key, endpoint))
+        if cached is None or fields is None:
+            return cached
+
+        fields = tuple(sorted(set(fields)))
+        key = (resort_key, endpoint, fields)
+        subset = self._subsets.get(key)
+        if subset is None:
+            series = getattr(self.resorts[resort_key], f'series_{endpoint}')
+            missing = [field for field in fields if field not in series]
+            if missing:
+                raise ValueError(f'{", ".join(missing)} not in the {endpoint} forecast, available: {", ".join(series.fields)}')
+            subset = CachedBody.from_data(series_data(resort_key, endpoint, series, fields))
+            with self._lock:
+                # Only keep it if the resort wasn't refreshed while it was being built
+                if self._bodies.get((resort_key, endpoint)) is cached:
+                    self._subsets[key] = subset
+        return subset
+
+
+# Returns the response for a CachedBody, or an empty 304 if the request already has this ETag
+def cached_response(cached):
+    if request.if_none_match.contains(cached.etag):
+        response = Response(status=304)
+    else:
+        response = Response(cached.body, mimetype="application/json")
+    response.set_etag(cached.etag)
+    response.cache_control.max_age = MAX_AGE
+    return response
+
+
+def error_response(status, message):
+    return Response(json.dumps({"error": message}), status=status, mimetype="application/json")
+
+
+# Builds the Flask app serving the bodies held by store
+def create_app(store):
+    app = Flask(__name__)
+
+    @app.route("/resorts")
+    def resorts():
+        return cached_response(store.resort_list)
+
+    @app.route("/resorts/<resort_key>/<endpoint>")
+    def resort_endpoint(resort_key, endpoint):
+        if endpoint not in ("now",) + SPANS:
+            return error_response(404, f'Unknown endpoint {endpoint}')
+        fields = request.args.get("fields")
+        if fields is not None and endpoint != "now":
+            fields = [field for field in fields.split(",") if field]
+        else:
+            fields = None
+        try:
+            cached = store.body(resort_key, endpoint, fields)
+        except KeyError:
+            return error_response(404, f'Unknown resort {resort_key}')
+        except ValueError as e:
+            return error_response(400, str(e))
+        if cached is None:
+            return error_response(503, f'The {endpoint} weather for {resort_key} hasn\'t been fetched yet')
+        return cached_response(cached)
+
+    @app.route("/snow-alerts")
+    def snow_alerts():
+        return cached_response(store.alerts)
+
+    @app.route("/metrics")
+    def prometheus_metrics():
+        return Response(metrics.REGISTRY.prometheus(), mimetype="text/plain; version=0.0.4")
+
+    @app.route("/metrics.json")
+    def json_metrics():
+        return Response(json.dumps(metrics.snapshot()), mimetype="application/json")
+
+    return app
+
+
+# Starts a PollingDaemon in a background thread that keeps store up to date, returns the daemon
+def start_refresh(polling_daemon, store):
+    polling_daemon.on_cycle = store.on_cycle
+    thread = threading.Thread(target=polling_daemon.run, kwargs={"handle_signals": False}, name="refresh", daemon=True)
+    thread.start()
+    return polling_daemon
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve cached snow reports over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--resorts", nargs="*", help="resort keys to serve, every resort by default")
+    parser.add_argument("--grid-resolution", type=float, help="share requests between resorts in the same grid cell")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s:%(levelname)s:%(name)s: %(message)s")
+    polling_daemon = daemon.PollingDaemon(resort_keys=args.resorts or None, grid_resolution=args.grid_resolution)
+    store = ReportStore(polling_daemon.resorts)
+    start_refresh(polling_daemon, store)
+    try:
+        create_app(store).run(host=args.host, port=args.port, threaded=True)
+    finally:
+        polling_daemon.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,19 @@
 #!/usr/bin/env python3
 
-# Requests is used to access api
-# JSON is used to parse API response from JSON format into a list of dictionaries
-# os is used to set current directory and folder structure
-# dateutil.parser as dp is used to convert UTC format into datetime format
-# datetime and tzlocal is used to convert UTC timezone into Canada/Mountain Time
+# os is used to find skiResorts.json and the log file next to this module
+# local_time is used to convert UTC timezone into Canada/Mountain Time
+# The client (requests) and ForecastSeries (numpy) are imported the first time a Resort is created, importing
+# this module does no I/O and only loads the standard library
+# API responses are parsed by the client (client.py and ingest.py) and skiResorts.json by the registry (registry.py)
 
-import json
 import os
-from datetime import datetime
-import dateutil.parser as dp
 import logging
-import sys
-import requests
-from tzlocal import get_localzone
+
+from . import metrics
+from .ratelimit import request_priority
+from .registry import ResortRecord, open_registry, read_records
+from .spatial import snap_to_grid
+from .timeutil import local_time
 
 """
 This program:
@@ -45,87 +45,131 @@ URL_REALTIME = "https://api.climacell.co/v3/weather/realtime"
 SKI_RESORT_JSON = "skiResorts.json"
 CLIMACELL_KEY = "G6pKgE1QNQqjkSM5XzBZMW5N7cPgxUVy"
 
+# The fields requested from each endpoint when a Resort isn't told which fields it reads
+DEFAULT_FIELDS = {
+    "now": ("precipitation", "precipitation_type", "temp", "feels_like", "wind_speed", "wind_direction", "sunrise", "sunset", "visibility", "cloud_cover", "cloud_base", "weather_code"),
+    "6hr": ("temp", "feels_like", "humidity", "wind_speed", "wind_direction", "precipitation", "precipitation_type", "sunrise", "sunset", "visibility", "cloud_cover", "cloud_base", "weather_code"),
+    "96hr": ("precipitation", "temp", "feels_like", "humidity", "wind_speed", "wind_direction", "precipitation_type", "precipitation_probability", "sunrise", "sunset", "cloud_cover", "cloud_base", "weather_code"),
+}
+# The fields read by the Resort getters, get_temperature_96hr() and so on
+GETTER_FIELDS = ("temp", "precipitation", "precipitation_type", "feels_like", "wind_speed")
+
 STARRED_RESORTS = ["lakeLouise", "sunshine", "fernie", "revelstoke", "whistler"]
 ALBERTA_RESORTS = ["lakeLouise", "sunshine", "nakiska", "castleMountain", "norquay"]
 
 
-# Sets up where the files will be
+# Sets up where the files will be, paths are absolute so the working directory is left alone
 ABS_PATH = os.path.abspath(__file__)
 D_NAME = os.path.dirname(ABS_PATH)
-currentDir = os.getcwd()
-
-if currentDir != D_NAME:
-    os.chdir(D_NAME)
-else:
-    pass
+LOG_FILE = os.path.join(D_NAME, 'snowApp.log')
 
 # Set up logging at the debug level
+# delay=True leaves snowApp.log closed (and untruncated) until the first message is written
+# Messages are written to the file by a background thread so the getters never wait on the disk
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
-handler = logging.FileHandler(filename='snowApp.log', encoding='utf-8', mode='w')
-handler.setFormatter(logging.Formatter('%(asctime)s:%(levelname)s:%(name)s: %(message)s'))
+file_handler = logging.FileHandler(filename=LOG_FILE, encoding='utf-8', mode='w', delay=True)
+file_handler.setFormatter(logging.Formatter('%(asctime)s:%(levelname)s:%(name)s: %(message)s'))
+handler = metrics.BackgroundHandler(file_handler)
 logger.addHandler(handler)
 
-logger.debug(f'Running snowReport.py... \n')
 
-logger.debug(f'ABS_PATH: {ABS_PATH}')
-logger.debug(f'D_NAME: {D_NAME}')
-logger.debug(f'Current Directory: {currentDir} \n')
+# Turns the debug log on or off, when it is off logger.debug() returns straight away
+def set_logging(enabled):
+    logger.disabled = not enabled
+
+# The registry of resorts in skiResorts.json, it is created the first time it is needed
+_registry = None
+
+
+# requests is only imported when something asks for snowReport.requests, for example to patch it in a test
+def __getattr__(name):
+    if name == "requests":
+        import requests
 
-# This method takes the string of a time in ISO 8601 format and converts it to local time using the system timezone
-def local_time(UTC_time):
-    return dp.parse(UTC_time).astimezone(
-        get_localzone()
-    )  # returns a datetime.datetime object
+        return requests
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+# Returns the ResortRegistry for skiResorts.json, the file is only parsed again when it changes
+def get_registry():
+    global _registry
+    if _registry is None:
+        _registry = open_registry(os.path.join(D_NAME, SKI_RESORT_JSON))
+    return _registry
 
 
 # This method adds a resort to the json file, returns the skiResort json file
+# Raises ValueError if the coordinates aren't a real place
 def add_new_resort(resort_key, resort_name, country, lat, lon):
     logger.debug(f'Function call: add_new_resort()')
     logger.debug(f'Adding new resort: {resort_name}')
 
-    new_resort_dict = {
-        resort_key: {"name": resort_name, "country": country, "lat": lat, "lon": lon}
-    }
+    registry = get_registry()
+    if resort_key in registry:
+        logger.debug(f'{resort_key} already exists in the json file, failure to add new resort')
+        logger.debug(f'Please change the resort key name and try again \n')
+    else:
+        registry.add([ResortRecord(resort_key, resort_name, country, lat, lon)])
+        logger.debug(f"Added {resort_name} successfully \n")
 
-    with open(SKI_RESORT_JSON, "r") as f:
-        resort_json = json.load(f)
-        if resort_key in resort_json:
-            logger.debug(f'{resort_key} already exists in the json file, failure to add new resort')
-            logger.debug(f'Please change the resort key name and try again \n')
-        else:
-            resort_json.update(new_resort_dict)
+    return {record.key: record.as_dict() for record in registry}
 
-            with open(SKI_RESORT_JSON, "w") as f:
-                json.dump(resort_json, f, indent=4)
-                logger.debug(f"Added {resort_name} successfully \n")
 
-    return resort_json
+# This method adds every resort in a CSV or GeoJSON file to the registry in a single write, returns the number added
+# replace=True updates the resorts that already exist, otherwise they raise ValueError and nothing is added
+def import_resorts(path, replace=False):
+    logger.debug(f'Function call: import_resorts({path})')
+    records = read_records(path)
+    get_registry().add(records, replace=replace)
+    logger.debug(f'Imported {len(records)} resorts from {path} \n')
+    return len(records)
 
 # This method lists the set of resort keys and the corresponding resort name that the user can access
 def get_resort_keys():
     logger.debug('Function call: get_resort_keys() \n')
-    current_dir = os.getcwd()
-    logger.debug('The current directory: {current_dir}')
+    resort_keys = {record.name: record.key for record in get_registry()}
+    return resort_keys
 
-    if current_dir != D_NAME:
-        os.chdir(D_NAME)
-        logger.debug('Current directory was not as expected.')
-        logger.debug('The current directory was set to: {D_NAME}')
-    else:
-        pass
 
-    # Opens json file to get location parameters
-    with open(SKI_RESORT_JSON, "r") as f:
-        ski_resort_dict = json.load(f)
+# This method takes a country as an arg and returns a list of the names of the resorts in that country
+def resorts_in_country(country):
+    return [record.name for record in get_registry().in_country(country)]
 
-    ski_resort_keys = ski_resort_dict.keys()
-    ski_resort_names = [ski_resort_dict[resort_key]['name'] for resort_key in ski_resort_keys]
-    resort_keys = {ski_resort_names[i]: ski_resort_keys[i] for i in range(len(ski_resort_names))}
 
-    return resort_keys
+# Returns the fields to request from each endpoint as a dict of endpoint: comma separated field names
+# fields can be None for DEFAULT_FIELDS, a list of fields used for every endpoint, or a dict of endpoint: list of fields
+# where missing endpoints use DEFAULT_FIELDS. The names are sorted so the same set of fields always makes the same cache key
+def resolve_fields(fields=None):
+    if fields is None:
+        fields = {}
+    elif not isinstance(fields, dict):
+        fields = {endpoint: fields for endpoint in DEFAULT_FIELDS}
+
+    for endpoint in fields:
+        if endpoint not in DEFAULT_FIELDS:
+            raise ValueError(f'Unknown endpoint {endpoint!r}, expected one of {tuple(DEFAULT_FIELDS)}')
+
+    resolved = {}
+    for endpoint, default in DEFAULT_FIELDS.items():
+        names = fields.get(endpoint, default)
+        if isinstance(names, str):
+            names = names.split(",")
+        names = sorted(set(name.strip() for name in names) - {""})
+        if not names:
+            raise ValueError(f'No fields given for the {endpoint} endpoint')
+        resolved[endpoint] = ",".join(names)
+    return resolved
+
+
+# Returns a forecast as a ForecastSeries, forecasts can be a series already or the list of rows returned by the api
+def as_series(forecast):
+    from .series import ForecastSeries
+
+    if isinstance(forecast, ForecastSeries):
+        return forecast
+    return ForecastSeries.from_payload(forecast)
 
-    
 
 # Get request modified to only pull the data requested by the user using args
 # Question: are kwargs or args better to use in this situation?
@@ -138,107 +182,201 @@ def get_resort_keys():
 # request item in self.args
 class Resort():
     # kwargs is created so the user can pass in "96hr", "realtime", and or "360min"
-    def __init__(self, resort_key):
-        logger.debug('Creating new instance of Resort Class. Resort key: {resort_key}')
-        # Check if you are in the current directory, if not, set it to the current directory
-        
-        current_dir = os.getcwd()
-        logger.debug('The current directory: {current_dir}')
-
-        if current_dir != D_NAME:
-            os.chdir(D_NAME)
-            logger.debug('Current directory was not as expected.')
-            logger.debug('The current directory was set to: {D_NAME}')
-        else:
-            pass
-
-        # Opens json file to get location parameters
-        with open(SKI_RESORT_JSON, "r") as f:
-            resort_dict_list = json.load(f)
-            resort_dict = resort_dict_list[resort_key]
-
-        self.name = resort_dict["name"]
-        self.lon = resort_dict["lon"]
-        self.lat = resort_dict["lat"]
-        self.country = resort_dict["country"]
+    # client is the ClimacellClient used for requests, by default every Resort shares one pooled client
+    # record is the ResortRecord holding the location parameters, by default it is looked up in the registry
+    # grid_resolution (degrees) snaps the requested coordinates to a grid so nearby resorts share requests
+    # fields limits what is requested to the fields the caller reads, see resolve_fields()
+    def __init__(self, resort_key, client=None, record=None, grid_resolution=None, fields=None):
+        logger.debug(f'Creating new instance of Resort Class. Resort key: {resort_key}')
+        from .client import DEFAULT_POOL_SIZE, get_default_client
+        from .series import ForecastSeries
+
+        # The shared client's connection pool is sized to the number of resorts so a full sweep can reuse connections,
+        # a Resort made from a record leaves skiResorts.json alone and the pool keeps its default size
+        pool_size = DEFAULT_POOL_SIZE
+        if record is None:
+            registry = get_registry()
+            record = registry[resort_key]
+            pool_size = len(registry)
+
+        self.key = resort_key
+        self.name = record.name
+        self.lon = record.lon
+        self.lat = record.lat
+        self.country = record.country
+        self.grid_resolution = grid_resolution
+        # endpoint: comma separated fields sent in the querystring
+        self.fields = resolve_fields(fields)
+
+        self.client = client if client is not None else get_default_client(pool_size=pool_size)
 
         self.weather_now = {}
-        self.weather_6hr = {}
-        self.weather_96hr = {}
+        # The 6hr and 96hr responses are kept in columnar form rather than as the raw list of dicts
+        self.series_6hr = ForecastSeries.empty()
+        self.series_96hr = ForecastSeries.empty()
+        # The hours that changed in the last response for each forecast, see ForecastSeries.merge()
+        self.delta_6hr = None
+        self.delta_96hr = None
+        # The time:value dictionaries returned by the getters, kept up to date as new responses are merged in
+        self._forecast_dicts = {"6hr": {}, "96hr": {}}
+        # Counts the merges that changed each forecast, so values derived from a forecast know when to recompute
+        self.forecast_versions = {"6hr": 0, "96hr": 0}
 
         logger.debug('New "Resort" object successfully initialized... \n')
 
-    # Makes a request to the API to retrieve a dictionary containing the current weather
-    def request_now(self):
-        logger.debug(f'Function call: request_now()')
+    # Creates a Resort from a registry record without reading skiResorts.json
+    @classmethod
+    def from_record(cls, record, client=None, grid_resolution=None, fields=None):
+        return cls(record.key, client=client, record=record, grid_resolution=grid_resolution, fields=fields)
+
+    # Returns the rate limiter priority of a request to an endpoint, starred resorts and near-term endpoints go first
+    def priority(self, endpoint):
+        return request_priority(endpoint, starred=self.key in STARRED_RESORTS)
+
+    # Returns the (Climacell endpoint, URL, querystring) of the request for "now", "6hr" or "96hr"
+    def request_args(self, span):
+        lat, lon = self.query_coordinates()
         querystring = {
-            "lat": str(self.lat),
-            "lon": str(self.lon),
+            "lat": str(lat),
+            "lon": str(lon),
             "unit_system": "si",
-            "fields": "precipitation,precipitation_type,temp,feels_like,wind_speed,wind_direction,sunrise,sunset,visibility,cloud_cover,cloud_base,weather_code",
-            "apikey": CLIMACELL_KEY,
         }
+        if span == "now":
+            endpoint, url = "realtime", URL_REALTIME
+        elif span == "6hr":
+            endpoint, url = "nowcast", URL_NOWCAST
+            querystring["timestep"] = "5"
+            querystring["start_time"] = "now"
+        elif span == "96hr":
+            endpoint, url = "hourly", URL_HOURLY
+            querystring["start_time"] = "now"
+        else:
+            raise ValueError(f'Unknown span {span!r}, expected "now", "6hr" or "96hr"')
+        querystring["fields"] = self.fields[span]
+        querystring["apikey"] = CLIMACELL_KEY
+        return endpoint, url, querystring
+
+    # Returns the coordinates sent to the API, snapped to the grid cell centre when grid_resolution is set
+    def query_coordinates(self):
+        if self.grid_resolution:
+            return snap_to_grid(self.lat, self.lon, self.grid_resolution)
+        return self.lat, self.lon
+
+    # Makes a request to the API for the current weather, returns the parsed response or None if the call wasn't successful
+    def fetch_now(self):
+        endpoint, url, querystring = self.request_args("now")
+        return self.client.fetch(endpoint, url, querystring, priority=self.priority(endpoint))
+
+    # Stores a realtime response, it can come from this resort's request or from another resort in the same grid cell
+    def set_now(self, weather_now):
+        self.weather_now = weather_now
+
+        self.now_time = local_time(self.weather_now["observation_time"]["value"])
+        # Fields that weren't requested are None
+        self.now_temperature = self._now_value("temp")
+        self.now_feelslike = self._now_value("feels_like")
+        self.now_precipitation = self._now_value("precipitation")
+        self.now_precipitation_type = self._now_value("precipitation_type")
+        self.now_windspeed = self._now_value("wind_speed")
+        self.now_winddirection = self._now_value("wind_direction")
+        self.now_cloudcover = self._now_value("cloud_cover")
+
+    def _now_value(self, field):
+        item = self.weather_now.get(field)
+        return None if item is None else item.get("value")
 
-        response = requests.request("GET", URL_REALTIME, params=querystring)
+    # Makes a request to the API to retrieve a dictionary containing the current weather
+    def request_now(self):
+        logger.debug(f'Function call: request_now()')
+        weather_now = self.fetch_now()
 
-        if response.ok:
+        if weather_now is not None:
             logger.debug(f'request_now() to Climacell API successful \n')
-            self.weather_now = json.loads(response.text)
-
-            self.now_time = local_time(self.weather_now["observation_time"]["value"])
-            self.now_temperature = self.weather_now["temp"]["value"]
-            self.now_feelslike = self.weather_now["feels_like"]["value"]
-            self.now_precipitation = self.weather_now["precipitation"]["value"]
-            self.now_precipitation_type = self.weather_now["precipitation_type"]["value"]
-            self.now_windspeed = self.weather_now["wind_speed"]["value"]
-            self.now_winddirection = self.weather_now["wind_direction"]["value"]
-            self.now_cloudcover = self.weather_now["cloud_cover"]["value"]
-
+            self.set_now(weather_now)
             return True  
 
         else:
             logger.debug(f'request_now() to Climacell API failed \n')                
             return False
 
+    # Makes a request to the API for the 6hr forecast, returns it as a ForecastSeries or None if the call wasn't successful
+    def fetch_6hr(self):
+        endpoint, url, querystring = self.request_args("6hr")
+        return self.client.fetch_series(endpoint, url, querystring, priority=self.priority(endpoint))
+
+    # Merges a 6hr forecast (a ForecastSeries or the list of rows from the api) into self.series_6hr, returns the ForecastDelta of changed hours
+    def set_6hr(self, weather_6hr):
+        self.series_6hr, self.delta_6hr = self._merge_forecast("6hr", self.series_6hr, as_series(weather_6hr))
+        return self.delta_6hr
+
     # Makes a request to the API to retrieve a dictionary containing 6hr weather, returns True if successful, returns False if call wasn't successful
     def request_6hr(self):
         logger.debug(f'Function call: request_6hr')
-        querystring = {
-            "lat": str(self.lat),
-            "lon": str(self.lon),
-            "unit_system": "si",
-            "timestep": "5",
-            "start_time": "now",
-            "fields": "temp,feels_like,humidity,wind_speed,wind_direction,precipitation,precipitation_type,sunrise,sunset,visibility,cloud_cover,cloud_base,weather_code",
-            "apikey": CLIMACELL_KEY,
-        }
+        weather_6hr = self.fetch_6hr()
 
-        response = requests.request("GET", URL_NOWCAST, params=querystring)
-
-        if response.ok:
+        if weather_6hr is not None:
             logger.debug(f'request_6hr()  to Climacell API successful \n')            
-            self.weather_6hr = json.loads(response.text)
+            self.set_6hr(weather_6hr)
             return True
 
         else:
             logger.debug(f'request_6hr() to Climacell API failed \n')              
             return False
 
+    # Makes a request to the API for the 96hr forecast, returns it as a ForecastSeries or None if the call wasn't successful
+    def fetch_96hr(self):
+        endpoint, url, querystring = self.request_args("96hr")
+        return self.client.fetch_series(endpoint, url, querystring, priority=self.priority(endpoint))  # ClimaCell: The hourly call provides a global hourly forecast, up to 96 hours (4 days) out, for a specific location.
+
+    # Merges a 96hr forecast (a ForecastSeries or the list of rows from the api) into self.series_96hr, returns the ForecastDelta of changed hours
+    def set_96hr(self, weather_96hr):
+        self.series_96hr, self.delta_96hr = self._merge_forecast("96hr", self.series_96hr, as_series(weather_96hr))
+        return self.delta_96hr
+
+    # Merges a new forecast into the current one and updates only the changed hours of the getter dictionaries
+    def _merge_forecast(self, span, current, new):
+        from .series import to_values
+
+        merged, delta = current.merge(new)
+        logger.debug(f'{span} forecast merged: {delta}')
+        if delta or merged.fields != current.fields:
+            self.forecast_versions[span] += 1
+
+        forecast_dicts = self._forecast_dicts[span]
+        for field in list(forecast_dicts):
+            if field not in merged:
+                del forecast_dicts[field]
+                continue
+            forecast_dict = forecast_dicts[field]
+            for local in delta.expired_local_times:
+                forecast_dict.pop(local, None)
+            values = to_values(merged[field][delta.changed_index])
+            for local, value in zip(delta.changed_local_times, values):
+                forecast_dict[local] = value
+        return merged, delta
+
+    # Returns the time:value dictionary for a field of the 6hr or 96hr forecast, it is only built in full the first time
+    # The dictionary kept up to date by _merge_forecast() stays internal, callers get a copy they can keep or change
+    # Returns an empty dictionary until a forecast has been fetched, raises KeyError if the field wasn't requested
+    def _forecast_dict(self, span, field):
+        with metrics.timer("snowapp_getter_seconds", span=span):
+            forecast_dicts = self._forecast_dicts[span]
+            if field not in forecast_dicts:
+                series = getattr(self, f'series_{span}')
+                if not len(series):
+                    return {}
+                if field not in series:
+                    raise KeyError(f'{field!r} was not requested for the {span} forecast of {self.key}, requested {self.fields[span]}')
+                forecast_dicts[field] = series.as_dict(field)
+            return dict(forecast_dicts[field])
+
     # Makes a request to the API to retrieve a dictonary containing 96hr weather, returns True if successful, returns False if call wasn't successful
     def request_96hr(self):
         logger.debug(f'Function call: request_96hr()')
-        querystring = {
-            "lat": str(self.lat),
-            "lon": str(self.lon),
-            "unit_system": "si",
-            "start_time": "now",
-            "fields": "precipitation,temp,feels_like,humidity,wind_speed,wind_direction,precipitation_type,precipitation_probability,sunrise,sunset,cloud_cover,cloud_base,weather_code",
-            "apikey": CLIMACELL_KEY,
-        }
-        response = requests.request("GET", URL_HOURLY, params=querystring)  # ClimaCell: The hourly call provides a global hourly forecast, up to 96 hours (4 days) out, for a specific location.
-        if response.ok:
+        weather_96hr = self.fetch_96hr()
+        if weather_96hr is not None:
             logger.debug(f'request_96hr() to Climacell API successful \n')  
-            self.weather_96hr = json.loads(response.text)
+            self.set_96hr(weather_96hr)
             return True
         else:
             logger.debug(f'request_96hr() to Climacell API failed \n')  
@@ -249,9 +387,9 @@ class Resort():
         logger.debug(f'Function call: process_requests()')
         # Makes a request for realtime data and stores in self.weather_now
         self.request_now()
-        # Makes a request for 6hr forecast and stores in self.weather_6hr
+        # Makes a request for 6hr forecast and stores in self.series_6hr
         self.request_6hr()
-        # Makes a request for 96hr forecast and stores in self.weather_96hr
+        # Makes a request for 96hr forecast and stores in self.series_96hr
         self.request_96hr() 
         logger.debug(f'Completed function call... process_requests()')
 
@@ -260,18 +398,14 @@ class Resort():
     # Class method get_temperature_96hr() returns a dictionary of the temperature against time
     def get_temperature_96hr(self):
         logger.debug(f'Function call: get_temperature_96hr()')
-        time_96hr = [local_time(self.weather_96hr[i]["observation_time"]["value"]) for i in range(0, len(self.weather_96hr))]
-        temp_96hr = [self.weather_96hr[i]["temp"]["value"] for i in range(0, len(self.weather_96hr))]
-        self.temperature_forecast_96hr = {time_96hr[i]: temp_96hr[i] for i in range(len(time_96hr))}
+        self.temperature_forecast_96hr = self._forecast_dict("96hr", "temp")
         logger.debug(f'Returning dictionary containing time:value pair, "self.temperature_forecast_96hr \n')
         return self.temperature_forecast_96hr
 
     # Class method get_temperature_6hr() returns a dictionary of the temperature against time
     def get_temperature_6hr(self):
         logger.debug(f'Function call: get_temperature_6hr()')
-        time_6hr = [local_time(self.weather_6hr[i]["observation_time"]["value"]) for i in range(0, len(self.weather_6hr))]
-        temp_6hr = [self.weather_6hr[i]["temp"]["value"] for i in range(0, len(self.weather_6hr))]
-        self.temperature_forecast_6hr = {time_6hr[i]: temp_6hr[i] for i in range(len(time_6hr))}
+        self.temperature_forecast_6hr = self._forecast_dict("6hr", "temp")
         logger.debug(f'Returning dictionary containing time:value pair, "self.temperature_forecast_6hr \n')
         return self.temperature_forecast_6hr
 
@@ -287,18 +421,14 @@ class Resort():
     # Class method get_precipitation_96hr() returns a dictionary of the precipitation against time
     def get_precipitation_96hr(self):
         logger.debug(f'Function call: get_precipitation_96hr()')
-        time_96hr = [local_time(self.weather_96hr[i]["observation_time"]["value"]) for i in range(0, len(self.weather_96hr))]
-        precipitation_96hr = [self.weather_96hr[i]["precipitation"]["value"] for i in range(0, len(self.weather_96hr))]
-        self.precipitation_forecast_96hr = {time_96hr[i]: precipitation_96hr[i] for i in range(len(time_96hr))}
+        self.precipitation_forecast_96hr = self._forecast_dict("96hr", "precipitation")
         logger.debug(f'Returning dictionary containing time:value pair, "self.precipitation_forecast_96hr \n')
         return self.precipitation_forecast_96hr
 
     # Class method get_precipitation_6hr() returns a dictionary of the temperature against time
     def get_precipitation_6hr(self):
         logger.debug(f'Function call: get_precipitation_6hr()')
-        time_6hr = [local_time(self.weather_6hr[i]["observation_time"]["value"]) for i in range(0, len(self.weather_6hr))]
-        precipitation_6hr = [self.weather_6hr[i]["precipitation"]["value"] for i in range(0, len(self.weather_6hr))]
-        self.precipitation_forecast_6hr = {time_6hr[i]: precipitation_6hr[i] for i in range(len(time_6hr))}
+        self.precipitation_forecast_6hr = self._forecast_dict("6hr", "precipitation")
         logger.debug(f'Returning dictionary containing time:value pair, "self.precipitation_forecast_6hr \n')
         return self.precipitation_forecast_6hr
 
@@ -314,18 +444,14 @@ class Resort():
     # Class method get_precipitation_type_96hr() returns a dictionary of the precipitation against time
     def get_precipitation_type_96hr(self):
         logger.debug(f'Function call: get_precipitation_type_96hr()')
-        time_96hr = [local_time(self.weather_96hr[i]["observation_time"]["value"]) for i in range(0, len(self.weather_96hr))]
-        precipitation_type_96hr = [self.weather_96hr[i]["precipitation_type"]["value"] for i in range(0, len(self.weather_96hr))]
-        self.precipitation_type_forecast_96hr = {time_96hr[i]: precipitation_type_96hr[i] for i in range(len(time_96hr))}
+        self.precipitation_type_forecast_96hr = self._forecast_dict("96hr", "precipitation_type")
         logger.debug(f'Returning dictionary containing time:value pair, "self.precipitation_type_forecast_96hr \n')
         return self.precipitation_type_forecast_96hr
 
     # Class method get_precipitation_type_6hr() returns a dictionary of the temperature against time
     def get_precipitation_type_6hr(self):
         logger.debug(f'Function call: get_precipitation_type_6hr()')
-        time_6hr = [local_time(self.weather_6hr[i]["observation_time"]["value"]) for i in range(0, len(self.weather_6hr))]
-        precipitation_type_6hr = [self.weather_6hr[i]["precipitation_type"]["value"] for i in range(0, len(self.weather_6hr))]
-        self.precipitation_type_forecast_6hr = {time_6hr[i]: precipitation_type_6hr[i] for i in range(len(time_6hr))}
+        self.precipitation_type_forecast_6hr = self._forecast_dict("6hr", "precipitation_type")
         logger.debug(f'Returning dictionary containing time:value pair, "self.precipitation_type_forecast_6hr \n')
         return self.precipitation_type_forecast_6hr
 
@@ -341,18 +467,14 @@ class Resort():
     # Class method get_feels_like_96hr() returns a dictionary of the precipitation against time
     def get_feels_like_96hr(self):
         logger.debug(f'Function call: get_feels_like_96hr()')
-        time_96hr = [local_time(self.weather_96hr[i]["observation_time"]["value"]) for i in range(0, len(self.weather_96hr))]
-        feels_like_96hr = [self.weather_96hr[i]["feels_like"]["value"] for i in range(0, len(self.weather_96hr))]
-        self.feels_like_forecast_96hr = {time_96hr[i]: feels_like_96hr[i] for i in range(len(time_96hr))}
+        self.feels_like_forecast_96hr = self._forecast_dict("96hr", "feels_like")
         logger.debug(f'Returning dictionary containing time:value pair, "self.feels_like_forecast_96hr \n')
         return self.feels_like_forecast_96hr
 
     # Class method get_precipitation_6hr() returns a dictionary of the temperature against time
     def get_feels_like_6hr(self):
         logger.debug(f'Function call: get_feels_like_6hr()')
-        time_6hr = [local_time(self.weather_6hr[i]["observation_time"]["value"]) for i in range(0, len(self.weather_6hr))]
-        feels_like_6hr = [self.weather_6hr[i]["feels_like"]["value"] for i in range(0, len(self.weather_6hr))]
-        self.feels_like_forecast_6hr = {time_6hr[i]: feels_like_6hr[i] for i in range(len(time_6hr))}
+        self.feels_like_forecast_6hr = self._forecast_dict("6hr", "feels_like")
         logger.debug(f'Returning dictionary containing time:value pair, "self.feels_like_forecast_6hr \n')
         return self.feels_like_forecast_6hr
 
@@ -369,18 +491,14 @@ class Resort():
     # Class method get_wind_speed_96hr() returns a dictionary of the precipitation against time
     def get_wind_speed_96hr(self):
         logger.debug(f'Function call: get_wind_speed_96hr()')
-        time_96hr = [local_time(self.weather_96hr[i]["observation_time"]["value"]) for i in range(0, len(self.weather_96hr))]
-        wind_speed_96hr = [self.weather_96hr[i]["wind_speed"]["value"] for i in range(0, len(self.weather_96hr))]
-        self.wind_speed_forecast_96hr = {time_96hr[i]: wind_speed_96hr[i] for i in range(len(time_96hr))}
+        self.wind_speed_forecast_96hr = self._forecast_dict("96hr", "wind_speed")
         logger.debug(f'Returning dictionary containing time:value pair, "self.wind_speed_forecast_96hr \n')
         return self.wind_speed_forecast_96hr
 
     # Class method get_precipitation_6hr() returns a dictionary of the temperature against time
     def get_wind_speed_6hr(self):
         logger.debug(f'Function call: get_wind_speed_6hr()')
-        time_6hr = [local_time(self.weather_6hr[i]["observation_time"]["value"]) for i in range(0, len(self.weather_6hr))]
-        wind_speed_6hr = [self.weather_6hr[i]["wind_speed"]["value"] for i in range(0, len(self.weather_6hr))]
-        self.wind_speed_forecast_6hr = {time_6hr[i]: wind_speed_6hr[i] for i in range(len(time_6hr))}
+        self.wind_speed_forecast_6hr = self._forecast_dict("6hr", "wind_speed")
         logger.debug(f'Returning dictionary containing time:value pair, "self.wind_speed_forecast_6hr \n')
         return self.wind_speed_forecast_6hr
 
@@ -391,32 +509,6 @@ class Resort():
         logger.debug(f'Returning dictionary containing time:value pair, "self.wind_speed_forecast_now \n')
         return self.wind_speed_forecast_now
 
-get_resort_keys()
-
-#     def checkSnow(self):
-#         self.snowIn96hrForecast = [(self.weatherJson96hr[i]["precipitation"]["value"] if self.weatherJson96hr[i]["precipitation_type"]["value"] == "snow" else 0) for i in range(0, len(self.weatherJson96hr))]
-#         # Calculates the amount of snow in the next 96hr
-#         self.accumulatedSnow = 0
-#         for snow in self.snowIn96hrForecast:
-#             self.accumulatedSnow = float(snow) + self.accumulatedSnow
-        
-#         # Creates an attribute called self.isSnow to indicate to the user if there is snow or not
-#         if self.accumulatedSnow > 0:
-#             self.isSnow = True
-#         else:
-#             self.isSnow = False        
-
-#     # This method  checks if there is snow in the next 4 days and prints it to the user
-#     def print4DaySnow(self):
-#         self.checkSnow()
-#         if self.isSnow:
-#             print(self.name + ": SNOW IN THE NEXT 4 DAYS")
-#             print(f"{self.accumulatedSnow :.2f} mm of snow")
-#             print("")
-#         else:
-#             print(self.name + ": NO SNOW IN THE NEXT 4 DAYS")
-#             print("")
-
 #     # This method takes the return values of queryByResort() and realTimeJson() as arguments and prints current forecast information
 #     def printRealTimeWeather(self):
 #         print(f"Location: {self.name}")
@@ -430,29 +522,3 @@ get_resort_keys()
 #         print(f"Cloud Cover: {self.nowCloudCover}m")
 
 #     # This method takes a weatherJson as an input and then plots the temperature against observation time
-
-
-# # This method takes a country as an arg and returns a list of dicts of the resorts in that country (contains a list of dicts containing name, country, lat and lon information)
-# def resortsInCountry(country):
-#     with open(SKI_RESORT_JSON, "r") as f:
-#         resortDictList = json.load(f)
-#         resortsInCountry = [
-#             resortDictList[resort]["name"]
-#             for resort in resortDictList
-#             if resortDictList[resort]["country"].lower() == country.lower()
-#         ]
-#         return resortsInCountry
-
-
-# # Create a method takes the string of the country (only "Canada" or "USA" currently) as an arg and checks every resort in the country as listed in the json file to see if there is snow
-# # TODO: Create a thread to make this run faster
-# def queryByCountry(country):
-#     with open(SKI_RESORT_JSON, "r") as f:
-#         resortDictList = json.load(f)
-#         for key in resortDictList:
-#             if resortDictList[key]["country"].lower() == country.lower():
-#                 resortObj = Resort(key)
-#                 resortObj.print4DaySnow()
-
-# resort = Resort("sunshine", "96hr")
-# resort.print4DaySnow()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+
+# math is used for the haversine distance and the conversion between arc and chord length
+# heapq is used to keep the k nearest resorts found so far
+
+import heapq
+import math
+
+"""
+This module holds a spatial index over the resort coordinates in the registry.
+
+Each resort is placed on the unit sphere as an (x, y, z) point so the straight line (chord) distance
+between two points always grows with the great circle distance between them. The points are stored
+in a k-d tree with small leaf buckets, which answers "resorts within r km of a point" and "k nearest
+resorts to a point" by visiting only the branches that can hold a match instead of scanning every
+resort.
+"""
+
+EARTH_RADIUS_KM = 6371.0088
+LEAF_SIZE = 16
+
+
+# Returns the great circle distance in km between two points given in degrees
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+# Returns the point on the unit sphere for a latitude and longitude in degrees
+def to_xyz(lat, lon):
+    lat, lon = math.radians(float(lat)), math.radians(float(lon))
+    cos_lat = math.cos(lat)
+    return (cos_lat * math.cos(lon), cos_lat * math.sin(lon), math.sin(lat))
+
+
+# Converts a great circle distance in km to the chord length between the two points on the unit sphere
+def km_to_chord(km):
+    return 2 * math.sin(min(km / EARTH_RADIUS_KM, math.pi) / 2)
+
+
+# Converts a squared chord length on the unit sphere back to a great circle distance in km
+def chord2_to_km(chord2):
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(chord2) / 2))
+
+
+# Returns the centre of the grid cell holding a point, resolution is the cell size in degrees
+# Resorts closer together than the forecast model's grid can share one request for the cell
+def snap_to_grid(lat, lon, resolution):
+    return (
+        round(round(float(lat) / resolution) * resolution, 6),
+        round(round(float(lon) / resolution) * resolution, 6),
+    )
+
+
+class SpatialIndex():
+    # records is a sequence of objects with lat and lon attributes, usually ResortRecords
+    def __init__(self, records, leaf_size=LEAF_SIZE):
+        self.records = list(records)
+        self.leaf_size = leaf_size
+        self.points = [to_xyz(record.lat, record.lon) for record in self.records]
+        self._root = self._build(list(range(len(self.points))))
+
+    @classmethod
+    def from_registry(cls, registry, leaf_size=LEAF_SIZE):
+        return cls(list(registry), leaf_size=leaf_size)
+
+    def __len__(self):
+        return len(self.records)
+
+    # Returns a list of (record, distance in km) for every record within radius_km of the point, nearest first
+    def within_radius(self, lat, lon, radius_km):
+        query = to_xyz(lat, lon)
+        radius = km_to_chord(radius_km)
+        radius2 = radius * radius
+        points = self.points
+
+        found = []
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            if type(node) is list:
+                for i in node:
+                    x, y, z = points[i]
+                    chord2 = (x - query[0]) ** 2 + (y - query[1]) ** 2 + (z - query[2]) ** 2
+                    if chord2 <= radius2:
+                        found.append((chord2, i))
+                continue
+            axis, split, left, right = node
+            diff = query[axis] - split
+            if diff <= radius:
+                stack.append(left)
+            if diff >= -radius:
+                stack.append(right)
+
+        found.sort()
+        return [(self.records[i], chord2_to_km(chord2)) for chord2, i in found]
+
+    # Returns a list of (record, distance in km) for the k records nearest to the point, nearest first
+    def nearest(self, lat, lon, k=1):
+        if k <= 0 or not self.records:
+            return []
+        query = to_xyz(lat, lon)
+        points = self.points
+        # Max heap of the best k so far, stored as (-chord2, index)
+        best = []
+
+        def visit(node):
+            if type(node) is list:
+                for i in node:
+                    x, y, z = points[i]
+                    chord2 = (x - query[0]) ** 2 + (y - query[1]) ** 2 + (z - query[2]) ** 2
+                    if len(best) < k:
+                        heapq.heappush(best, (-chord2, i))
+                    elif chord2 < -best[0][0]:
+                        heapq.heapreplace(best, (-chord2, i))
+                return
+            axis, split, left, right = node
+            diff = query[axis] - split
+            near, far = (left, right) if diff <= 0 else (right, left)
+            visit(near)
+            if len(best) < k or diff * diff < -best[0][0]:
+                visit(far)
+
+        visit(self._root)
+        return [(self.records[i], chord2_to_km(-negative_chord2)) for negative_chord2, i in sorted(best, reverse=True)]
+
+    # Builds the tree over the given point indices, splitting on the axis with the widest spread
+    # Internal nodes are (axis, split, left, right) tuples, leaves are lists of point indices
+    def _build(self, indices):
+        if len(indices) <= self.leaf_size:
+            return indices
+        points = self.points
+        spreads = [
+            max(points[i][axis] for i in indices) - min(points[i][axis] for i in indices) for axis in range(3)
+        ]
+        axis = spreads.index(max(spreads))
+        indices.sort(key=lambda i: points[i][axis])
+        middle = len(indices) // 2
+        split = points[indices[middle]][axis]
+        return (axis, split, self._build(indices[:middle]), self._build(indices[middle:]))
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+
+# dateutil.parser is used to convert UTC format into datetime format when the fast path can't
+# datetime.fromisoformat is used for the fixed ISO 8601 "...Z" format Climacell returns
+# numpy is used to convert whole arrays of timestamps at once
+# tzlocal is used to convert UTC timezone into the system timezone
+# dateutil, numpy and tzlocal are imported by the functions that need them so importing this module stays cheap
+
+import functools
+from datetime import datetime, timezone
+
+"""
+Timestamp helpers shared by snowReport and the forecast series.
+
+Climacell always returns observation times as ISO 8601 strings in UTC with a trailing "Z", for
+example "2021-01-07T23:00:00.000Z". Those are parsed with datetime.fromisoformat, which is much
+cheaper than the general purpose dateutil parser; anything else still goes through dateutil. The
+system timezone is looked up once per process, and because every resort's forecast uses the same
+hourly timestamps, local_time() remembers the strings it has already converted.
+"""
+
+LOCAL_TIME_CACHE_SIZE = 4096
+
+
+# Returns the system timezone, it is only looked up the first time
+@functools.lru_cache(maxsize=1)
+def local_zone():
+    from tzlocal import get_localzone
+
+    return get_localzone()
+
+
+# Converts an ISO 8601 string to an aware datetime, using the fast path for strings ending in "Z"
+def parse_utc(UTC_time):
+    if UTC_time.endswith("Z"):
+        try:
+            return datetime.fromisoformat(UTC_time[:-1]).replace(tzinfo=timezone.utc)
+        except ValueError:
+            pass
+    import dateutil.parser as dp
+
+    return dp.parse(UTC_time)
+
+
+# This method takes the string of a time in ISO 8601 format and converts it to local time using the system timezone
+@functools.lru_cache(maxsize=LOCAL_TIME_CACHE_SIZE)
+def local_time(UTC_time):
+    return parse_utc(UTC_time).astimezone(local_zone())  # returns a datetime.datetime object
+
+
+# Converts a sequence of ISO 8601 UTC strings to a datetime64[ms] array in one call
+def utc_datetime64(UTC_times):
+    import numpy as np
+
+    return np.array([UTC_time[:-1] if UTC_time.endswith("Z") else UTC_time for UTC_time in UTC_times], dtype="datetime64[ms]")
+
+
+# Converts a datetime64 array of UTC times to a list of local datetime objects
+def to_local_times(times):
+    import numpy as np
+
+    return [local_time_ms(ms) for ms in times.astype("datetime64[ms]").astype(np.int64).tolist()]
+
+
+# Converts milliseconds since the epoch to local time, remembered like local_time() because forecasts share their hours
+@functools.lru_cache(maxsize=LOCAL_TIME_CACHE_SIZE)
+def local_time_ms(ms):
+    return datetime.fromtimestamp(ms / 1000.0, local_zone())
+
+
+# Batch version of local_time(), converts a sequence of ISO 8601 UTC strings to local datetime objects
+def local_times(UTC_times):
+    return to_local_times(utc_datetime64(UTC_times))
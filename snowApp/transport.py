@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+
+# random is used to inject latency jitter and errors into replayed responses
+# requests is used for the exceptions a dropped replayed request raises, the same ones a real session raises
+
+import json
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+
+"""
+This module holds the transports ClimacellClient can send its requests through instead of the network.
+
+A transport is anything with the get(url, params=..., timeout=..., stream=...) and close() methods of
+requests.Session, returning objects that behave like requests.Response. ClimacellClient uses a pooled
+requests.Session by default, and takes another transport through ClimacellClient(transport=...):
+
+    ReplayTransport     answers every request with a recorded response body, optionally after a
+                        simulated round trip (latency + up to jitter seconds) and with a share of
+                        requests failing with an HTTP error (error_rate) or a dropped connection
+                        (drop_rate). Like the api, only the fields named in the querystring are returned.
+    RecordingTransport  wraps another transport and saves every successful response to a directory
+                        that ReplayTransport.from_directory() can load.
+
+Recordings are named after the Climacell endpoint, realtime.json, nowcast.json and hourly.json
+are served for any coordinates, and realtime_<lat>_<lon>.json and so on for one location.
+"""
+
+logger = logging.getLogger(__name__)
+
+# The recorded fixtures in tests/Resources for each endpoint
+TEST_FIXTURES = {
+    "realtime": "test_realtimeJson.json",
+    "nowcast": "test_360minJson.json",
+    "hourly": "test_96hrJson.json",
+}
+# Keys returned by the api whatever fields were asked for
+ALWAYS_RETURNED = frozenset(["lat", "lon", "observation_time"])
+
+
+# Returns the Climacell endpoint ("realtime", "nowcast" or "hourly") a URL points to
+def endpoint_name(url):
+    return urlsplit(url).path.rstrip("/").rsplit("/", 1)[-1]
+
+
+# Returns the file name a response for an endpoint is recorded under, for one location or for any coordinates
+def recording_name(endpoint, lat=None, lon=None):
+    if lat is None:
+        return f'{endpoint}.json'
+    return f'{endpoint}_{lat}_{lon}.json'
+
+
+# Returns the body with only the requested fields (plus lat, lon and observation_time) in each row
+def select_fields(body, fields):
+    kept = set(fields.split(",")) | ALWAYS_RETURNED
+    payload = json.loads(body)
+    rows = payload if isinstance(payload, list) else [payload]
+    rows = [{name: value for name, value in row.items() if name in kept} for row in rows]
+    return json.dumps(rows if isinstance(payload, list) else rows[0]).encode("utf-8")
+
+
+# A stand-in for requests.Response holding a body that is already in memory
+class ReplayResponse():
+    def __init__(self, status_code, content, url="", headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.url = url
+        self.headers = dict(headers or {})
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8")
+
+    def json(self):
+        return json.loads(self.content)
+
+    def iter_content(self, chunk_size=1):
+        for i in range(0, len(self.content), chunk_size):
+            yield self.content[i:i + chunk_size]
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ReplayTransport():
+    # bodies maps an endpoint, or (endpoint, lat, lon) for one location, to the recorded response body
+    # latency and jitter are the seconds every request takes, latency plus a random share of jitter
+    # error_rate is the share of requests answered with error_status, drop_rate the share that raise requests.ConnectionError
+    # seed makes the injected jitter and errors repeatable, sleep can be replaced in tests
+    def __init__(self, bodies, latency=0.0, jitter=0.0, error_rate=0.0, error_status=503, drop_rate=0.0, seed=None, sleep=time.sleep):
+        self.bodies = dict(bodies)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.drop_rate = drop_rate
+        self.sleep = sleep
+        self.request_count = 0
+        self.bytes_sent = 0
+        self.errors = 0
+        self.drops = 0
+        self.by_endpoint = {}
+        self._random = random.Random(seed)
+        # (body key, fields): the body limited to those fields
+        self._selected = {}
+        self._lock = threading.Lock()
+
+    # Loads every recording in a directory, names maps an endpoint to a file name when it isn't <endpoint>.json
+    @classmethod
+    def from_directory(cls, directory, names=None, **kwargs):
+        bodies = {}
+        for endpoint, file_name in (names or {}).items():
+            with open(os.path.join(directory, file_name), "rb") as f:
+                bodies[endpoint] = f.read()
+        if names is None:
+            for file_name in sorted(os.listdir(directory)):
+                if not file_name.endswith(".json"):
+                    continue
+                parts = file_name[:-len(".json")].split("_")
+                key = parts[0] if len(parts) == 1 else tuple(parts) if len(parts) == 3 else None
+                if key is None:
+                    continue
+                with open(os.path.join(directory, file_name), "rb") as f:
+                    bodies[key] = f.read()
+        return cls(bodies, **kwargs)
+
+    # Loads the fixtures in tests/Resources
+    @classmethod
+    def from_test_fixtures(cls, **kwargs):
+        directory = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tests", "Resources")
+        return cls.from_directory(directory, TEST_FIXTURES, **kwargs)
+
+    # Answers a request the way requests.Session.get() would, timeout and stream are accepted and ignored
+    def get(self, url, params=None, timeout=None, stream=False):
+        params = params or {}
+        endpoint = endpoint_name(url)
+        with self._lock:
+            self.request_count += 1
+            self.by_endpoint[endpoint] = self.by_endpoint.get(endpoint, 0) + 1
+            delay = self.latency + self._random.random() * self.jitter
+            outcome = self._random.random()
+
+        if delay > 0:
+            self.sleep(delay)
+        if outcome < self.drop_rate:
+            with self._lock:
+                self.drops += 1
+            raise requests.ConnectionError(f'Replayed connection to {url} dropped')
+        if outcome < self.drop_rate + self.error_rate:
+            with self._lock:
+                self.errors += 1
+            return ReplayResponse(self.error_status, b'{"message": "injected error"}', url)
+
+        body = self._body(endpoint, params)
+        if body is None:
+            return ReplayResponse(404, b'{"message": "no recording"}', url)
+        with self._lock:
+            self.bytes_sent += len(body)
+        return ReplayResponse(200, body, url, {"Content-Type": "application/json"})
+
+    def close(self):
+        pass
+
+    def _body(self, endpoint, params):
+        key = (endpoint, str(params.get("lat")), str(params.get("lon")))
+        if key not in self.bodies:
+            key = endpoint
+        body = self.bodies.get(key)
+        fields = params.get("fields")
+        if body is None or not fields:
+            return body
+        selected = self._selected.get((key, fields))
+        if selected is None:
+            selected = self._selected.setdefault((key, fields), select_fields(body, fields))
+        return selected
+
+
+class RecordingTransport():
+    # transport is the transport requests are sent through, a requests.Session by default
+    # Every successful response is written to directory, and the first one for each endpoint also as <endpoint>.json
+    def __init__(self, directory, transport=None):
+        self.directory = directory
+        self.transport = transport if transport is not None else requests.Session()
+        self.recorded = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    # Sends the request and records the response, the body is always read in full so it can be saved
+    def get(self, url, params=None, timeout=None, stream=False):
+        params = params or {}
+        response = self.transport.get(url, params=params, timeout=timeout, stream=False)
+        if not response.ok:
+            return response
+
+        endpoint = endpoint_name(url)
+        content = response.content
+        self._write(recording_name(endpoint, params.get("lat"), params.get("lon")), content)
+        with self._lock:
+            if not os.path.exists(os.path.join(self.directory, recording_name(endpoint))):
+                self._write(recording_name(endpoint), content)
+            self.recorded += 1
+        return ReplayResponse(response.status_code, content, url, response.headers)
+
+    def close(self):
+        self.transport.close()
+
+    # Writes to a temporary file first so a replay never loads half a recording
+    def _write(self, file_name, content):
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+        os.replace(temp_path, os.path.join(self.directory, file_name))
+        logger.debug(f'Recorded {len(content)} bytes to {file_name}')
@@ -0,0 +1,9 @@
+import os
+import sys
+
+sys.path.append(os.getcwd())
+
+from snowApp import snowReport
+
+# Every Resort the tests create logs at the debug level, keep it out of snowApp/snowApp.log
+snowReport.set_logging(False)
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+from mock import MagicMock
+
+sys.path.append(os.getcwd())
+
+from snowApp import snowReport
+
+"""
+This module holds the helpers shared by the unit tests: a clock the tests move by hand and Resorts
+built from fixture rows without a client
+"""
+
+RESOURCES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Resources")
+
+
+# A clock that only moves when a test sets now
+class FakeClock():
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+# Returns a Resort with a mocked client holding the given realtime weather and forecast rows
+def make_resort(resort_key="fernie", rows_96hr=None, rows_6hr=None, realtime=None):
+    resort = snowReport.Resort(resort_key, client=MagicMock())
+    if realtime is not None:
+        resort.set_now(realtime)
+    if rows_6hr is not None:
+        resort.set_6hr(rows_6hr)
+    if rows_96hr is not None:
+        resort.set_96hr(rows_96hr)
+    return resort
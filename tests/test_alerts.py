@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import random
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.append(os.getcwd())
+
+from snowApp.alerts import SnowAlertEngine
+from snowApp.series import ForecastSeries
+
+"""
+This module is used to unit test the snow accumulation and alert engine in alerts.py
+The vectorized numbers are checked against a plain loop over each forecast, like the old checkSnow()
+"""
+
+RESOURCES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Resources")
+
+with open(os.path.join(RESOURCES, "test_96hrJson.json"), "r") as f:
+    test96hrDict = json.load(f)
+
+
+# Builds an hourly series of the given length with random snow, rain and dry hours
+def random_series(hours, seed):
+    rng = random.Random(seed)
+    times = np.arange(hours).astype("timedelta64[h]") + np.datetime64("2021-01-07T23:00", "ms")
+    columns = {
+        "precipitation": np.array([rng.choice([0.0, rng.uniform(0, 3)]) for _ in range(hours)]),
+        "precipitation_type": np.array([rng.choice(["snow", "snow", "rain", "none"]) for _ in range(hours)], dtype=object),
+        "precipitation_probability": np.array([float(rng.randint(0, 100)) for _ in range(hours)]),
+    }
+    return ForecastSeries(times, [], columns)
+
+
+def loop_snow_total(series, window):
+    total = 0.0
+    for i in range(min(window, len(series))):
+        if series["precipitation_type"][i] == "snow":
+            total += series["precipitation"][i]
+    return total
+
+
+class testSnowAlertEngine(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.series_list = [random_series(hours, seed) for seed, hours in enumerate([96, 109, 40, 0, 96])]
+        cls.resort_keys = [f'resort{i}' for i in range(len(cls.series_list))]
+        cls.engine = SnowAlertEngine(thresholds={24: 5.0, 96: 40.0})
+        cls.outlook = cls.engine.evaluate_series(cls.resort_keys, cls.series_list)
+
+    # The totals should match adding up each forecast one hour at a time
+    def test_totalsMatchLoop(self):
+        for i, series in enumerate(self.series_list):
+            for window in (6, 12, 24, 48, 96):
+                self.assertAlmostEqual(self.outlook.totals[window][i], loop_snow_total(series, window))
+
+    def test_peakRateAndMaxRolling(self):
+        series = self.series_list[0]
+        snowfall = [p if t == "snow" else 0.0 for p, t in zip(series["precipitation"], series["precipitation_type"])]
+        self.assertAlmostEqual(self.outlook.peak_rate[0], max(snowfall))
+        self.assertAlmostEqual(self.outlook.max_rolling[6][0], max(sum(snowfall[i:i + 6]) for i in range(91)))
+
+    # Each hour's snowfall is weighted by the probability of precipitation
+    def test_expectedAccumulation(self):
+        series = self.series_list[1]
+        expected = sum(
+            p * probability / 100.0
+            for p, t, probability in zip(series["precipitation"][:24], series["precipitation_type"][:24], series["precipitation_probability"][:24])
+            if t == "snow"
+        )
+        self.assertAlmostEqual(self.outlook.expected[24][1], expected)
+
+    # A resort with no forecast yet has no snow
+    def test_emptyForecast(self):
+        self.assertEqual(self.outlook.summary("resort3")["totals"][96], 0.0)
+
+    def test_rankingAndAlerts(self):
+        ranking = self.outlook.ranking(96)
+        self.assertEqual([value for _, value in ranking], sorted((value for _, value in ranking), reverse=True))
+
+        for alert in self.engine.alerts(self.outlook):
+            i = self.resort_keys.index(alert.resort_key)
+            self.assertGreaterEqual(self.outlook.totals[alert.window][i], alert.threshold)
+        alerted = {(alert.resort_key, alert.window) for alert in self.engine.alerts(self.outlook)}
+        for window, threshold in self.engine.thresholds.items():
+            for i, resort_key in enumerate(self.resort_keys):
+                self.assertEqual((resort_key, window) in alerted, self.outlook.totals[window][i] >= threshold)
+
+    # The recorded forecast only has a trace of snow, well under the default thresholds
+    def test_recordedForecast(self):
+        outlook = SnowAlertEngine().evaluate_series(["calgary"], [ForecastSeries.from_payload(test96hrDict)])
+        self.assertAlmostEqual(outlook.totals[96][0], 0.0103)
+        self.assertEqual(outlook.expected[96][0], 0.0)
+        self.assertEqual(SnowAlertEngine().alerts(outlook), [])
+
+    def test_windowOutsideForecast(self):
+        with self.assertRaises(ValueError):
+            SnowAlertEngine(windows=(120,))
+
+
+if __name__ == "__main__":
+    unittest.main()
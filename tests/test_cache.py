@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.append(os.getcwd())
+
+from snowApp.cache import ResponseCache
+from tests.helpers import FakeClock
+
+"""
+This module is used to unit test the TTL response cache in cache.py
+A fake clock is used so the tests don't have to wait for entries to expire
+"""
+
+
+def make_key(endpoint, lat="51.0447"):
+    return ResponseCache.make_key(endpoint, {"lat": lat, "lon": "-114.066666", "fields": "temp,precipitation"})
+
+
+class testResponseCache(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = ResponseCache(ttls={"realtime": 60, "hourly": 1800}, max_entries=2, clock=self.clock)
+
+    # The key is built from the endpoint, coordinates and fields, not the api key
+    def test_makeKey(self):
+        key = ResponseCache.make_key("hourly", {"lat": 51.0447, "lon": -114.066666, "fields": "temp", "apikey": "x"})
+        self.assertEqual(key, ("hourly", "51.0447", "-114.066666", "temp"))
+
+    # Each endpoint should expire after its own TTL
+    def test_perEndpointTTL(self):
+        self.cache.set(make_key("realtime"), {"temp": 1})
+        self.cache.set(make_key("hourly"), [{"temp": 2}])
+
+        self.clock.now += 61
+        self.assertIsNone(self.cache.get(make_key("realtime")))
+        self.assertEqual(self.cache.get(make_key("hourly")), [{"temp": 2}])
+        self.assertEqual(self.cache.stats.expirations, 1)
+        self.assertEqual(self.cache.stats.hits, 1)
+        self.assertEqual(self.cache.stats.misses, 1)
+
+    # Endpoints without a TTL are not cached at all
+    def test_endpointWithoutTTL(self):
+        self.cache.set(make_key("nowcast"), [{"temp": 3}])
+        self.assertIsNone(self.cache.get(make_key("nowcast")))
+
+    # The least recently used entry should be evicted once max_entries is reached
+    def test_lruEviction(self):
+        self.cache.set(make_key("hourly", "1"), 1)
+        self.cache.set(make_key("hourly", "2"), 2)
+        self.cache.get(make_key("hourly", "1"))
+        self.cache.set(make_key("hourly", "3"), 3)
+
+        self.assertEqual(len(self.cache), 2)
+        self.assertEqual(self.cache.stats.evictions, 1)
+        self.assertIsNone(self.cache.get(make_key("hourly", "2")))
+        self.assertEqual(self.cache.get(make_key("hourly", "1")), 1)
+
+    # A new cache pointed at the same directory should be able to serve entries written by the old one
+    def test_diskTier(self):
+        disk_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, disk_dir)
+
+        ResponseCache(disk_dir=disk_dir, clock=self.clock).set(make_key("hourly"), [{"temp": 2}])
+        cold_cache = ResponseCache(disk_dir=disk_dir, clock=self.clock)
+
+        self.assertEqual(cold_cache.get(make_key("hourly")), [{"temp": 2}])
+        self.assertEqual(cold_cache.stats.disk_hits, 1)
+
+        self.clock.now += 1801
+        self.assertIsNone(ResponseCache(disk_dir=disk_dir, clock=self.clock).get(make_key("hourly")))
+
+    def test_statsAsDict(self):
+        self.cache.get(make_key("hourly"))
+        self.assertEqual(self.cache.stats.as_dict()["misses"], 1)
+        self.assertEqual(self.cache.stats.hit_rate, 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import threading
+import unittest
+from mock import patch, MagicMock
+
+sys.path.append(os.getcwd())
+
+from snowApp import client, snowReport
+from snowApp.cache import ResponseCache
+
+"""
+This module is used to unit test the pooled Climacell client in client.py
+"""
+
+
+class testClimacellClient(unittest.TestCase):
+
+    # The adapter mounted on the session should hold pool_size connections and retry 429/5xx with backoff
+    def test_poolAndRetryConfiguration(self):
+        with client.ClimacellClient(pool_size=25, retries=2, backoff_factor=0.1) as test_client:
+            adapter = test_client.session.get_adapter("https://api.climacell.co")
+            self.assertEqual(adapter._pool_maxsize, 25)
+            self.assertEqual(adapter.max_retries.total, 2)
+            self.assertEqual(adapter.max_retries.backoff_factor, 0.1)
+            self.assertIn(429, adapter.max_retries.status_forcelist)
+            self.assertIn(503, adapter.max_retries.status_forcelist)
+
+    # Every request should be sent with the connect and read timeouts
+    def test_getUsesTimeouts(self):
+        test_client = client.ClimacellClient(connect_timeout=1, read_timeout=5)
+        with patch.object(test_client.session, "get") as mocked_get:
+            test_client.get(snowReport.URL_REALTIME, {"lat": "51.0447"})
+        mocked_get.assert_called_once_with(snowReport.URL_REALTIME, params={"lat": "51.0447"}, timeout=(1, 5), stream=False)
+
+    # Resorts that aren't given a client should all share the default one
+    def test_resortsShareDefaultClient(self):
+        self.assertIs(snowReport.Resort("fernie").client, snowReport.Resort("whistler").client)
+        self.assertIs(snowReport.Resort("fernie").client, client.get_default_client())
+
+    # Requests made by a Resort should go through its client
+    def test_resortRequestUsesClient(self):
+        test_client = MagicMock()
+        test_client.fetch_series.return_value = None
+        resort = snowReport.Resort("fernie", client=test_client)
+
+        self.assertFalse(resort.request_96hr())
+        endpoint, url, querystring = test_client.fetch_series.call_args[0]
+        self.assertEqual(endpoint, "hourly")
+        self.assertEqual(url, snowReport.URL_HOURLY)
+        self.assertEqual(querystring["lat"], str(resort.lat))
+
+    # A second fetch for the same coordinates should be answered from the cache
+    def test_fetchUsesCache(self):
+        test_client = client.ClimacellClient(cache=ResponseCache())
+        response = MagicMock(ok=True, text='{"temp": {"value": -1.31}}')
+        querystring = {"lat": "51.0447", "lon": "-114.066666", "fields": "temp"}
+        with patch.object(test_client.session, "get", return_value=response) as mocked_get:
+            first = test_client.fetch("realtime", snowReport.URL_REALTIME, querystring)
+            second = test_client.fetch("realtime", snowReport.URL_REALTIME, querystring)
+
+        self.assertEqual(mocked_get.call_count, 1)
+        self.assertEqual(first, second)
+        self.assertEqual(test_client.cache.stats.hits, 1)
+
+    # Failed responses should not be cached
+    def test_fetchFailureNotCached(self):
+        test_client = client.ClimacellClient(cache=ResponseCache())
+        querystring = {"lat": "51.0447", "lon": "-114.066666", "fields": "temp"}
+        with patch.object(test_client.session, "get", return_value=MagicMock(ok=False, status_code=503)) as mocked_get:
+            self.assertIsNone(test_client.fetch("hourly", snowReport.URL_HOURLY, querystring))
+            self.assertIsNone(test_client.fetch("hourly", snowReport.URL_HOURLY, querystring))
+
+        self.assertEqual(mocked_get.call_count, 2)
+
+    # Concurrent fetches for the same coordinates should share one request
+    def test_fetchSingleFlight(self):
+        test_client = client.ClimacellClient()
+        release = threading.Event()
+
+        def slow_get(url, params, timeout, stream):
+            release.wait(5)
+            return MagicMock(ok=True, text='[{"temp": {"value": -1.16}}]')
+
+        querystring = {"lat": "51.0", "lon": "-116.0", "fields": "temp"}
+        results = []
+        with patch.object(test_client.session, "get", side_effect=slow_get) as mocked_get:
+            threads = [
+                threading.Thread(target=lambda: results.append(test_client.fetch("hourly", snowReport.URL_HOURLY, querystring)))
+                for _ in range(4)
+            ]
+            for thread in threads:
+                thread.start()
+            while test_client.in_flight.coalesced < 3:
+                threading.Event().wait(0.01)
+            release.set()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(mocked_get.call_count, 1)
+        self.assertEqual(results, [[{"temp": {"value": -1.16}}]] * 4)
+
+    # An error in the shared request should be raised in every waiting caller
+    def test_singleFlightError(self):
+        in_flight = client.SingleFlight()
+        with self.assertRaises(ValueError):
+            in_flight.do("key", lambda: int("not a number"))
+        self.assertEqual(in_flight.do("key", lambda: 1), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
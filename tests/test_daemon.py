@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import signal
+import sys
+import threading
+import unittest
+from mock import MagicMock
+
+sys.path.append(os.getcwd())
+
+from snowApp import daemon
+from snowApp.history import ForecastHistory
+from snowApp.transport import ReplayTransport
+from tests.helpers import FakeClock
+
+"""
+This module is used to unit test the polling daemon in daemon.py
+The client is mocked so no requests are sent to Climacell, and a fake clock drives the schedule
+"""
+
+RESOURCES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Resources")
+
+with open(os.path.join(RESOURCES, "test_96hrJson.json"), "r") as f:
+    test96hrDict = json.load(f)
+
+with open(os.path.join(RESOURCES, "test_360minJson.json"), "r") as f:
+    test360minDict = json.load(f)
+
+with open(os.path.join(RESOURCES, "test_realtimeJson.json"), "r") as f:
+    testRealtimeDict = json.load(f)
+
+with open(os.path.join(RESOURCES, "test_realtimeJson.json"), "rb") as f:
+    testRealtimeBytes = f.read()
+
+
+def make_client():
+    test_client = MagicMock()
+    test_client.cache = None
+    test_client.rate_limiter = None
+    test_client.fetch.return_value = testRealtimeDict
+    test_client.fetch_series.side_effect = lambda endpoint, url, querystring, **kwargs: {"nowcast": test360minDict, "hourly": test96hrDict}[endpoint]
+    return test_client
+
+
+class testPollingDaemon(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.client = make_client()
+        self.daemon = daemon.PollingDaemon(["fernie", "whistler"], client=self.client, max_workers=2, clock=self.clock)
+        self.addCleanup(self.daemon.close)
+
+    # Every endpoint is due in the first cycle, then each one comes back on its own cadence
+    def test_endpointCadences(self):
+        first = self.daemon.run_cycle()
+        self.assertEqual(first.by_endpoint, {"now": 2, "6hr": 2, "96hr": 2})
+        self.assertEqual(first.errors, 0)
+        self.assertEqual(len(self.daemon.resorts["fernie"].series_96hr), len(test96hrDict))
+
+        self.assertIsNone(self.daemon.run_cycle())
+        self.assertEqual(self.daemon.seconds_until_due(), 60)
+
+        self.clock.now += 60
+        self.assertEqual(self.daemon.run_cycle().by_endpoint, {"now": 2})
+        self.clock.now += 240
+        self.assertEqual(self.daemon.run_cycle().by_endpoint, {"now": 2, "6hr": 2})
+        self.assertEqual(self.client.fetch_series.call_count, 6)
+        self.assertEqual([stats.number for stats in self.daemon.cycles], [1, 2, 3])
+
+    # A daemon that fell behind schedules the next refresh a cadence after now rather than catching up
+    def test_fallingBehind(self):
+        self.daemon.run_cycle()
+        self.clock.now += 1000
+        self.daemon.run_cycle()
+        self.assertEqual(self.daemon.next_due[("fernie", "now")], self.clock.now + 60)
+
+    # Errors are counted per cycle and the resort is still refreshed on its next due time
+    def test_cycleErrors(self):
+        self.client.fetch.return_value = None
+        stats = self.daemon.run_cycle()
+        self.assertEqual(stats.errors, 2)
+        self.assertEqual(stats.as_dict()["requests"], 6)
+
+    # Every refresh, realtime weather included, is recorded in the history, and on_cycle sees every cycle
+    def test_historyAndOnCycle(self):
+        history = ForecastHistory(":memory:")
+        self.addCleanup(history.close)
+        cycles = []
+        test_daemon = daemon.PollingDaemon(
+            ["fernie"], client=self.client, history=history, clock=self.clock, on_cycle=lambda d, stats, results: cycles.append(stats)
+        )
+        self.addCleanup(test_daemon.close)
+        test_daemon.run_cycle()
+        self.clock.now += 300
+        test_daemon.run_cycle()
+
+        self.assertEqual(history.fetch_count("fernie", "now"), 2)
+        self.assertEqual(history.fetch_count("fernie", "6hr"), 2)
+        self.assertEqual(history.fetch_count("fernie", "96hr"), 1)
+        self.assertEqual(len(cycles), 2)
+
+    def test_unknownEndpoint(self):
+        with self.assertRaises(ValueError):
+            daemon.PollingDaemon(["fernie"], cadences={"7day": 60}, client=self.client)
+
+    # An empty schedule would leave run() spinning without ever finishing a cycle
+    def test_emptySchedule(self):
+        with self.assertRaises(ValueError):
+            daemon.PollingDaemon([], client=self.client)
+        with self.assertRaises(ValueError):
+            daemon.PollingDaemon(["fernie"], cadences={}, client=self.client)
+
+    # SIGTERM finishes the cycle in progress and returns from run(), the previous handler is put back
+    def test_sigtermStopsRun(self):
+        previous = signal.getsignal(signal.SIGTERM)
+        test_daemon = daemon.PollingDaemon(["fernie"], cadences={"now": 0.01}, client=self.client)
+        timer = threading.Timer(0.1, os.kill, (os.getpid(), signal.SIGTERM))
+        timer.start()
+        test_daemon.run()
+        timer.join()
+
+        self.assertGreater(test_daemon.cycle_count, 1)
+        self.assertIs(signal.getsignal(signal.SIGTERM), previous)
+
+    def test_runMaxCycles(self):
+        test_daemon = daemon.PollingDaemon(["fernie"], cadences={"now": 0.001}, client=self.client)
+        test_daemon.run(max_cycles=3, handle_signals=False)
+        self.assertEqual(test_daemon.cycle_count, 3)
+
+
+    # Every due refresh should reach the api, the default client's cache expires before the endpoint is due again
+    # The replay transport advances the clock by its latency, so each response is cached after its refresh was due
+    def test_refreshesBypassCache(self):
+        def advance(seconds):
+            self.clock.now += seconds
+
+        test_daemon = daemon.PollingDaemon(["fernie"], cadences={"now": 1.0}, clock=self.clock)
+        self.addCleanup(test_daemon.close)
+        transport = ReplayTransport({"realtime": testRealtimeBytes}, latency=0.05, sleep=advance)
+        test_daemon.client.session = transport
+        test_daemon.client.cache.clock = self.clock
+
+        for cycle in range(6):
+            self.clock.now += test_daemon.seconds_until_due()
+            test_daemon.run_cycle()
+            self.assertEqual(transport.request_count, cycle + 1)
+        self.assertEqual(test_daemon.client.cache.stats.hits, 0)
+        self.assertEqual(test_daemon.client.cache.ttls, {"realtime": 0.5})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import sys
+import unittest
+from mock import patch, MagicMock
+
+sys.path.append(os.getcwd())
+
+from snowApp import alerts, fleet, snowReport
+
+"""
+This module is used to unit test the concurrent fleet sweep in fleet.py
+The Resort request methods are mocked so no requests are sent to Climacell
+"""
+
+RESOURCES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Resources")
+
+with open(os.path.join(RESOURCES, "test_96hrJson.json"), "r") as f:
+    test96hrDict = json.load(f)
+
+
+class testFleet(unittest.TestCase):
+
+    # Every endpoint succeeds, so every resort should come back without errors
+    def test_fetchFleetAllSucceed(self):
+        with patch.object(snowReport.Resort, "request_now", return_value=True), \
+                patch.object(snowReport.Resort, "request_6hr", return_value=True), \
+                patch.object(snowReport.Resort, "request_96hr", return_value=True) as mocked_96hr:
+            results = fleet.fetch_fleet(["lakeLouise", "sunshine", "fernie"], max_workers=4)
+
+        self.assertEqual(list(results), ["lakeLouise", "sunshine", "fernie"])
+        self.assertTrue(all(result.ok for result in results.values()))
+        self.assertEqual(mocked_96hr.call_count, 3)
+        self.assertEqual(results["fernie"].resort.name, "Fernie Alpine Resort")
+
+    # A failed request and a raised exception should both be recorded against the endpoint that caused them
+    def test_fetchFleetRecordsErrors(self):
+        error = ConnectionError("connection reset")
+        with patch.object(snowReport.Resort, "request_now", return_value=False), \
+                patch.object(snowReport.Resort, "request_6hr", side_effect=error), \
+                patch.object(snowReport.Resort, "request_96hr", return_value=True):
+            results = fleet.fetch_fleet(["whistler"], max_workers=2)
+
+        errors = results["whistler"].errors
+        self.assertFalse(results["whistler"].ok)
+        self.assertEqual(set(errors), {"now", "6hr"})
+        self.assertIs(errors["6hr"], error)
+
+    # Only the endpoints that were asked for should be requested
+    def test_fetchFleetEndpointSubset(self):
+        with patch.object(snowReport.Resort, "request_now", return_value=True) as mocked_now, \
+                patch.object(snowReport.Resort, "request_96hr", return_value=True) as mocked_96hr:
+            fleet.fetch_fleet(["vail", "alta"], endpoints=("96hr",))
+
+        self.assertEqual(mocked_now.call_count, 0)
+        self.assertEqual(mocked_96hr.call_count, 2)
+
+    def test_fetchFleetUnknownEndpoint(self):
+        with self.assertRaises(ValueError):
+            fleet.fetch_fleet(["vail"], endpoints=("7day",))
+
+    # Lake Louise, Sunshine and Norquay share a 1 degree cell, so they should share one request
+    def test_fetchFleetGridDeduplication(self):
+        test_client = MagicMock()
+        test_client.fetch_series.return_value = test96hrDict
+        resort_keys = ["lakeLouise", "sunshine", "norquay", "whistler"]
+        results = fleet.fetch_fleet(resort_keys, endpoints=("96hr",), client=test_client, grid_resolution=1.0)
+
+        self.assertEqual(test_client.fetch_series.call_count, 2)
+        for resort_key in resort_keys:
+            self.assertTrue(results[resort_key].ok)
+            self.assertEqual(len(results[resort_key].resort.series_96hr), len(test96hrDict))
+        requested = sorted(call[0][2]["lat"] for call in test_client.fetch_series.call_args_list)
+        self.assertEqual(requested, ["50.0", "51.0"])
+
+    # A failed cell request should be reported against every resort in the cell
+    def test_fetchFleetGridErrors(self):
+        test_client = MagicMock()
+        test_client.fetch_series.return_value = None
+        results = fleet.fetch_fleet(["lakeLouise", "sunshine"], endpoints=("6hr",), client=test_client, grid_resolution=1.0)
+
+        self.assertEqual(test_client.fetch_series.call_count, 1)
+        self.assertIn("6hr", results["lakeLouise"].errors)
+        self.assertIn("6hr", results["sunshine"].errors)
+
+    # A response that can't be stored should be reported against every resort in the cell without stopping the sweep
+    def test_fetchFleetGridStoreErrors(self):
+        test_client = MagicMock()
+        test_client.fetch.return_value = {"temp": {"value": 1}}
+        test_client.fetch_series.return_value = test96hrDict
+        results = fleet.fetch_fleet(["lakeLouise", "sunshine"], endpoints=("now", "96hr"), client=test_client, grid_resolution=1.0)
+
+        for resort_key in ("lakeLouise", "sunshine"):
+            self.assertIsInstance(results[resort_key].errors["now"], KeyError)
+            self.assertNotIn("96hr", results[resort_key].errors)
+            self.assertEqual(len(results[resort_key].resort.series_96hr), len(test96hrDict))
+
+    # A sweep that only feeds the snow alerts should only ask for the fields the alerts read
+    def test_fetchFleetFields(self):
+        test_client = MagicMock()
+        test_client.fetch_series.return_value = test96hrDict
+        fleet.fetch_fleet(["fernie", "whistler"], endpoints=("96hr",), client=test_client, fields=alerts.SNOW_FIELDS)
+
+        requested = {call[0][2]["fields"] for call in test_client.fetch_series.call_args_list}
+        self.assertEqual(requested, {"precipitation,precipitation_probability,precipitation_type"})
+
+    # The default sweep covers every resort in skiResorts.json
+    def test_allResortKeys(self):
+        self.assertIn("lakeLouise", fleet.all_resort_keys())
+        self.assertEqual(len(fleet.all_resort_keys()), len(set(fleet.all_resort_keys())))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.append(os.getcwd())
+
+from snowApp.fleet import FleetResult
+from snowApp.history import ForecastHistory
+from snowApp.series import ForecastSeries
+
+"""
+This module is used to unit test the forecast history store in history.py
+The history is kept in an in-memory SQLite database
+"""
+
+RESOURCES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Resources")
+
+with open(os.path.join(RESOURCES, "test_96hrJson.json"), "r") as f:
+    test96hrDict = json.load(f)
+
+with open(os.path.join(RESOURCES, "test_360minJson.json"), "r") as f:
+    test360minDict = json.load(f)
+
+with open(os.path.join(RESOURCES, "test_realtimeJson.json"), "r") as f:
+    testRealtimeDict = json.load(f)
+
+DAY = 24 * 60 * 60
+NOW = 1610060400.0
+
+
+class FakeResort():
+    def __init__(self, series_6hr, series_96hr, weather_now=None):
+        self.series_6hr = series_6hr
+        self.series_96hr = series_96hr
+        self.weather_now = weather_now or {}
+
+
+class testForecastHistory(unittest.TestCase):
+
+    def setUp(self):
+        self.history = ForecastHistory(":memory:")
+        self.addCleanup(self.history.close)
+        self.series_96hr = ForecastSeries.from_payload(test96hrDict)
+        self.series_6hr = ForecastSeries.from_payload(test360minDict)
+
+    # A stored forecast should come back with the same times and values
+    def test_roundTrip(self):
+        self.history.record("fernie", "96hr", self.series_96hr, fetch_time=NOW)
+        [(fetch_time, times, columns)] = self.history.forecasts("fernie", "96hr")
+
+        self.assertEqual(fetch_time, NOW)
+        np.testing.assert_array_equal(times, self.series_96hr.times)
+        np.testing.assert_array_equal(columns["temp"], self.series_96hr["temp"])
+        np.testing.assert_array_equal(columns["precipitation_type"], self.series_96hr["precipitation_type"])
+
+    # Only forecasts issued inside the requested range should be returned
+    def test_forecastsSince(self):
+        for days_ago in (10, 5, 1):
+            self.history.record("fernie", "96hr", self.series_96hr, fetch_time=NOW - days_ago * DAY)
+        self.history.record("whistler", "96hr", self.series_96hr, fetch_time=NOW - DAY)
+
+        last_week = self.history.forecasts("fernie", "96hr", since=NOW - 7 * DAY)
+        self.assertEqual([fetch_time for fetch_time, _, _ in last_week], [NOW - 5 * DAY, NOW - DAY])
+        self.assertEqual(len(self.history.forecasts("fernie", "96hr", until=NOW - 7 * DAY)), 1)
+
+    # Every forecast for one hour should be returned in the order they were issued
+    def test_forecastsForHour(self):
+        self.history.record("fernie", "96hr", self.series_96hr, fetch_time=NOW)
+        self.history.record("fernie", "96hr", self.series_96hr, fetch_time=NOW + 3600)
+
+        fetch_times, columns = self.history.forecasts_for_hour("fernie", "96hr", self.series_96hr.times[5], fields=("temp",))
+        np.testing.assert_array_equal(fetch_times, [NOW, NOW + 3600])
+        np.testing.assert_array_equal(columns["temp"], [self.series_96hr["temp"][5]] * 2)
+
+    # A sweep is written in one go, realtime weather included, and skips the endpoints that failed
+    def test_recordSweep(self):
+        ok = FleetResult("fernie", FakeResort(self.series_6hr, self.series_96hr, testRealtimeDict))
+        failed = FleetResult("whistler", FakeResort(self.series_6hr, self.series_96hr, testRealtimeDict))
+        failed.errors["96hr"] = "96hr request to Climacell API failed"
+
+        self.assertEqual(self.history.record_sweep({"fernie": ok, "whistler": failed}, fetch_time=NOW), 5)
+        self.assertEqual(self.history.fetch_count(), 5)
+        self.assertEqual(self.history.fetch_count("whistler"), 2)
+        self.assertEqual(self.history.fetch_count("fernie", "6hr"), 1)
+        self.assertEqual(self.history.fetch_count("fernie", "now"), 1)
+
+    # The realtime weather is stored as a forecast of one row at its observation time
+    def test_recordRealtime(self):
+        self.history.record_sweep({"fernie": FleetResult("fernie", FakeResort(self.series_6hr, self.series_96hr, testRealtimeDict))}, fetch_time=NOW)
+        [(fetch_time, times, columns)] = self.history.forecasts("fernie", "now")
+        self.assertEqual(times[0], np.datetime64(testRealtimeDict["observation_time"]["value"].rstrip("Z")))
+        self.assertEqual(columns["temp"][0], testRealtimeDict["temp"]["value"])
+
+        # A resort without realtime weather has nothing to record
+        self.history.record_sweep({"whistler": FleetResult("whistler", FakeResort(self.series_6hr, self.series_96hr))}, fetch_time=NOW)
+        self.assertEqual(self.history.fetch_count("whistler", "now"), 0)
+
+    def test_unknownField(self):
+        with self.assertRaises(ValueError):
+            self.history.forecasts("fernie", "96hr", fields=("temp; DROP TABLE fetches",))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from mock import patch
+
+sys.path.append(os.getcwd())
+
+from snowApp import snowReport
+
+"""
+This module is used to check that importing snowReport has no side effects
+The import is run in a fresh interpreter so modules loaded by other tests don't hide anything
+"""
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ["numpy", "requests", "urllib3", "dateutil", "tzlocal"]
+
+IMPORT_SCRIPT = f"""
+import json, os, sys
+sys.path.insert(0, {ROOT!r})
+cwd = os.getcwd()
+import snowApp.snowReport
+print(json.dumps({{"cwd_changed": os.getcwd() != cwd, "loaded": [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+"""
+
+
+def log_state():
+    try:
+        stat = os.stat(snowReport.LOG_FILE)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+class testImport(unittest.TestCase):
+
+    # Importing the module shouldn't change directory, touch snowApp.log or load the heavy dependencies
+    def test_importHasNoSideEffects(self):
+        before = log_state()
+        with tempfile.TemporaryDirectory() as cwd:
+            output = subprocess.run([sys.executable, "-c", IMPORT_SCRIPT], cwd=cwd, check=True, capture_output=True, text=True).stdout
+
+        state = json.loads(output)
+        self.assertFalse(state["cwd_changed"])
+        self.assertEqual(state["loaded"], [])
+        self.assertEqual(log_state(), before)
+
+    # snowReport.requests is still there for code and tests that patch it
+    def test_requestsAttribute(self):
+        import requests
+
+        self.assertIs(snowReport.requests, requests)
+        with patch("snowApp.snowReport.requests.request") as mocked_request:
+            snowReport.requests.request("GET", snowReport.URL_REALTIME)
+        self.assertEqual(mocked_request.call_count, 1)
+        with self.assertRaises(AttributeError):
+            snowReport.not_an_attribute
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+
+import copy
+import json
+import os
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.append(os.getcwd())
+
+from snowApp import indices
+from tests.helpers import make_resort
+
+"""
+This module is used to unit test the ski condition indices in indices.py
+"""
+
+RESOURCES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Resources")
+
+with open(os.path.join(RESOURCES, "test_96hrJson.json"), "r") as f:
+    test96hrDict = json.load(f)
+
+
+# Returns a copy of the first hours of the fixture with the values set on every row
+def make_rows(hours, **values):
+    rows = copy.deepcopy(test96hrDict[:hours])
+    for row in rows:
+        for field, value in values.items():
+            row[field]["value"] = value
+    return rows
+
+
+class testIndicators(unittest.TestCase):
+
+    # The wind chill should match Environment Canada's table, and be the temperature where it doesn't apply
+    def test_windChill(self):
+        temp = np.array([-20.0, -20.0, 15.0, -5.0, np.nan])
+        wind_speed = np.array([30 / 3.6, 1.0, 10.0, 20 / 3.6, 5.0])
+        chill = indices.wind_chill_values(temp, wind_speed)
+        self.assertAlmostEqual(chill[0], -32.6, places=1)
+        self.assertEqual(chill[1], -20.0)
+        self.assertEqual(chill[2], 15.0)
+        self.assertAlmostEqual(chill[3], -11.6, places=1)
+        self.assertTrue(np.isnan(chill[4]))
+
+    # Rain above freezing and freezing rain at any temperature should count, snow and dry hours shouldn't
+    def test_rainOnSnow(self):
+        rows = make_rows(4, precipitation=2.0)
+        for row, (temp, precipitation_type) in zip(rows, [(2.0, "rain"), (-3.0, "rain"), (-3.0, "freezing rain"), (2.0, "snow")]):
+            row["temp"]["value"] = temp
+            row["precipitation_type"]["value"] = precipitation_type
+        results = indices.IndexEngine(["rain_on_snow"]).evaluate([make_resort("fernie", rows)])
+        np.testing.assert_array_equal(results["rain_on_snow"]["fernie"], [2.0, 0.0, 2.0, 0.0])
+
+    # Fresh snow should add up over the trailing 24 hours, lighter when colder and halved when windy
+    def test_powderScore(self):
+        rows = make_rows(30, temp=-5.0, precipitation=1.0, precipitation_type="snow", wind_speed=2.0)
+        rows[1]["wind_speed"]["value"] = 15.0
+        score = indices.IndexEngine(["powder_score"]).evaluate([make_resort("fernie", rows)])["powder_score"]["fernie"]
+        self.assertEqual(score[0], 1.5)
+        self.assertEqual(score[1], 2.25)
+        self.assertEqual(score[23], 24 * 1.5 - 0.75)
+        self.assertEqual(score[24], 24 * 1.5 - 0.75)
+        self.assertEqual(score[29], 24 * 1.5)
+
+    # Visibility should be NaN where an input is missing
+    def test_visibility(self):
+        rows = make_rows(3, cloud_cover=10.0, humidity=50.0, precipitation=0.0)
+        rows[1]["cloud_cover"]["value"] = 80.0
+        rows[2]["humidity"]["value"] = None
+        visibility = indices.IndexEngine(["visibility"]).evaluate([make_resort("fernie", rows)])["visibility"]["fernie"]
+        self.assertEqual(list(visibility[:2]), [1.0, 0.0])
+        self.assertTrue(np.isnan(visibility[2]))
+
+    def test_windChillRisk(self):
+        rows = make_rows(3, wind_speed=0.0)
+        for row, temp in zip(rows, [-5.0, -30.0, -60.0]):
+            row["temp"]["value"] = temp
+            row["feels_like"]["value"] = temp
+        risk = indices.IndexEngine(["wind_chill_risk"]).evaluate([make_resort("fernie", rows)])["wind_chill_risk"]["fernie"]
+        self.assertEqual(list(risk), [0.0, 2.0, 5.0])
+
+
+class testIndexEngine(unittest.TestCase):
+
+    def setUp(self):
+        self.fernie = make_resort("fernie", test96hrDict)
+        self.whistler = make_resort("whistler", test96hrDict[5:])
+        self.engine = indices.IndexEngine()
+
+    # Every registered index should be evaluated over every resort on the same time axis
+    def test_evaluatesFleet(self):
+        results = self.engine.evaluate([self.fernie, self.whistler])
+        self.assertEqual(set(results), set(indices.INDICATORS))
+        for result in results.values():
+            self.assertEqual(result.shape, (2, len(test96hrDict)))
+            self.assertTrue(np.isnan(result["whistler"][:5]).all())
+        np.testing.assert_array_equal(results["wind_chill"]["fernie"][5:], results["wind_chill"]["whistler"][5:])
+
+    # The result should be reused until a resort's forecast changes
+    def test_cachedUntilForecastChanges(self):
+        resorts = [self.fernie, self.whistler]
+        first = self.engine.evaluate(resorts)
+        self.assertIs(self.engine.evaluate(resorts), first)
+
+        self.whistler.set_96hr(test96hrDict[5:])
+        self.assertIs(self.engine.evaluate(resorts), first)
+        self.assertEqual(self.engine.evaluations, 1)
+
+        rows = copy.deepcopy(test96hrDict[5:])
+        rows[0]["temp"]["value"] = -40.0
+        self.whistler.set_96hr(rows)
+        second = self.engine.evaluate(resorts)
+        self.assertIsNot(second, first)
+        self.assertEqual(second["wind_chill"]["whistler"][5], indices.wind_chill_values(np.array([-40.0]), np.array([rows[0]["wind_speed"]["value"]]))[0])
+        self.assertIsNot(self.engine.evaluate([self.fernie]), second)
+        self.assertEqual(self.engine.evaluations, 3)
+
+    # A new set of Resort objects, as every fetch_fleet() sweep makes, should be evaluated on its own forecasts
+    def test_newResortsEvaluated(self):
+        first = self.engine.evaluate([self.fernie, self.whistler])
+        rows = make_rows(len(test96hrDict), temp=-30.0)
+        resorts = [make_resort("fernie", rows), make_resort("whistler", rows)]
+        self.assertEqual(resorts[0].forecast_versions, self.fernie.forecast_versions)
+
+        second = self.engine.evaluate(resorts)
+        self.assertIsNot(second, first)
+        self.assertEqual(self.engine.evaluations, 2)
+        np.testing.assert_array_equal(second["wind_chill"]["whistler"], second["wind_chill"]["fernie"])
+        self.assertFalse(np.array_equal(second["wind_chill"]["fernie"], first["wind_chill"]["fernie"]))
+
+    # A registered index should be evaluated with the built in ones and its fields requested by sweeps
+    def test_customIndicator(self):
+        registry = dict(indices.INDICATORS)
+
+        @indices.indicator("bluebird", ("cloud_cover", "wind_speed"), registry=registry)
+        def bluebird(matrices):
+            return (matrices["cloud_cover"].values < 10) & (matrices["wind_speed"].values < 5)
+
+        self.assertNotIn("bluebird", indices.INDICATORS)
+        self.assertEqual(indices.index_fields(["bluebird"], registry=registry), {"96hr": ("cloud_cover", "wind_speed")})
+        results = indices.IndexEngine(["bluebird", "wind_chill"], registry=registry).evaluate([self.fernie])
+        expected = (self.fernie.series_96hr["cloud_cover"] < 10) & (self.fernie.series_96hr["wind_speed"] < 5)
+        np.testing.assert_array_equal(results["bluebird"]["fernie"], expected.astype(float))
+
+    def test_unknownIndex(self):
+        with self.assertRaises(ValueError):
+            indices.IndexEngine(["no_such_index"])
+
+
+if __name__ == "__main__":
+    unittest.main()
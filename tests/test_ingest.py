@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from mock import patch, MagicMock
+
+import numpy as np
+
+sys.path.append(os.getcwd())
+
+from snowApp import client, snowReport
+from snowApp.cache import ResponseCache
+from snowApp.ingest import iter_json_array, stream_series
+from snowApp.series import ForecastSeries
+
+"""
+This module is used to unit test the streaming response parser in ingest.py
+"""
+
+RESOURCES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Resources")
+
+with open(os.path.join(RESOURCES, "test_96hrJson.json"), "rb") as f:
+    test96hrBytes = f.read()
+test96hrDict = json.loads(test96hrBytes)
+
+
+def split_chunks(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class testStreamingIngest(unittest.TestCase):
+
+    # Every chunk size, including ones that split rows, numbers and strings, should give the same series as from_payload()
+    def test_streamMatchesFromPayload(self):
+        expected = ForecastSeries.from_payload(test96hrDict)
+        for size in (1, 7, 1000, len(test96hrBytes)):
+            series = stream_series(split_chunks(test96hrBytes, size))
+            self.assertEqual(series.fields, expected.fields)
+            self.assertEqual(series.local_times, expected.local_times)
+            np.testing.assert_array_equal(series.times, expected.times)
+            for field in expected.fields:
+                np.testing.assert_array_equal(series[field], expected[field])
+
+    # Only the requested fields are kept, null values become NaN
+    def test_streamSelectedFields(self):
+        series = stream_series([test96hrBytes], fields=["temp", "cloud_base"])
+        self.assertEqual(series.fields, ["temp", "cloud_base"])
+        self.assertEqual(series["temp"][0], test96hrDict[0]["temp"]["value"])
+        self.assertTrue(np.isnan(series["cloud_base"][0]))
+
+    def test_iterJsonArray(self):
+        chunks = [b' [1, 2', b'3, "\xc3', b'\xa9", {"a": [4]}', b']']
+        self.assertEqual(list(iter_json_array(chunks)), [1, 23, "é", {"a": [4]}])
+        self.assertEqual(len(stream_series([b"[]"])), 0)
+
+    def test_iterJsonArrayInvalid(self):
+        with self.assertRaises(ValueError):
+            list(iter_json_array([b'{"temp": 1}']))
+        with self.assertRaises(ValueError):
+            list(iter_json_array([b'[{"temp": 1}, {"temp"']))
+
+    # fetch_series() should read the body in chunks and cache the series, including on disk
+    def test_fetchSeries(self):
+        disk_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, disk_dir)
+        test_client = client.ClimacellClient(cache=ResponseCache(disk_dir=disk_dir))
+        response = MagicMock(ok=True)
+        response.__enter__.return_value = response
+        response.iter_content.return_value = split_chunks(test96hrBytes, 4096)
+        querystring = {"lat": "49.4627", "lon": "-115.0873", "fields": "temp,precipitation_type"}
+
+        with patch.object(test_client.session, "get", return_value=response) as mocked_get:
+            series = test_client.fetch_series("hourly", snowReport.URL_HOURLY, querystring)
+            self.assertIs(test_client.fetch_series("hourly", snowReport.URL_HOURLY, querystring), series)
+
+        self.assertEqual(mocked_get.call_count, 1)
+        self.assertTrue(mocked_get.call_args[1]["stream"])
+        self.assertEqual(series.fields, ["temp", "precipitation_type"])
+
+        # Other fields for the same querystring are a different series, the cached one is left as it was
+        response.iter_content.return_value = split_chunks(test96hrBytes, 4096)
+        with patch.object(test_client.session, "get", return_value=response) as mocked_get:
+            temp_only = test_client.fetch_series("hourly", snowReport.URL_HOURLY, querystring, fields=["temp"])
+        self.assertEqual(mocked_get.call_count, 1)
+        self.assertEqual(temp_only.fields, ["temp"])
+        self.assertIs(test_client.fetch_series("hourly", snowReport.URL_HOURLY, querystring), series)
+
+        cold_series = ResponseCache(disk_dir=disk_dir).get(ResponseCache.make_series_key("hourly", querystring))
+        self.assertEqual(cold_series.local_times, series.local_times)
+        np.testing.assert_array_equal(cold_series["temp"], series["temp"])
+        np.testing.assert_array_equal(cold_series["precipitation_type"], series["precipitation_type"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+
+import copy
+import json
+import os
+import sys
+import unittest
+from mock import MagicMock
+
+import numpy as np
+
+sys.path.append(os.getcwd())
+
+from snowApp import fleet, matrix, snowReport
+from tests.helpers import make_resort
+
+"""
+This module is used to unit test the resort x time matrices in matrix.py
+"""
+
+RESOURCES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Resources")
+
+with open(os.path.join(RESOURCES, "test_96hrJson.json"), "r") as f:
+    test96hrDict = json.load(f)
+
+
+class testForecastMatrices(unittest.TestCase):
+
+    def setUp(self):
+        # Whistler's forecast starts 3 hours later, is missing feels_like and has a gap at its 5th hour
+        whistler_rows = copy.deepcopy(test96hrDict[3:])
+        for row in whistler_rows:
+            del row["feels_like"]
+        del whistler_rows[4]
+        whistler_rows[0]["precipitation_type"]["value"] = "hail"
+        whistler_rows[1]["precipitation_type"]["value"] = None
+
+        self.fernie = make_resort("fernie", test96hrDict)
+        self.whistler = make_resort("whistler", whistler_rows)
+        self.matrices = matrix.forecast_matrices([self.fernie, self.whistler])
+
+    # The time axis should be the union of both forecasts, with NaN where a resort has no value
+    def test_alignedOnSharedTimes(self):
+        temp = self.matrices["temp"]
+        self.assertEqual(temp.shape, (2, len(test96hrDict)))
+        np.testing.assert_array_equal(temp.times, self.fernie.series_96hr.times)
+        self.assertEqual(temp.local_times, self.fernie.series_96hr.local_times)
+
+        np.testing.assert_array_equal(temp["fernie"], self.fernie.series_96hr["temp"])
+        self.assertTrue(np.isnan(temp["whistler"][:3]).all())
+        self.assertTrue(np.isnan(temp["whistler"][7]))
+        self.assertEqual(int(np.isnan(temp["whistler"]).sum()), 4)
+        self.assertTrue(np.isnan(self.matrices["feels_like"]["whistler"]).all())
+
+    # Every value should match what the Resort getters return for the same hour
+    def test_matchesGetters(self):
+        for resort in (self.fernie, self.whistler):
+            temperatures = resort.get_temperature_96hr()
+            row = self.matrices["temp"][resort.key]
+            for local, column in zip(self.matrices["temp"].local_times, row.tolist()):
+                if local in temperatures:
+                    self.assertEqual(column, temperatures[local])
+                else:
+                    self.assertTrue(np.isnan(column))
+
+    # precipitation_type should be int8 codes with the documented types first and unknown values after them
+    def test_precipitationTypeCodes(self):
+        types = self.matrices["precipitation_type"]
+        self.assertTrue(types.categorical)
+        self.assertEqual(types.values.dtype, np.int8)
+        self.assertEqual(types.categories[:len(matrix.PRECIPITATION_TYPES)], list(matrix.PRECIPITATION_TYPES))
+        self.assertEqual(types.code("hail"), len(matrix.PRECIPITATION_TYPES))
+        self.assertEqual(types.code("sleet"), matrix.MISSING_CODE)
+
+        whistler = types["whistler"]
+        self.assertTrue((whistler[:3] == matrix.MISSING_CODE).all())
+        self.assertEqual(whistler[3], types.code("hail"))
+        self.assertEqual(whistler[4], matrix.MISSING_CODE)
+        labels = types.labels()
+        np.testing.assert_array_equal(labels[0], self.fernie.series_96hr["precipitation_type"])
+        self.assertIsNone(labels[1][4])
+
+    # at() should return one value per resort for a UTC or local time
+    def test_columnAtTime(self):
+        temp = self.matrices["temp"]
+        first = temp.at(temp.times[0])
+        self.assertEqual(first[0], self.fernie.series_96hr["temp"][0])
+        self.assertTrue(np.isnan(first[1]))
+        np.testing.assert_array_equal(temp.at(temp.local_times[5]), temp.values[:, 5])
+        with self.assertRaises(KeyError):
+            temp.at(np.datetime64("1999-01-01T00:00"))
+
+    # Resorts without a forecast should be all NaN rows, and no resorts should give empty matrices
+    def test_emptyForecasts(self):
+        empty = snowReport.Resort("sunshine", client=MagicMock())
+        matrices = matrix.forecast_matrices([self.fernie, empty], fields=("temp", "precipitation_type"))
+        self.assertTrue(np.isnan(matrices["temp"]["sunshine"]).all())
+        self.assertTrue((matrices["precipitation_type"]["sunshine"] == matrix.MISSING_CODE).all())
+
+        nothing = matrix.series_matrices([], [], fields=("temp",))
+        self.assertEqual(nothing["temp"].shape, (0, 0))
+        with self.assertRaises(ValueError):
+            matrix.forecast_matrices([self.fernie], span="7day")
+
+    # fleet_matrices() should leave out resorts whose request failed
+    def test_fleetMatrices(self):
+        results = {
+            "fernie": fleet.FleetResult("fernie", self.fernie),
+            "whistler": fleet.FleetResult("whistler", self.whistler),
+        }
+        results["whistler"].errors["96hr"] = "96hr request to Climacell API failed"
+        matrices = fleet.fleet_matrices(results)
+        self.assertEqual(set(matrices), set(snowReport.GETTER_FIELDS))
+        self.assertEqual(matrices["temp"].resort_keys, ["fernie"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+
+import json
+import logging
+import os
+import sys
+import threading
+import unittest
+from mock import patch, MagicMock
+
+sys.path.append(os.getcwd())
+
+from snowApp import client, metrics, snowReport
+from snowApp.cache import ResponseCache
+
+"""
+This module is used to unit test the stage timings and background logging in metrics.py
+"""
+
+RESOURCES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Resources")
+
+with open(os.path.join(RESOURCES, "test_96hrJson.json"), "rb") as f:
+    test96hrBytes = f.read()
+
+with open(os.path.join(RESOURCES, "test_realtimeJson.json"), "r") as f:
+    testRealtimeText = f.read()
+
+
+# Keeps every record it is given, emit() runs on the BackgroundHandler's thread
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+        self.threads = set()
+
+    def emit(self, record):
+        self.records.append(record)
+        self.threads.add(threading.current_thread())
+
+
+class testMetricsRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = metrics.MetricsRegistry()
+
+    # Each observation should land in the first bucket whose bound is at least the value
+    def test_histogramBuckets(self):
+        histogram = metrics.Histogram(buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 5.0):
+            histogram.observe(value)
+
+        self.assertEqual(histogram.counts, [2, 1, 1])
+        self.assertEqual(histogram.count, 4)
+        self.assertAlmostEqual(histogram.sum, 5.65)
+        self.assertEqual(histogram.quantile(0.5), 0.1)
+        self.assertEqual(histogram.quantile(1.0), float("inf"))
+        self.assertIsNone(metrics.Histogram().quantile(0.5))
+
+    # The same name and labels should give the same histogram, in any label order
+    def test_labelsIdentifyMetric(self):
+        histogram = self.registry.histogram("snowapp_parse_seconds", endpoint="hourly", stage="body")
+        self.assertIs(self.registry.histogram("snowapp_parse_seconds", stage="body", endpoint="hourly"), histogram)
+        self.assertIsNot(self.registry.histogram("snowapp_parse_seconds", endpoint="nowcast", stage="body"), histogram)
+        with self.assertRaises(ValueError):
+            self.registry.counter("snowapp_parse_seconds")
+
+    # timer() should record how long its block took
+    def test_timer(self):
+        with patch.object(metrics.time, "perf_counter", side_effect=[10.0, 10.25]):
+            with self.registry.timer("snowapp_getter_seconds", span="96hr"):
+                pass
+        histogram = self.registry.histogram("snowapp_getter_seconds", span="96hr")
+        self.assertEqual(histogram.count, 1)
+        self.assertEqual(histogram.sum, 0.25)
+
+    # A disabled registry should record nothing and hand out the shared no-op timer
+    def test_disabled(self):
+        self.registry.enabled = False
+        self.assertIs(self.registry.timer("snowapp_getter_seconds", span="96hr"), metrics.NO_TIMER)
+        with self.registry.timer("snowapp_getter_seconds", span="96hr"):
+            pass
+        self.registry.count("snowapp_cache_requests_total", endpoint="hourly", result="hit")
+        self.registry.observe("snowapp_cycle_seconds", 1.0)
+        self.assertEqual(self.registry.snapshot(), {})
+
+    # The text export should follow the Prometheus exposition format with cumulative buckets
+    def test_prometheus(self):
+        self.registry.histogram("snowapp_http_request_seconds", buckets=(0.1, 1.0), endpoint="hourly").observe(0.5)
+        self.registry.count("snowapp_cache_requests_total", 3, endpoint="hourly", result="hit")
+
+        lines = self.registry.prometheus().splitlines()
+        self.assertIn("# TYPE snowapp_cache_requests_total counter", lines)
+        self.assertIn('snowapp_cache_requests_total{endpoint="hourly",result="hit"} 3', lines)
+        self.assertIn("# TYPE snowapp_http_request_seconds histogram", lines)
+        self.assertIn('snowapp_http_request_seconds_bucket{endpoint="hourly",le="0.1"} 0', lines)
+        self.assertIn('snowapp_http_request_seconds_bucket{endpoint="hourly",le="1.0"} 1', lines)
+        self.assertIn('snowapp_http_request_seconds_bucket{endpoint="hourly",le="+Inf"} 1', lines)
+        self.assertIn('snowapp_http_request_seconds_sum{endpoint="hourly"} 0.5', lines)
+        self.assertIn('snowapp_http_request_seconds_count{endpoint="hourly"} 1', lines)
+
+    def test_formatLabelsEscapes(self):
+        self.assertEqual(metrics.format_labels(()), "")
+        self.assertEqual(metrics.format_labels((("name", 'a"b\\c'),)), '{name="a\\"b\\\\c"}')
+
+    # The JSON snapshot should carry the cache hit rate of each endpoint, disk hits count as hits
+    def test_snapshotHitRate(self):
+        self.registry.count("snowapp_cache_requests_total", 2, endpoint="hourly", result="hit")
+        self.registry.count("snowapp_cache_requests_total", 1, endpoint="hourly", result="disk_hit")
+        self.registry.count("snowapp_cache_requests_total", 1, endpoint="hourly", result="miss")
+        self.registry.count("snowapp_cache_requests_total", 1, endpoint="realtime", result="miss")
+
+        snapshot = json.loads(json.dumps(metrics.snapshot(self.registry)))
+        self.assertEqual(snapshot["cache_hit_rate"], {"hourly": 0.75, "realtime": 0.0})
+        self.assertEqual(len(snapshot["snowapp_cache_requests_total"]), 4)
+
+
+class testInstrumentation(unittest.TestCase):
+
+    def setUp(self):
+        metrics.REGISTRY.reset()
+        self.addCleanup(metrics.REGISTRY.reset)
+
+    def count(self, name, **labels):
+        return metrics.REGISTRY.histogram(name, **labels).count
+
+    # A fetch should time the request and the parse of its endpoint, and count the cache miss then hit
+    def test_clientStages(self):
+        test_client = client.ClimacellClient(cache=ResponseCache())
+        realtime = MagicMock(ok=True, text=testRealtimeText)
+        hourly = MagicMock(ok=True)
+        hourly.__enter__.return_value = hourly
+        hourly.iter_content.return_value = [test96hrBytes]
+        querystring = {"lat": "49.4627", "lon": "-115.0873", "fields": "temp"}
+
+        with patch.object(test_client.session, "get", side_effect=[realtime, hourly]):
+            test_client.fetch("realtime", snowReport.URL_REALTIME, querystring)
+            test_client.fetch("realtime", snowReport.URL_REALTIME, querystring)
+            test_client.fetch_series("hourly", snowReport.URL_HOURLY, querystring)
+
+        for endpoint in ("realtime", "hourly"):
+            self.assertEqual(self.count("snowapp_http_request_seconds", endpoint=endpoint), 1)
+            self.assertEqual(self.count("snowapp_parse_seconds", endpoint=endpoint), 1)
+        self.assertEqual(self.count("snowapp_timestamp_seconds"), 1)
+        self.assertEqual(metrics.cache_hit_rates(), {"hourly": 0.0, "realtime": 0.5})
+
+    # Every call to a forecast getter should be timed under its span
+    def test_getterTiming(self):
+        test_client = MagicMock()
+        test_client.fetch_series.return_value = json.loads(test96hrBytes)
+        resort = snowReport.Resort("fernie", client=test_client)
+        resort.request_96hr()
+
+        resort.get_temperature_96hr()
+        resort.get_temperature_96hr()
+        self.assertEqual(self.count("snowapp_getter_seconds", span="96hr"), 2)
+
+
+class testBackgroundHandler(unittest.TestCase):
+
+    # Records should be written by the listener thread, not the thread that logged them
+    def test_writesOnBackgroundThread(self):
+        target = ListHandler()
+        handler = metrics.BackgroundHandler(target)
+        self.addCleanup(handler.close)
+        test_logger = logging.getLogger("snowApp.tests.background")
+        test_logger.addHandler(handler)
+        self.addCleanup(test_logger.removeHandler, handler)
+        test_logger.setLevel(logging.DEBUG)
+        test_logger.propagate = False
+
+        self.assertIsNone(handler.listener)
+        for i in range(10):
+            test_logger.debug(f'message {i}')
+        handler.stop()
+        test_logger.debug("after stop")
+        handler.stop()
+
+        self.assertEqual([record.getMessage() for record in target.records], [f'message {i}' for i in range(10)] + ["after stop"])
+        self.assertNotIn(threading.current_thread(), target.threads)
+
+    # set_logging(False) should stop snowReport's debug messages before they reach the handler
+    def test_setLogging(self):
+        self.addCleanup(snowReport.set_logging, not snowReport.logger.disabled)
+        with patch.object(snowReport.handler, "emit") as mocked_emit:
+            snowReport.set_logging(False)
+            snowReport.logger.debug("dropped")
+            self.assertFalse(mocked_emit.called)
+            snowReport.set_logging(True)
+            snowReport.logger.debug("kept")
+            self.assertEqual(mocked_emit.call_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import pickle
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.append(os.getcwd())
+
+from snowApp import fleet, parallel, snowReport
+from snowApp.cache import ResponseCache
+from snowApp.client import ClimacellClient
+from snowApp.series import ForecastSeries
+from snowApp.transport import ReplayTransport
+
+"""
+This module is used to unit test the process pool sweep in parallel.py
+Responses are replayed from the fixtures in tests/Resources, the worker processes are real
+"""
+
+RESOURCES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Resources")
+
+with open(os.path.join(RESOURCES, "test_96hrJson.json"), "rb") as f:
+    test96hrBytes = f.read()
+
+RESORT_KEYS = ["lakeLouise", "sunshine", "fernie", "whistler"]
+
+
+def assert_same_series(test, series, expected):
+    test.assertEqual(series.fields, expected.fields)
+    test.assertEqual(series.local_times, expected.local_times)
+    np.testing.assert_array_equal(series.times, expected.times)
+    for field in expected.fields:
+        np.testing.assert_array_equal(series[field], expected[field])
+
+
+class testParseBodies(unittest.TestCase):
+
+    # A CompactSeries should turn back into the same series stream parsing gives, and pickle smaller than the rows
+    def test_compactSeries(self):
+        fields = ["temp", "precipitation", "precipitation_type"]
+        [(job_id, compact, error)] = parallel.parse_bodies([(7, "96hr", test96hrBytes, fields)])
+        self.assertEqual(job_id, 7)
+        self.assertIsNone(error)
+        self.assertEqual(compact.text["precipitation_type"][0].dtype, np.int8)
+
+        expected = ForecastSeries.from_payload(json.loads(test96hrBytes), fields)
+        assert_same_series(self, compact.to_series(fields), expected)
+        rows = [{field: row[field] for field in fields + ["observation_time"]} for row in json.loads(test96hrBytes)]
+        self.assertLess(len(pickle.dumps(compact)), len(pickle.dumps(rows)) / 2)
+
+    # A body that isn't JSON should be reported for its job without stopping the batch
+    def test_parseError(self):
+        weather_now = {"observation_time": {"value": "2021-01-07T23:00:00.000Z"}, "temp": {"value": 1}}
+        parsed = parallel.parse_bodies([(0, "96hr", b'[{"temp"', None), (1, "now", json.dumps(weather_now).encode("utf-8"), None)])
+        self.assertIsNone(parsed[0][1])
+        self.assertIn("96hr response could not be parsed", parsed[0][2])
+        self.assertEqual(parsed[1], (1, weather_now, None))
+
+    # A body that is JSON but not a forecast should fail its own job the same way
+    def test_malformedForecast(self):
+        parsed = parallel.parse_bodies([
+            (0, "96hr", b'[{"temp": {"value": 1}}]', None),
+            (1, "6hr", b'{"temp": 1}', None),
+            (2, "96hr", test96hrBytes, ["temp"]),
+            (3, "now", b'{"temp": {"value": 1}}', None),
+            (4, "now", b'[]', None),
+        ])
+        self.assertEqual([job_id for job_id, _, _ in parsed], [0, 1, 2, 3, 4])
+        self.assertIn("KeyError", parsed[0][2])
+        self.assertIn("6hr response could not be parsed", parsed[1][2])
+        self.assertIsNone(parsed[2][2])
+        self.assertEqual(len(parsed[2][1].times), len(json.loads(test96hrBytes)))
+        # Realtime bodies are checked for the observation time set_now() reads
+        self.assertIn("KeyError", parsed[3][2])
+        self.assertIn("now response could not be parsed", parsed[4][2])
+
+
+class testFetchFleetProcesses(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.pool = parallel.SweepPool(processes=2)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.close()
+
+    # The resorts should end up with the same weather as the threaded sweep gives them
+    def test_matchesThreadedSweep(self):
+        threaded = fleet.fetch_fleet(RESORT_KEYS, client=ClimacellClient(transport=ReplayTransport.from_test_fixtures()))
+        transport = ReplayTransport.from_test_fixtures()
+        results = parallel.fetch_fleet_processes(RESORT_KEYS, pool=self.pool, client=ClimacellClient(transport=transport), batch_size=3)
+
+        self.assertEqual(list(results), RESORT_KEYS)
+        self.assertEqual(transport.request_count, len(RESORT_KEYS) * 3)
+        for resort_key in RESORT_KEYS:
+            resort, expected = results[resort_key].resort, threaded[resort_key].resort
+            self.assertTrue(results[resort_key].ok)
+            self.assertEqual(resort.weather_now, expected.weather_now)
+            self.assertEqual(resort.now_time, expected.now_time)
+            assert_same_series(self, resort.series_6hr, expected.series_6hr)
+            assert_same_series(self, resort.series_96hr, expected.series_96hr)
+            self.assertEqual(resort.get_precipitation_type_96hr(), expected.get_precipitation_type_96hr())
+
+    # Failed requests should be recorded against their endpoint, grid cells should share one request
+    def test_errorsAndGridCells(self):
+        transport = ReplayTransport.from_test_fixtures(error_rate=1.0)
+        results = parallel.fetch_fleet_processes(RESORT_KEYS, pool=self.pool, endpoints=("96hr",), client=ClimacellClient(transport=transport))
+        self.assertTrue(all("96hr" in result.errors for result in results.values()))
+
+        transport = ReplayTransport.from_test_fixtures()
+        results = parallel.fetch_fleet_processes(
+            ["lakeLouise", "sunshine", "norquay"], pool=self.pool, endpoints=("96hr",), client=ClimacellClient(transport=transport), grid_resolution=1.0
+        )
+        self.assertEqual(transport.request_count, 1)
+        self.assertEqual(len({id(result.resort.series_96hr) for result in results.values()}), 3)
+        self.assertTrue(all(len(result.resort.series_96hr) for result in results.values()))
+
+    # A realtime body the resorts can't use should be an error for that endpoint, the rest of the sweep carries on
+    def test_malformedRealtime(self):
+        transport = ReplayTransport.from_test_fixtures()
+        transport.bodies["realtime"] = b'{"temp": {"value": 1}}'
+        test_client = ClimacellClient(transport=transport, cache=ResponseCache())
+        results = parallel.fetch_fleet_processes(["fernie", "whistler"], pool=self.pool, client=test_client)
+
+        for result in results.values():
+            self.assertEqual(list(result.errors), ["now"])
+            self.assertIn("KeyError", result.errors["now"])
+            self.assertEqual(len(result.resort.get_temperature_96hr()), len(json.loads(test96hrBytes)))
+        self.assertIsNone(test_client.cache.get(parallel._cache_key(results["fernie"].resort, "now")))
+
+    # A cached value that can't be stored should be recorded as an error too
+    def test_storeError(self):
+        resorts = [snowReport.Resort("fernie", client=ClimacellClient(transport=ReplayTransport({})))]
+        error = parallel._store(resorts, "now", {"temp": {"value": 1}})
+        self.assertIsInstance(error, KeyError)
+        self.assertIsNone(parallel._store(resorts, "96hr", ForecastSeries.from_payload(json.loads(test96hrBytes))))
+
+    # Parsed responses should be cached, a second sweep should be answered without requests
+    def test_usesCache(self):
+        transport = ReplayTransport.from_test_fixtures()
+        test_client = ClimacellClient(transport=transport, cache=ResponseCache())
+        parallel.fetch_fleet_processes(["fernie"], pool=self.pool, client=test_client)
+        results = parallel.fetch_fleet_processes(["fernie"], pool=self.pool, client=test_client)
+        self.assertEqual(transport.request_count, 3)
+        self.assertTrue(results["fernie"].ok)
+        self.assertEqual(len(results["fernie"].resort.get_temperature_96hr()), len(json.loads(test96hrBytes)))
+
+
+if __name__ == "__main__":
+    unittest.main()
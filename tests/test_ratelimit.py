@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import threading
+import unittest
+from mock import patch, MagicMock
+
+sys.path.append(os.getcwd())
+
+from snowApp import client, ratelimit, snowReport
+from snowApp.ratelimit import QuotaExceeded, RateLimiter, RateLimitExceeded, TokenBucket
+from tests.helpers import FakeClock
+
+"""
+This module is used to unit test the rate limiter in ratelimit.py
+A fake clock is used so the tests don't have to wait for tokens or the quota window
+"""
+
+HIGH = ratelimit.request_priority("realtime", starred=True)
+LOW = ratelimit.request_priority("hourly")
+
+
+class testRateLimiter(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock(10 * ratelimit.DAY)
+
+    def test_tokenBucket(self):
+        bucket = TokenBucket(rate=2, capacity=3, clock=self.clock)
+        self.assertEqual([bucket.try_take() for _ in range(4)], [True, True, True, False])
+        self.assertAlmostEqual(bucket.wait_time(), 0.5)
+        self.clock.now += 0.5
+        self.assertTrue(bucket.try_take())
+
+    # Starred resorts and near-term endpoints are more urgent, lower numbers go first
+    def test_requestPriority(self):
+        self.assertLess(HIGH, ratelimit.request_priority("hourly", starred=True))
+        self.assertLess(ratelimit.request_priority("hourly", starred=True), ratelimit.request_priority("realtime"))
+        self.assertGreaterEqual(LOW, ratelimit.LOW_PRIORITY)
+        self.assertEqual(snowReport.Resort("fernie", client=MagicMock()).priority("realtime"), HIGH)
+
+    # Low priority requests stop at their share of the quota, the reserve is only spent on urgent requests
+    def test_dailyQuotaAndReserve(self):
+        limiter = RateLimiter(rate=1000, burst=1000, daily_limit=10, reserve=0.2, low_burst=100, clock=self.clock)
+        self.assertEqual(sum(limiter.try_acquire(LOW) for _ in range(10)), 8)
+        with self.assertRaises(QuotaExceeded):
+            limiter.acquire(LOW)
+        self.assertEqual(sum(limiter.try_acquire(HIGH) for _ in range(5)), 2)
+
+        usage = limiter.usage()
+        self.assertEqual((usage["used"], usage["remaining"], usage["low_priority_used"]), (10, 0, 8))
+        self.assertEqual(usage["by_priority"], {HIGH: 2, LOW: 8})
+
+        self.clock.now += usage["resets_in"]
+        self.assertTrue(limiter.try_acquire(LOW))
+        self.assertEqual(limiter.usage()["used"], 1)
+
+    # Low priority requests may only run low_burst ahead of spreading their share evenly over the day
+    def test_lowPriorityPacing(self):
+        limiter = RateLimiter(rate=1000, burst=1000, daily_limit=1200, reserve=0.2, low_burst=2, clock=self.clock)
+        self.assertEqual(sum(limiter.try_acquire(LOW) for _ in range(5)), 2)
+        self.assertTrue(limiter.try_acquire(HIGH))
+        # 960 low priority requests a day is one every 90 seconds
+        self.clock.now += 90
+        self.assertTrue(limiter.try_acquire(LOW))
+        self.assertFalse(limiter.try_acquire(LOW))
+        self.assertEqual(limiter.usage()["deferred"], 4)
+
+    # A 429 pauses every request until its Retry-After has passed
+    def test_retryAfter(self):
+        limiter = RateLimiter(clock=self.clock)
+        limiter.retry_after(ratelimit.parse_retry_after("30"))
+        self.assertFalse(limiter.try_acquire(HIGH))
+        self.assertEqual(limiter.usage()["blocked_for"], 30)
+        with self.assertRaises(RateLimitExceeded):
+            limiter.acquire(HIGH, timeout=10)
+        self.clock.now += 30
+        self.assertTrue(limiter.try_acquire(HIGH))
+
+    def test_parseRetryAfter(self):
+        self.assertEqual(ratelimit.parse_retry_after("120"), 120)
+        self.assertEqual(ratelimit.parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT", now=1445412460), 20)
+        self.assertEqual(ratelimit.parse_retry_after(None), ratelimit.DEFAULT_RETRY_AFTER)
+        self.assertEqual(ratelimit.parse_retry_after("soon"), ratelimit.DEFAULT_RETRY_AFTER)
+
+    # When several requests are waiting for a token the most urgent one gets it first
+    def test_urgentRequestGoesFirst(self):
+        limiter = RateLimiter(rate=5, burst=1)
+        limiter.acquire(LOW)
+        order = []
+
+        def request(priority):
+            limiter.acquire(priority)
+            order.append(priority)
+
+        threads = [threading.Thread(target=request, args=(priority,)) for priority in (LOW, HIGH)]
+        threads[0].start()
+        while limiter.usage()["waiting"] < 1:
+            threading.Event().wait(0.001)
+        threads[1].start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(order, [HIGH, LOW])
+
+
+class testClientRateLimit(unittest.TestCase):
+
+    # A 429 is retried after its Retry-After and counted against the limiter
+    def test_fetchRetriesAfter429(self):
+        limiter = RateLimiter()
+        test_client = client.ClimacellClient(rate_limiter=limiter)
+        throttled = MagicMock(status_code=429, headers={"Retry-After": "0"})
+        response = MagicMock(ok=True, status_code=200, text='{"temp": {"value": -1.31}}')
+        querystring = {"lat": "51.0447", "lon": "-114.066666", "fields": "temp"}
+
+        with patch.object(test_client.session, "get", side_effect=[throttled, response]) as mocked_get:
+            payload = test_client.fetch("realtime", snowReport.URL_REALTIME, querystring, priority=HIGH)
+
+        self.assertEqual(payload, {"temp": {"value": -1.31}})
+        self.assertEqual(mocked_get.call_count, 2)
+        self.assertEqual(limiter.usage()["throttled"], 1)
+        self.assertEqual(limiter.usage()["by_priority"], {HIGH: 2})
+        adapter = test_client.session.get_adapter("https://api.climacell.co")
+        self.assertNotIn(429, adapter.max_retries.status_forcelist)
+
+    # 5xx responses are retried by the client, not the connection pool, so every attempt is counted against the quota
+    def test_fetchRetries5xxThroughLimiter(self):
+        limiter = RateLimiter()
+        test_client = client.ClimacellClient(rate_limiter=limiter, retries=2)
+        delays = []
+        test_client.sleep = delays.append
+        failed = MagicMock(ok=False, status_code=503, headers={})
+        response = MagicMock(ok=True, status_code=200, text='{"temp": {"value": -1.31}}')
+        querystring = {"lat": "51.0447", "lon": "-114.066666", "fields": "temp"}
+
+        with patch.object(test_client.session, "get", side_effect=[failed, failed, response]) as mocked_get:
+            payload = test_client.fetch("realtime", snowReport.URL_REALTIME, querystring, priority=HIGH)
+
+        self.assertEqual(payload, {"temp": {"value": -1.31}})
+        self.assertEqual(mocked_get.call_count, 3)
+        self.assertEqual(limiter.usage()["by_priority"], {HIGH: 3})
+        self.assertEqual(delays, [test_client.backoff_factor, test_client.backoff_factor * 2])
+        self.assertEqual(limiter.usage()["throttled"], 0)
+        adapter = test_client.session.get_adapter("https://api.climacell.co")
+        self.assertFalse(adapter.max_retries.status_forcelist)
+        self.assertEqual(adapter.max_retries.status, 0)
+
+    # A request the quota can't cover is raised to the caller without being sent
+    # and a retry the quota can't cover returns the failed response
+    def test_fetchQuotaExceeded(self):
+        test_client = client.ClimacellClient(rate_limiter=RateLimiter(daily_limit=1, reserve=0))
+        test_client.sleep = lambda seconds: None
+        querystring = {"lat": "51.0447", "lon": "-114.066666", "fields": "temp"}
+        with patch.object(test_client.session, "get", return_value=MagicMock(ok=False, status_code=503)) as mocked_get:
+            self.assertIsNone(test_client.fetch("realtime", snowReport.URL_REALTIME, querystring))
+            with self.assertRaises(QuotaExceeded):
+                test_client.fetch("realtime", snowReport.URL_REALTIME, querystring)
+        self.assertEqual(mocked_get.call_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from mock import patch
+
+sys.path.append(os.getcwd())
+
+from snowApp import client, snowReport
+from snowApp.registry import ResortRecord, ResortRegistry, SQLiteResortRegistry, make_key, open_registry, read_records, validate_record
+
+"""
+This module is used to unit test the resort registry in registry.py
+A copy of tests/Resources/test_skiResorts.json is used so the real skiResorts.json is never written
+"""
+
+RESOURCES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Resources")
+
+
+class testResortRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+        self.path = os.path.join(self.temp_dir, "skiResorts.json")
+        shutil.copy(os.path.join(RESOURCES, "test_skiResorts.json"), self.path)
+        self.registry = ResortRegistry(self.path)
+
+    def test_lookupByKey(self):
+        record = self.registry["fernie"]
+        self.assertEqual(record, ResortRecord("fernie", "Fernie Alpine Resort", "Canada", 49.463979, -115.086598))
+        self.assertIn("lakeLouise", self.registry)
+        with self.assertRaises(KeyError):
+            self.registry["notAResort"]
+
+    def test_lookupByName(self):
+        self.assertEqual(self.registry.by_name("Calgary").key, "testResortKey - Calgary")
+
+    # The country lookup should ignore case
+    def test_inCountry(self):
+        canada = [record.key for record in self.registry.in_country("canada")]
+        self.assertIn("whistler", canada)
+        self.assertNotIn("vail", canada)
+        self.assertEqual(self.registry.in_country("Norway"), [])
+
+    # The file should be parsed once and only parsed again after it changes
+    def test_reloadsOnlyWhenFileChanges(self):
+        with patch("snowApp.registry.json.load", wraps=json.load) as mocked_load:
+            self.registry.get("fernie")
+            self.registry.get("whistler")
+            self.assertEqual(mocked_load.call_count, 1)
+
+            with open(self.path, "r") as f:
+                resort_json = json.load(f)
+            resort_json["revelstoke"]["name"] = "Revelstoke Mountain Resort (renamed)"
+            with open(self.path, "w") as f:
+                json.dump(resort_json, f, indent=4)
+
+            self.assertEqual(self.registry["revelstoke"].name, "Revelstoke Mountain Resort (renamed)")
+
+    # Records use __slots__ so they don't carry a __dict__
+    def test_recordSlots(self):
+        self.assertFalse(hasattr(self.registry["fernie"], "__dict__"))
+        self.assertEqual(self.registry["fernie"].as_dict()["country"], "Canada")
+
+    # A Resort built from a record shouldn't need to touch the registry
+    def test_resortFromRecord(self):
+        record = ResortRecord("calgary", "Calgary", "Canada", 51.0447, -114.066666)
+        with patch("snowApp.snowReport.get_registry") as mocked_registry:
+            resort = snowReport.Resort.from_record(record, client=object())
+        self.assertEqual(mocked_registry.call_count, 0)
+        self.assertEqual((resort.key, resort.name, resort.lat), ("calgary", "Calgary", 51.0447))
+
+        # Without a client the shared one is used, its pool isn't sized from the registry
+        with patch("snowApp.snowReport.get_registry") as mocked_registry, patch("snowApp.client.get_default_client") as mocked_client:
+            resort = snowReport.Resort.from_record(record)
+        self.assertEqual(mocked_registry.call_count, 0)
+        mocked_client.assert_called_once_with(pool_size=client.DEFAULT_POOL_SIZE)
+        self.assertIs(resort.client, mocked_client.return_value)
+
+    def test_getResortKeys(self):
+        resort_keys = snowReport.get_resort_keys()
+        self.assertEqual(resort_keys["Fernie Alpine Resort"], "fernie")
+        self.assertIn("Vail Ski Resort", snowReport.resorts_in_country("usa"))
+
+
+class testBulkChanges(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+        self.path = os.path.join(self.temp_dir, "skiResorts.json")
+        shutil.copy(os.path.join(RESOURCES, "test_skiResorts.json"), self.path)
+        self.registry = ResortRegistry(self.path)
+        self.region = [ResortRecord(f'synthetic{i}', f'Synthetic {i}', "Canada", 49.0 + i * 0.01, -120.0) for i in range(500)]
+
+    # Adding a region should be one write of the file, and leave it readable by a fresh registry
+    def test_bulkAddIsOneWrite(self):
+        with patch("snowApp.registry.os.replace", wraps=os.replace) as mocked_replace:
+            self.registry.add(self.region)
+        self.assertEqual(mocked_replace.call_count, 1)
+        self.assertEqual(ResortRegistry(self.path)["synthetic499"], self.region[-1])
+        self.assertEqual(self.registry.keys()[-1], "synthetic499")
+        self.assertEqual(os.listdir(self.temp_dir), ["skiResorts.json"])
+
+    # Updates keep their place, removals and additions go through in the same write
+    def test_applyUpdateAndRemove(self):
+        position = self.registry.keys().index("fernie")
+        fernie = ResortRecord("fernie", "Fernie", "Canada", 49.46, -115.09)
+        self.registry.apply(add=self.region[:1], update=[fernie], remove=["vail"])
+
+        reloaded = ResortRegistry(self.path)
+        self.assertEqual(reloaded["fernie"], fernie)
+        self.assertEqual(reloaded.keys().index("fernie"), position)
+        self.assertNotIn("vail", reloaded)
+        self.assertIn("synthetic0", reloaded)
+        self.assertEqual(self.registry.by_name("Fernie"), fernie)
+
+    # An invalid change anywhere in the batch should leave the file untouched
+    def test_invalidChangesWriteNothing(self):
+        with open(self.path, "rb") as f:
+            before = f.read()
+        bad = ResortRecord("nowhere", "Nowhere", "Canada", 95.0, -120.0)
+        with self.assertRaises(ValueError):
+            self.registry.add(self.region + [bad])
+        with self.assertRaises(ValueError):
+            self.registry.add([ResortRecord("fernie", "Fernie", "Canada", 49.0, -115.0)])
+        with self.assertRaises(KeyError):
+            self.registry.apply(add=self.region, remove=["notAResort"])
+        with self.assertRaises(ValueError):
+            self.registry.apply(add=self.region[:1], remove=["synthetic0"])
+        with open(self.path, "rb") as f:
+            self.assertEqual(f.read(), before)
+        self.assertNotIn("synthetic0", self.registry)
+
+    # A failed write should leave the old file in place and no temporary file behind
+    def test_failedWriteKeepsFile(self):
+        with patch("snowApp.registry.os.replace", side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                self.registry.add(self.region)
+        self.assertEqual(os.listdir(self.temp_dir), ["skiResorts.json"])
+        self.assertNotIn("synthetic0", ResortRegistry(self.path))
+
+    # replace=True should update the resorts that already exist
+    def test_addReplace(self):
+        fernie = ResortRecord("fernie", "Fernie", "Canada", 49.46, -115.09)
+        self.registry.add([fernie, self.region[0]], replace=True)
+        self.assertEqual(self.registry["fernie"], fernie)
+        self.assertIn("synthetic0", self.registry)
+
+    def test_validateRecord(self):
+        validate_record(ResortRecord("fernie", "Fernie", "Canada", 49.46, -115.09))
+        validate_record(ResortRecord("banff", "Banff", "Canada", "51.1784", "-115.5708"))
+        for lat, lon in ((91, 0), (0, -181), (float("nan"), 0), ("north", 0), (None, 0), (True, 0)):
+            with self.assertRaises(ValueError):
+                validate_record(ResortRecord("fernie", "Fernie", "Canada", lat, lon))
+        with self.assertRaises(ValueError):
+            validate_record(ResortRecord("fernie", " ", "Canada", 49.0, -115.0))
+
+    def test_makeKey(self):
+        self.assertEqual(make_key("Lake Louise"), "lakeLouise")
+        self.assertEqual(make_key("Castle Mountain Resort"), "castleMountainResort")
+        with self.assertRaises(ValueError):
+            make_key("--")
+
+    # add_new_resort() should go through the registry and keep its old behaviour for a key that exists
+    def test_addNewResort(self):
+        with patch("snowApp.snowReport._registry", self.registry):
+            resort_json = snowReport.add_new_resort("calgary", "Calgary", "Canada", 51.0447, -114.066666)
+            self.assertEqual(resort_json["calgary"]["lat"], 51.0447)
+            self.assertEqual(snowReport.add_new_resort("calgary", "Other", "Canada", 1.0, 1.0)["calgary"]["name"], "Calgary")
+            with self.assertRaises(ValueError):
+                snowReport.add_new_resort("badResort", "Bad", "Canada", 51.0, 200.0)
+        self.assertEqual(ResortRegistry(self.path)["calgary"].name, "Calgary")
+
+
+class testImport(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+
+    def write(self, file_name, content):
+        path = os.path.join(self.temp_dir, file_name)
+        with open(path, "w") as f:
+            f.write(content)
+        return path
+
+    # A missing key should be made from the name
+    def test_readCsv(self):
+        path = self.write("resorts.csv", "key,name,country,lat,lon\nfernie,Fernie Alpine Resort,Canada,49.46,-115.09\n,Lake Louise,Canada,51.26,-116.16\n")
+        self.assertEqual(
+            read_records(path),
+            [ResortRecord("fernie", "Fernie Alpine Resort", "Canada", 49.46, -115.09), ResortRecord("lakeLouise", "Lake Louise", "Canada", 51.26, -116.16)],
+        )
+        with self.assertRaises(ValueError):
+            read_records(self.write("bad.csv", "name,country,lat,lon\nFernie,Canada,north,-115\n"))
+        with self.assertRaises(ValueError):
+            read_records(self.write("columns.csv", "name,lat\nFernie,49\n"))
+
+    # GeoJSON coordinates are [lon, lat]
+    def test_readGeojson(self):
+        collection = {
+            "type": "FeatureCollection",
+            "features": [
+                {"type": "Feature", "geometry": {"type": "Point", "coordinates": [-106.37, 39.64]}, "properties": {"name": "Vail", "country": "USA"}},
+            ],
+        }
+        path = self.write("resorts.geojson", json.dumps(collection))
+        self.assertEqual(read_records(path), [ResortRecord("vail", "Vail", "USA", 39.64, -106.37)])
+
+        collection["features"][0]["geometry"] = {"type": "Polygon", "coordinates": []}
+        with self.assertRaises(ValueError):
+            read_records(self.write("polygon.geojson", json.dumps(collection)))
+        with self.assertRaises(ValueError):
+            read_records(self.write("resorts.txt", ""))
+
+    def test_importResorts(self):
+        registry_path = os.path.join(self.temp_dir, "skiResorts.json")
+        shutil.copy(os.path.join(RESOURCES, "test_skiResorts.json"), registry_path)
+        path = self.write("resorts.csv", "name,country,lat,lon\nRed Mountain,Canada,49.10,-117.82\n")
+        with patch("snowApp.snowReport._registry", ResortRegistry(registry_path)):
+            self.assertEqual(snowReport.import_resorts(path), 1)
+            self.assertEqual(snowReport.get_registry()["redMountain"].lat, 49.10)
+
+
+# Returns the records with their coordinates as numbers, the SQLite registry stores "51.1784" as 51.1784
+def as_numbers(records):
+    return [ResortRecord(record.key, record.name, record.country, float(record.lat), float(record.lon)) for record in records]
+
+
+class testSQLiteResortRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+        self.json_registry = ResortRegistry(os.path.join(RESOURCES, "test_skiResorts.json"))
+        self.registry = SQLiteResortRegistry.from_json(self.json_registry.path, os.path.join(self.temp_dir, "skiResorts.db"))
+        self.addCleanup(self.registry.close)
+
+    # The SQLite registry should answer every lookup the way the JSON one does
+    def test_matchesJsonRegistry(self):
+        self.assertEqual(list(self.registry), as_numbers(self.json_registry))
+        self.assertEqual(len(self.registry), len(self.json_registry))
+        self.assertEqual(self.registry["fernie"], self.json_registry["fernie"])
+        self.assertEqual([self.registry.by_name("Calgary")], as_numbers([self.json_registry.by_name("Calgary")]))
+        self.assertEqual(self.registry.in_country("CANADA"), as_numbers(self.json_registry.in_country("canada")))
+        self.assertNotIn("notAResort", self.registry)
+        with self.assertRaises(KeyError):
+            self.registry["notAResort"]
+
+    def test_applyChanges(self):
+        fernie = ResortRecord("fernie", "Fernie", "Canada", 49.46, -115.09)
+        calgary = ResortRecord("calgary", "Calgary", "Canada", 51.0447, -114.066666)
+        self.registry.apply(add=[calgary], update=[fernie], remove=["vail"])
+        self.assertEqual(self.registry["fernie"], fernie)
+        self.assertEqual(self.registry.keys()[-1], "calgary")
+        self.assertNotIn("vail", self.registry)
+
+        count = len(self.registry)
+        with self.assertRaises(ValueError):
+            self.registry.add([ResortRecord("newResort", "New", "Canada", 0.0, 0.0), ResortRecord("bad", "Bad", "Canada", 0.0, 999.0)])
+        self.assertEqual(len(self.registry), count)
+
+    # Resorts should be created from a SQLite registry like from skiResorts.json
+    def test_openRegistry(self):
+        path = os.path.join(self.temp_dir, "copy.json")
+        self.registry.to_json(path)
+        self.assertIsInstance(open_registry(path), ResortRegistry)
+        self.assertEqual(list(open_registry(path)), list(self.registry))
+        with patch("snowApp.snowReport._registry", self.registry):
+            resort = snowReport.Resort("fernie", client=object())
+        self.assertEqual(resort.lat, self.json_registry["fernie"].lat)
+
+
+if __name__ == "__main__":
+    unittest.main()
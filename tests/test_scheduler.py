@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+
+import copy
+import json
+import os
+import sys
+import unittest
+from mock import MagicMock
+
+sys.path.append(os.getcwd())
+
+from snowApp import scheduler, snowReport
+from snowApp.client import ClimacellClient
+from snowApp.daemon import DEFAULT_CADENCES, PollingDaemon
+from snowApp.series import ForecastSeries
+from snowApp.transport import ReplayTransport
+from tests.helpers import FakeClock, make_resort
+
+"""
+This module is used to unit test the adaptive refresh scheduler in scheduler.py
+Forecasts come from the recorded fixtures, with copies made stormy where a test needs snow
+"""
+
+RESOURCES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Resources")
+
+with open(os.path.join(RESOURCES, "test_96hrJson.json"), "r") as f:
+    test96hrDict = json.load(f)
+
+with open(os.path.join(RESOURCES, "test_360minJson.json"), "r") as f:
+    test360minDict = json.load(f)
+
+with open(os.path.join(RESOURCES, "test_realtimeJson.json"), "r") as f:
+    testRealtimeDict = json.load(f)
+
+
+# Returns a copy of the forecast rows with snow at probability in the first `rows` rows
+def make_stormy(forecast_rows, rows=6, probability=90, precipitation=0.5):
+    forecast_rows = copy.deepcopy(forecast_rows)
+    for row in forecast_rows[:rows]:
+        row["precipitation_type"]["value"] = "snow"
+        row["precipitation"]["value"] = precipitation
+        if "precipitation_probability" in row:
+            row["precipitation_probability"]["value"] = probability
+    return forecast_rows
+
+
+class testActivity(unittest.TestCase):
+
+    # The recorded forecast is dry for the next day, a stormy copy is busy
+    def test_forecastActivity(self):
+        dry = ForecastSeries.from_payload(test96hrDict)
+        self.assertEqual(scheduler.forecast_activity(dry, 24), 0.0)
+        self.assertEqual(scheduler.forecast_activity(ForecastSeries.from_payload(make_stormy(test96hrDict, probability=60)), 24), 0.75)
+        self.assertEqual(scheduler.forecast_activity(ForecastSeries.from_payload(make_stormy(test96hrDict, probability=90)), 24), 0.9)
+        # Snow beyond the horizon doesn't count
+        self.assertEqual(scheduler.forecast_activity(ForecastSeries.from_payload(test96hrDict[:24] + make_stormy(test96hrDict[24:])), 24), 0.0)
+        self.assertEqual(scheduler.forecast_activity(ForecastSeries.from_payload([])), 0.0)
+
+    # A forecast that moved by TEMP_SHIFT on average scores 1, an unchanged one 0
+    def test_forecastShift(self):
+        previous = ForecastSeries.from_payload(test96hrDict)
+        moved = copy.deepcopy(test96hrDict)
+        for row in moved:
+            row["temp"]["value"] += scheduler.TEMP_SHIFT / 2
+        self.assertEqual(scheduler.forecast_shift(previous, ForecastSeries.from_payload(test96hrDict)), 0.0)
+        self.assertAlmostEqual(scheduler.forecast_shift(previous, ForecastSeries.from_payload(moved)), 0.5)
+        self.assertEqual(scheduler.forecast_shift(None, previous), 0.0)
+
+    # Quiet resorts wait max_factor cadences, stormy ones min_factor, and a shifting forecast is refreshed sooner
+    def test_interval(self):
+        adaptive = scheduler.AdaptiveScheduler()
+        dry = make_resort("fernie", test96hrDict, test360minDict, testRealtimeDict)
+        for endpoint, cadence in DEFAULT_CADENCES.items():
+            self.assertEqual(adaptive.interval(dry, endpoint), cadence * scheduler.DEFAULT_MAX_FACTOR)
+
+        stormy = make_resort("fernie", make_stormy(test96hrDict, precipitation=1.0), make_stormy(test360minDict, precipitation=1.0), testRealtimeDict)
+        for endpoint, cadence in DEFAULT_CADENCES.items():
+            self.assertAlmostEqual(adaptive.interval(stormy, endpoint), cadence * scheduler.DEFAULT_MIN_FACTOR)
+
+        moved = copy.deepcopy(test96hrDict)
+        for row in moved:
+            row["temp"]["value"] += scheduler.TEMP_SHIFT
+        dry.set_96hr(moved)
+        self.assertAlmostEqual(adaptive.interval(dry, "96hr"), DEFAULT_CADENCES["96hr"] * scheduler.DEFAULT_MIN_FACTOR)
+        self.assertEqual(adaptive.activities[("fernie", "96hr")], 1.0)
+
+    def test_invalidFactors(self):
+        with self.assertRaises(ValueError):
+            scheduler.AdaptiveScheduler(min_factor=2.0, max_factor=1.0)
+        self.assertEqual(scheduler.AdaptiveScheduler(min_factor=0.5).cache_ttls(), {"realtime": 15, "nowcast": 75, "hourly": 450})
+
+
+class testAdaptivePolling(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.client = MagicMock()
+        self.client.cache = None
+        self.client.rate_limiter = None
+        self.client.fetch.return_value = testRealtimeDict
+        self.client.fetch_series.side_effect = lambda endpoint, url, querystring, **kwargs: {"nowcast": test360minDict, "hourly": test96hrDict}[endpoint]
+
+    # The daemon should take the next due times from the scheduler, and retry failures on the usual cadence
+    def test_daemonUsesScheduler(self):
+        self.client.fetch.return_value = None
+        test_daemon = PollingDaemon(["fernie"], client=self.client, scheduler=scheduler.AdaptiveScheduler(), clock=self.clock)
+        self.addCleanup(test_daemon.close)
+        test_daemon.run_cycle()
+
+        self.assertEqual(test_daemon.next_due[("fernie", "96hr")], self.clock.now + DEFAULT_CADENCES["96hr"] * scheduler.DEFAULT_MAX_FACTOR)
+        self.assertEqual(test_daemon.next_due[("fernie", "now")], self.clock.now + DEFAULT_CADENCES["now"])
+        self.assertEqual(test_daemon.refreshes, {("fernie", "now"): 1, ("fernie", "6hr"): 1, ("fernie", "96hr"): 1})
+
+    # Against the recorded (dry) fixtures the adaptive run should make max_factor times fewer calls
+    def test_callsSaved(self):
+        self.addCleanup(snowReport.set_logging, not snowReport.logger.disabled)
+        snowReport.set_logging(False)
+        runs = []
+        for adaptive in (None, scheduler.AdaptiveScheduler()):
+            transport = ReplayTransport.from_test_fixtures()
+            runs.append(scheduler.simulate(["fernie"], ClimacellClient(transport=transport), 2 * 3600, scheduler=adaptive))
+            self.assertEqual(transport.request_count, runs[-1]["total"])
+
+        fixed, adaptive = runs
+        self.assertEqual(fixed["by_endpoint"], {"now": 120, "6hr": 24, "96hr": 4})
+        self.assertEqual(adaptive["by_endpoint"], {"now": 30, "6hr": 6, "96hr": 1})
+        saved = scheduler.calls_saved(fixed, adaptive)
+        self.assertEqual(saved["saved"], 111)
+        self.assertEqual(saved["saved_share"], 0.75)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+
+import copy
+import datetime
+import json
+import os
+import sys
+import unittest
+from mock import MagicMock
+
+import numpy as np
+
+sys.path.append(os.getcwd())
+
+from snowApp import snowReport
+from snowApp.cache import ResponseCache
+from snowApp.series import ForecastSeries
+
+"""
+This module is used to unit test the columnar forecast series in series.py and the Resort getters built on it
+"""
+
+RESOURCES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Resources")
+
+with open(os.path.join(RESOURCES, "test_96hrJson.json"), "r") as f:
+    test96hrDict = json.load(f)
+
+with open(os.path.join(RESOURCES, "test_360minJson.json"), "r") as f:
+    test360minDict = json.load(f)
+
+
+class testForecastSeries(unittest.TestCase):
+
+    # Every row should end up in the arrays in the order the api returned them
+    def test_fromPayload(self):
+        series = ForecastSeries.from_payload(test96hrDict)
+
+        self.assertEqual(len(series), len(test96hrDict))
+        self.assertEqual(series["temp"].dtype, np.float64)
+        self.assertEqual(series["temp"][0], test96hrDict[0]["temp"]["value"])
+        self.assertEqual(series["precipitation_type"][0], test96hrDict[0]["precipitation_type"]["value"])
+        self.assertEqual(series.times[0], np.datetime64("2021-01-07T23:00:00.000"))
+        self.assertNotIn("observation_time", series)
+
+    # null values from the api become NaN in numeric columns
+    def test_nullBecomesNaN(self):
+        series = ForecastSeries.from_payload(test96hrDict, fields=["cloud_base"])
+        self.assertEqual(series.fields, ["cloud_base"])
+        self.assertTrue(np.isnan(series["cloud_base"][0]))
+
+    # The getters return null values as None, like they did before the series stored them as NaN
+    def test_nullIsNoneInDicts(self):
+        series = ForecastSeries.from_payload(test96hrDict, fields=["cloud_base", "temp"])
+        self.assertIsNone(next(iter(series.as_dict("cloud_base").values())))
+        self.assertIsInstance(next(iter(series.as_dict("temp").values())), float)
+
+        resort = snowReport.Resort("fernie", client=MagicMock())
+        resort.set_96hr(test96hrDict)
+        resort.get_temperature_96hr()
+        second_rows = copy.deepcopy(test96hrDict)
+        second_rows[5]["temp"]["value"] = None
+        resort.set_96hr(second_rows)
+        self.assertIsNone(resort.get_temperature_96hr()[resort.series_96hr.local_times[5]])
+
+    def test_empty(self):
+        series = ForecastSeries.from_payload([])
+        self.assertEqual(len(series), 0)
+        self.assertEqual(series.fields, [])
+
+    # The getters should return the same time: value dictionaries they returned before the series existed
+    def test_resortGetters(self):
+        test_client = MagicMock()
+        test_client.fetch_series.side_effect = lambda endpoint, url, querystring, **kwargs: {"nowcast": test360minDict, "hourly": test96hrDict}[endpoint]
+        resort = snowReport.Resort("fernie", client=test_client)
+        self.assertTrue(resort.request_6hr())
+        self.assertTrue(resort.request_96hr())
+
+        expected = {
+            snowReport.local_time(row["observation_time"]["value"]): row["temp"]["value"] for row in test96hrDict
+        }
+        self.assertEqual(resort.get_temperature_96hr(), expected)
+        self.assertEqual(len(resort.get_wind_speed_6hr()), len(test360minDict))
+        self.assertEqual(set(resort.get_precipitation_type_96hr().values()), {"none", "snow"})
+        self.assertIsInstance(next(iter(resort.get_feels_like_6hr())), datetime.datetime)
+
+
+class testForecastMerge(unittest.TestCase):
+
+    # The second fetch is the first one slid forward an hour with one hour's temperature revised
+    def setUp(self):
+        self.first = ForecastSeries.from_payload(test96hrDict[:96])
+        second_rows = copy.deepcopy(test96hrDict[1:97])
+        second_rows[10]["temp"]["value"] += 1.5
+        self.second = ForecastSeries.from_payload(second_rows)
+
+    def test_mergeReportsChangedAndExpiredHours(self):
+        merged, delta = self.first.merge(self.second)
+
+        self.assertEqual(list(merged.times), list(self.second.times))
+        self.assertEqual(list(delta.changed_times), [self.second.times[10], self.second.times[-1]])
+        self.assertEqual(list(delta.expired_times), [self.first.times[0]])
+        self.assertEqual(delta.expired_local_times, [self.first.local_times[0]])
+        self.assertEqual(merged.local_times, self.second.local_times)
+        np.testing.assert_array_equal(merged["temp"], self.second["temp"])
+
+    # Merging the same forecast again changes nothing, including NaN and text values
+    def test_mergeUnchanged(self):
+        merged, delta = self.second.merge(self.second)
+        self.assertFalse(delta)
+        np.testing.assert_array_equal(merged["precipitation_type"], self.second["precipitation_type"])
+
+    # The first forecast merged into an empty series is new in every hour
+    def test_mergeIntoEmpty(self):
+        merged, delta = ForecastSeries.empty().merge(self.first)
+        self.assertEqual(len(delta.changed_times), len(self.first))
+        self.assertEqual(len(delta.expired_times), 0)
+
+    # The getter dictionaries end up equal to building them from scratch, and one returned earlier is left as it was
+    def test_resortIncrementalGetters(self):
+        test_client = MagicMock()
+        resort = snowReport.Resort("fernie", client=test_client)
+
+        test_client.fetch_series.return_value = test96hrDict[:96]
+        resort.request_96hr()
+        temperature = resort.get_temperature_96hr()
+        first_temperature = dict(temperature)
+        precipitation_type = resort.get_precipitation_type_96hr()
+
+        second_rows = copy.deepcopy(test96hrDict[1:97])
+        second_rows[10]["temp"]["value"] += 1.5
+        test_client.fetch_series.return_value = second_rows
+        resort.request_96hr()
+
+        self.assertEqual(len(resort.delta_96hr.changed_times), 2)
+        self.assertEqual(resort.get_temperature_96hr(), resort.series_96hr.as_dict("temp"))
+        self.assertEqual(resort.get_precipitation_type_96hr(), resort.series_96hr.as_dict("precipitation_type"))
+        self.assertIsNot(resort.get_temperature_96hr(), temperature)
+        self.assertEqual(temperature, first_temperature)
+        self.assertNotEqual(resort.get_precipitation_type_96hr(), precipitation_type)
+
+        # Changing a returned dictionary shouldn't change what the getter returns next
+        returned = resort.get_temperature_96hr()
+        returned.clear()
+        self.assertEqual(resort.get_temperature_96hr(), resort.series_96hr.as_dict("temp"))
+
+
+class testResortFields(unittest.TestCase):
+
+    def test_resolveFields(self):
+        self.assertEqual(snowReport.resolve_fields()["96hr"], ",".join(sorted(snowReport.DEFAULT_FIELDS["96hr"])))
+        self.assertEqual(snowReport.resolve_fields(["temp", "precipitation", "temp"])["now"], "precipitation,temp")
+        fields = snowReport.resolve_fields({"96hr": "temp,precipitation"})
+        self.assertEqual(fields["96hr"], "precipitation,temp")
+        self.assertEqual(fields["6hr"], snowReport.resolve_fields()["6hr"])
+
+    def test_resolveFieldsInvalid(self):
+        with self.assertRaises(ValueError):
+            snowReport.resolve_fields({"7day": ["temp"]})
+        with self.assertRaises(ValueError):
+            snowReport.resolve_fields({"96hr": []})
+
+    # Only the declared fields are requested, so the cache key changes with them
+    def test_resortRequestsOnlyItsFields(self):
+        test_client = MagicMock()
+        test_client.fetch_series.return_value = ForecastSeries.from_payload(test96hrDict, fields=["temp"])
+        resort = snowReport.Resort("fernie", client=test_client, fields={"96hr": snowReport.GETTER_FIELDS[:1]})
+        self.assertTrue(resort.request_96hr())
+
+        querystring = test_client.fetch_series.call_args[0][2]
+        self.assertEqual(querystring["fields"], "temp")
+        self.assertEqual(len(resort.get_temperature_96hr()), len(test96hrDict))
+        with self.assertRaises(KeyError):
+            resort.get_precipitation_96hr()
+
+        default_querystring = dict(querystring, fields=snowReport.Resort("fernie", client=test_client).fields["96hr"])
+        self.assertNotEqual(ResponseCache.make_key("hourly", querystring), ResponseCache.make_key("hourly", default_querystring))
+
+    # Realtime fields that weren't requested are None
+    def test_setNowWithFewerFields(self):
+        resort = snowReport.Resort("fernie", client=MagicMock(), fields=["temp"])
+        resort.set_now({"observation_time": {"value": "2021-01-07T23:00:00.000Z"}, "temp": {"value": -3.5, "units": "C"}})
+        self.assertEqual(resort.now_temperature, -3.5)
+        self.assertIsNone(resort.now_windspeed)
+
+
+    # The getters should return empty dictionaries before a forecast is fetched and after a failed fetch
+    def test_gettersBeforeFetch(self):
+        test_client = MagicMock()
+        test_client.fetch_series.return_value = None
+        resort = snowReport.Resort("fernie", client=test_client)
+        self.assertEqual(resort.get_temperature_96hr(), {})
+        self.assertEqual(resort.get_temperature_6hr(), {})
+        self.assertFalse(resort.request_96hr())
+        self.assertEqual(resort.get_temperature_96hr(), {})
+
+        resort.set_96hr(test96hrDict)
+        self.assertEqual(len(resort.get_temperature_96hr()), len(test96hrDict))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+
+import copy
+import json
+import os
+import sys
+import unittest
+from mock import MagicMock
+
+sys.path.append(os.getcwd())
+
+from snowApp import daemon, server
+from tests.helpers import FakeClock
+
+"""
+This module is used to unit test the HTTP service in server.py
+The client is mocked so no requests are sent to Climacell, the daemon cycles are run by hand
+"""
+
+RESOURCES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Resources")
+
+with open(os.path.join(RESOURCES, "test_96hrJson.json"), "r") as f:
+    test96hrDict = json.load(f)
+
+with open(os.path.join(RESOURCES, "test_360minJson.json"), "r") as f:
+    test360minDict = json.load(f)
+
+with open(os.path.join(RESOURCES, "test_realtimeJson.json"), "r") as f:
+    testRealtimeDict = json.load(f)
+
+
+# Every hour of the forecast is 2 mm/hr of snow, enough to raise both default alerts
+def snowy_forecast():
+    rows = copy.deepcopy(test96hrDict)
+    for row in rows:
+        row["precipitation"]["value"] = 2.0
+        row["precipitation_type"]["value"] = "snow"
+        row["precipitation_probability"]["value"] = 100
+    return rows
+
+
+class testServer(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.client = MagicMock(cache=None, rate_limiter=None)
+        self.client.fetch.return_value = testRealtimeDict
+        self.forecasts = {"nowcast": test360minDict, "hourly": test96hrDict}
+        self.client.fetch_series.side_effect = lambda endpoint, url, querystring, **kwargs: self.forecasts[endpoint]
+
+        self.daemon = daemon.PollingDaemon(["fernie", "whistler"], client=self.client, clock=self.clock)
+        self.addCleanup(self.daemon.close)
+        self.store = server.ReportStore(self.daemon.resorts)
+        self.daemon.on_cycle = self.store.on_cycle
+        self.app = server.create_app(self.store).test_client()
+
+    def test_resorts(self):
+        response = self.app.get("/resorts")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([resort["key"] for resort in response.get_json()], ["fernie", "whistler"])
+
+    # Before the first refresh there is nothing to serve yet, unknown resorts and endpoints are 404s
+    def test_notFetchedAndUnknown(self):
+        self.assertEqual(self.app.get("/resorts/fernie/96hr").status_code, 503)
+        self.assertEqual(self.app.get("/resorts/atlantis/96hr").status_code, 404)
+        self.assertEqual(self.app.get("/resorts/fernie/7day").status_code, 404)
+
+    def test_forecastAndFields(self):
+        self.daemon.run_cycle()
+        forecast = self.app.get("/resorts/fernie/96hr").get_json()
+        self.assertEqual(len(forecast["times"]), len(test96hrDict))
+        self.assertEqual(forecast["fields"]["temp"][0], test96hrDict[0]["temp"]["value"])
+        # null values from the api come back as null
+        self.assertIsNone(forecast["fields"]["cloud_base"][0])
+
+        subset = self.app.get("/resorts/fernie/96hr?fields=temp,precipitation").get_json()
+        self.assertEqual(sorted(subset["fields"]), ["precipitation", "temp"])
+        self.assertEqual(subset["times"], forecast["times"])
+        self.assertEqual(self.app.get("/resorts/fernie/96hr?fields=temp,snow_depth").status_code, 400)
+
+        now = self.app.get("/resorts/fernie/now").get_json()
+        self.assertEqual(now["fields"]["temp"], testRealtimeDict["temp"]["value"])
+
+    # The body is serialized once per refresh and a matching If-None-Match gets a 304
+    def test_etag(self):
+        self.daemon.run_cycle()
+        first = self.app.get("/resorts/whistler/96hr?fields=temp,precipitation")
+        etag = first.headers["ETag"]
+        self.assertIs(self.store.body("whistler", "96hr", ["temp", "precipitation"]), self.store.body("whistler", "96hr", ["precipitation", "temp"]))
+
+        cached = self.app.get("/resorts/whistler/96hr?fields=temp,precipitation", headers={"If-None-Match": etag})
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached.get_data(), b"")
+
+        # A refresh with a different forecast changes the ETag
+        self.forecasts["hourly"] = snowy_forecast()
+        self.clock.now += 1800
+        self.daemon.run_cycle()
+        refreshed = self.app.get("/resorts/whistler/96hr?fields=temp,precipitation", headers={"If-None-Match": etag})
+        self.assertEqual(refreshed.status_code, 200)
+        self.assertNotEqual(refreshed.headers["ETag"], etag)
+
+    def test_snowAlerts(self):
+        self.daemon.run_cycle()
+        self.assertEqual(self.app.get("/snow-alerts").get_json(), [])
+
+        self.forecasts["hourly"] = snowy_forecast()
+        self.clock.now += 1800
+        self.daemon.run_cycle()
+        alerts = self.app.get("/snow-alerts").get_json()
+        self.assertEqual({alert["resort"] for alert in alerts}, {"fernie", "whistler"})
+        self.assertEqual({alert["window"] for alert in alerts}, {24, 48})
+
+    # The daemon's cycle timings should be served in both metrics formats
+    def test_metrics(self):
+        self.daemon.run_cycle()
+        text = self.app.get("/metrics")
+        self.assertTrue(text.mimetype.startswith("text/plain"))
+        self.assertIn("# TYPE snowapp_cycle_seconds histogram", text.get_data(as_text=True))
+        snapshot = self.app.get("/metrics.json").get_json()
+        self.assertGreaterEqual(snapshot["snowapp_cycle_seconds"][0]["count"], 1)
+        self.assertIn("cache_hit_rate", snapshot)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+
+import os
+import random
+import sys
+import unittest
+
+sys.path.append(os.getcwd())
+
+from snowApp import snowReport
+from snowApp.registry import ResortRecord
+from snowApp.spatial import SpatialIndex, haversine_km
+
+"""
+This module is used to unit test the spatial index in spatial.py
+Every query is checked against a brute-force haversine scan
+"""
+
+CALGARY = (51.0447, -114.066666)
+
+
+def random_records(count, seed=0):
+    rng = random.Random(seed)
+    return [ResortRecord(f'resort{i}', f'Resort {i}', "Canada", rng.uniform(-80, 80), rng.uniform(-180, 180)) for i in range(count)]
+
+
+class testSpatialIndex(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.records = random_records(2000)
+        cls.index = SpatialIndex(cls.records, leaf_size=8)
+
+    def test_haversine(self):
+        self.assertAlmostEqual(haversine_km(*CALGARY, *CALGARY), 0.0)
+        # Calgary to Lake Louise is roughly 150 km
+        self.assertAlmostEqual(haversine_km(*CALGARY, 51.26315, -116.162097), 147, delta=3)
+
+    # The resorts found within a radius should match a brute-force scan
+    def test_withinRadiusMatchesBruteForce(self):
+        rng = random.Random(1)
+        for _ in range(20):
+            lat, lon = rng.uniform(-80, 80), rng.uniform(-180, 180)
+            expected = sorted(record.key for record in self.records if haversine_km(lat, lon, record.lat, record.lon) <= 1000)
+            found = self.index.within_radius(lat, lon, 1000)
+            self.assertEqual(sorted(record.key for record, _ in found), expected)
+            self.assertEqual([distance for _, distance in found], sorted(distance for _, distance in found))
+
+    # The k nearest resorts should match a brute-force scan, including across the antimeridian
+    def test_nearestMatchesBruteForce(self):
+        for lat, lon in [(0.0, 179.9), (45.0, -120.0), (-60.0, 10.0)]:
+            expected = sorted(self.records, key=lambda record: haversine_km(lat, lon, record.lat, record.lon))[:5]
+            found = self.index.nearest(lat, lon, k=5)
+            self.assertEqual([record.key for record, _ in found], [record.key for record in expected])
+            self.assertAlmostEqual(found[0][1], haversine_km(lat, lon, expected[0].lat, expected[0].lon), places=6)
+
+    def test_nearestMoreThanIndexed(self):
+        self.assertEqual(len(SpatialIndex(self.records[:3]).nearest(0, 0, k=10)), 3)
+        self.assertEqual(SpatialIndex([]).nearest(0, 0), [])
+
+    # The Alberta resorts are all within 200 km of Calgary
+    def test_resortsNearCalgary(self):
+        index = SpatialIndex.from_registry(snowReport.get_registry())
+        near_calgary = [record.key for record, _ in index.within_radius(*CALGARY, 200)]
+        for resort_key in ["lakeLouise", "sunshine", "nakiska", "norquay"]:
+            self.assertIn(resort_key, near_calgary)
+        self.assertNotIn("whistler", near_calgary)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+
+import datetime
+import os
+import sys
+import unittest
+
+import dateutil.parser as dp
+import numpy as np
+
+sys.path.append(os.getcwd())
+
+from snowApp import timeutil
+
+"""
+This module is used to unit test the timestamp helpers in timeutil.py
+"""
+
+
+class testTimeUtil(unittest.TestCase):
+
+    # The fast path should give the same instant and zone as the dateutil parser
+    def test_localTimeMatchesDateutil(self):
+        for UTC_time in ("2020-05-15T21:00:00.000Z", "2021-01-07T23:04:05.550Z"):
+            expected = dp.parse(UTC_time).astimezone(timeutil.local_zone())
+            self.assertEqual(timeutil.local_time(UTC_time), expected)
+            self.assertEqual(timeutil.local_time(UTC_time).utcoffset(), expected.utcoffset())
+
+    def test_localTimeType(self):
+        self.assertIs(type(timeutil.local_time("2020-05-15T21:00:00.000Z")), datetime.datetime)
+
+    # Strings that aren't in the "...Z" format still go through dateutil
+    def test_parseUtcFallback(self):
+        self.assertEqual(
+            timeutil.parse_utc("2020-05-15 21:00:00+00:00"),
+            datetime.datetime(2020, 5, 15, 21, tzinfo=datetime.timezone.utc),
+        )
+
+    def test_utcDatetime64(self):
+        times = timeutil.utc_datetime64(["2021-01-07T23:00:00.000Z", "2021-01-08T00:00:00.000Z"])
+        self.assertEqual(times.dtype, np.dtype("datetime64[ms]"))
+        self.assertEqual(times[1] - times[0], np.timedelta64(1, "h"))
+
+    # The batch API should agree with converting one string at a time
+    def test_localTimesBatch(self):
+        UTC_times = ["2021-01-07T23:00:00.000Z", "2021-01-07T23:04:05.550Z", "2021-07-01T12:00:00.000Z"]
+        self.assertEqual(timeutil.local_times(UTC_times), [timeutil.local_time(UTC_time) for UTC_time in UTC_times])
+
+
+if __name__ == "__main__":
+    unittest.main()
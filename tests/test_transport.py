@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from mock import MagicMock
+
+import requests
+
+sys.path.append(os.getcwd())
+
+from snowApp import fleet, snowReport
+from snowApp.client import ClimacellClient
+from snowApp.transport import RecordingTransport, ReplayTransport, endpoint_name, recording_name
+
+"""
+This module is used to unit test the replay and recording transports in transport.py
+Requests go through the real ClimacellClient and Resort code, only the network is replaced
+"""
+
+RESOURCES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Resources")
+
+with open(os.path.join(RESOURCES, "test_96hrJson.json"), "rb") as f:
+    test96hrBytes = f.read()
+
+
+class testReplayTransport(unittest.TestCase):
+
+    def setUp(self):
+        self.delays = []
+        self.transport = ReplayTransport.from_test_fixtures(sleep=self.delays.append)
+        self.client = ClimacellClient(transport=self.transport)
+
+    def test_endpointName(self):
+        self.assertEqual(endpoint_name(snowReport.URL_REALTIME), "realtime")
+        self.assertEqual(endpoint_name(snowReport.URL_NOWCAST), "nowcast")
+        self.assertEqual(endpoint_name(snowReport.URL_HOURLY + "/"), "hourly")
+
+    # A Resort should run its whole request path against the fixtures, with only the requested fields returned
+    def test_resortRequests(self):
+        resort = snowReport.Resort("fernie", client=self.client)
+        resort.process_requests()
+
+        self.assertEqual(self.transport.by_endpoint, {"realtime": 1, "nowcast": 1, "hourly": 1})
+        self.assertEqual(len(resort.get_temperature_96hr()), len(json.loads(test96hrBytes)))
+        self.assertIsNotNone(resort.get_temperature_now())
+        self.assertEqual(sorted(resort.series_96hr.fields), sorted(resort.fields["96hr"].split(",")))
+        self.assertEqual(self.delays, [])
+
+    # Limiting the fields should shrink the replayed body
+    def test_selectsFields(self):
+        querystring = {"lat": "49.4627", "lon": "-115.0873", "fields": "temp"}
+        response = self.transport.get(snowReport.URL_HOURLY, params=querystring)
+        rows = response.json()
+        self.assertEqual(set(rows[0]), {"lat", "lon", "observation_time", "temp"})
+        self.assertLess(len(response.content), len(test96hrBytes))
+        self.assertEqual(self.transport.bytes_sent, len(response.content))
+
+    # Latency and jitter should be slept on every request, and the same seed should repeat the same delays
+    def test_latencyAndJitter(self):
+        first = []
+        second = []
+        for delays in (first, second):
+            transport = ReplayTransport({"realtime": b"{}"}, latency=0.05, jitter=0.02, seed=7, sleep=delays.append)
+            for _ in range(5):
+                transport.get(snowReport.URL_REALTIME)
+        self.assertEqual(first, second)
+        self.assertTrue(all(0.05 <= delay <= 0.07 for delay in first))
+
+    # Injected errors should reach the Resort as failed requests and the fleet as recorded errors
+    def test_injectedErrors(self):
+        failing = ClimacellClient(transport=ReplayTransport.from_test_fixtures(error_rate=1.0))
+        self.assertFalse(snowReport.Resort("fernie", client=failing).request_96hr())
+
+        dropping = ReplayTransport.from_test_fixtures(drop_rate=1.0)
+        results = fleet.fetch_fleet(["fernie"], endpoints=("now",), client=ClimacellClient(transport=dropping))
+        self.assertIsInstance(results["fernie"].errors["now"], requests.ConnectionError)
+        self.assertEqual(dropping.drops, 1)
+
+    # About error_rate of the requests should fail
+    def test_errorRate(self):
+        transport = ReplayTransport({"realtime": b"{}"}, error_rate=0.25, seed=1)
+        statuses = [transport.get(snowReport.URL_REALTIME).status_code for _ in range(400)]
+        self.assertEqual(statuses.count(503), transport.errors)
+        self.assertTrue(60 < transport.errors < 140)
+
+    def test_missingRecording(self):
+        response = ReplayTransport({}).get(snowReport.URL_HOURLY)
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.ok)
+
+    # A fleet sweep should run end to end without the network
+    def test_fleetSweep(self):
+        results = fleet.fetch_fleet(["lakeLouise", "sunshine", "fernie"], max_workers=3, client=self.client)
+        self.assertTrue(all(result.ok for result in results.values()))
+        self.assertEqual(self.transport.request_count, 9)
+
+
+class testRecordingTransport(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    # Recorded responses should be replayed as they were, location specific recordings first
+    def test_recordThenReplay(self):
+        live = MagicMock()
+        live.get.side_effect = lambda url, params, timeout, stream: MagicMock(ok=True, status_code=200, content=test96hrBytes, headers={})
+        recorder = RecordingTransport(self.directory, live)
+        resort = snowReport.Resort("fernie", client=ClimacellClient(transport=recorder))
+        self.assertTrue(resort.request_96hr())
+
+        self.assertFalse(live.get.call_args[1]["stream"])
+        lat, lon = resort.query_coordinates()
+        self.assertEqual(
+            sorted(os.listdir(self.directory)),
+            sorted([recording_name("hourly"), recording_name("hourly", lat, lon)]),
+        )
+
+        with open(os.path.join(self.directory, recording_name("hourly")), "wb") as f:
+            f.write(b"[]")
+        replay = ReplayTransport.from_directory(self.directory)
+        replayed = snowReport.Resort("fernie", client=ClimacellClient(transport=replay))
+        self.assertTrue(replayed.request_96hr())
+        self.assertEqual(replayed.get_temperature_96hr(), resort.get_temperature_96hr())
+        self.assertEqual(replay.get(snowReport.URL_HOURLY, params={"lat": "0", "lon": "0"}).content, b"[]")
+
+    # Failed responses should be passed back without being recorded
+    def test_failuresNotRecorded(self):
+        live = MagicMock()
+        live.get.return_value = MagicMock(ok=False, status_code=503)
+        recorder = RecordingTransport(self.directory, live)
+        self.assertEqual(recorder.get(snowReport.URL_HOURLY, params={"lat": "1", "lon": "2"}).status_code, 503)
+        self.assertEqual(os.listdir(self.directory), [])
+        self.assertEqual(recorder.recorded, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()